@@ -3,6 +3,8 @@ from flask import Flask, send_from_directory, abort
 
 from .config import DevConfig, ProdConfig
 from .login import login_manager
+from .jobs import job_queue
+from .commands import candles_cli, jobs_cli, rollups_cli
 from .models import db, migrate
 from .routers import index_bp, strategy_bp, watchlist_bp, journal_bp, error_bp, user_bp, asset_bp
 
@@ -20,6 +22,15 @@ def create_app(config_class:(DevConfig | ProdConfig)) -> Flask:
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config_class.SQLALCHEMY_TRACK_MODIFICATIONS
     # app.config['APPLICATION_ROOT'] = config_class.APPLICATION_ROOT
     app.config['STATIC_URL_PATH'] = config_class.STATIC_URL_PATH
+    app.config['CANDLE_STORE'] = config_class.CANDLE_STORE
+    app.config['CANDLE_STORE_PATH'] = config_class.CANDLE_STORE_PATH
+    app.config['CANDLE_RETENTION_DAYS'] = config_class.CANDLE_RETENTION_DAYS
+    app.config['CANDLE_COMPACT_TIMEFRAME'] = config_class.CANDLE_COMPACT_TIMEFRAME
+    app.config['CANDLE_DROP_ORPHANS'] = config_class.CANDLE_DROP_ORPHANS
+    app.config['PERFORMANCE_CACHE_SIZE'] = config_class.PERFORMANCE_CACHE_SIZE
+    app.config['PERFORMANCE_CACHE_PATH'] = config_class.PERFORMANCE_CACHE_PATH
+    app.config['CHART_MAX_POINTS'] = config_class.CHART_MAX_POINTS
+    app.config['JOB_RESUME_ON_START'] = config_class.JOB_RESUME_ON_START
     print('URI: ', app.config['SQLALCHEMY_DATABASE_URI'])
 
     app.jinja_env.auto_reload = True
@@ -43,6 +54,11 @@ def create_app(config_class:(DevConfig | ProdConfig)) -> Flask:
 
     with app.app_context():
         db.create_all()
+
+    job_queue.init_app(app=app)
+    app.cli.add_command(candles_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(jobs_cli)
         
     @app.route('/media/<path:filename>')
     def serve_media(filename):
@@ -0,0 +1,436 @@
+'''
+Comprobaciones de equivalencia de las versiones vectorizadas con las
+implementaciones anteriores (bucles en Python), sobre datos generados con una
+semilla fija. El suite las ejecuta antes de medir: un benchmark más rápido
+no sirve si el resultado ha cambiado.
+
+    EquityCurve           bucle minuto a minuto de Trade.equity_curve
+    resampleArrays        agregación vela a vela
+    computeExcursions     recorrido de las velas de cada trade, largos y cortos
+    PerformanceMetrics    getStats y tiempos de mantenimiento con listas
+
+Uso:
+    python -m journal.benchmarks.equivalence --seed 0
+'''
+import sys
+import tempfile
+import argparse
+import datetime as dt
+from types import SimpleNamespace
+import numpy as np
+
+from ..models.candle import Candle
+from ..src.candle_store import MemmapCandleStore
+from ..src.equity import EquityCurve
+from ..src.excursions import computeExcursions
+from ..src.performance import PerformanceMetrics
+from ..src.resample import bucketStart, isIntraday, resampleArrays
+from . import synthetic
+
+DAY: dt.date = dt.date(2026, 1, 5)
+MINUTE: dt.timedelta = dt.timedelta(minutes=1)
+
+def _close(a, b, tolerance:float=1e-9) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    if isinstance(a, str) or isinstance(b, str):
+        return a == b
+    return bool(np.isclose(a, b, rtol=tolerance, atol=tolerance, equal_nan=True))
+
+def _compare(name:str, old:dict, new:dict, keys:list[str]=None) -> list[str]:
+    """Diferencias entre dos diccionarios de resultados (escalares o listas)"""
+    errors = []
+    for key in keys or old.keys():
+        a, b = old[key], new[key]
+        if isinstance(a, (list, np.ndarray)):
+            a = [None if v is None else v for v in list(a)]
+            b = [None if (v is None or (isinstance(v, float) and np.isnan(v))) else v for v in list(b)]
+            if len(a) != len(b):
+                errors.append(f'{name}.{key}: {len(a)} valores frente a {len(b)}')
+            elif not all(_close(x, y) for x, y in zip(a, b)):
+                i = next(i for i, (x, y) in enumerate(zip(a, b)) if not _close(x, y))
+                errors.append(f'{name}.{key}[{i}]: {a[i]} frente a {b[i]}')
+        elif not _close(a, b):
+            errors.append(f'{name}.{key}: {a} frente a {b}')
+    return errors
+
+def minuteArrays(symbol:str, rng:np.random.Generator, days:int=1) -> dict[str, np.ndarray]:
+    """Velas de 1m (PRE, REG y POST) de los días laborables desde DAY"""
+    return Candle.arraysFromFrame(synthetic.minuteFrame(symbol, synthetic.businessDays(DAY, days), rng))
+
+# ===== EQUITY CURVE =====
+
+def legacyEquityCurve(trade_type:str, transactions:list[dict], candle_dates:np.ndarray, candle_closes:np.ndarray,
+                      initial_balance:float=0) -> list[dict]:
+    """Bucle minuto a minuto de Trade.equity_curve antes de EquityCurve"""
+    dates = candle_dates.astype(dt.datetime).tolist()
+    closes = candle_closes.tolist()
+
+    def priceAt(target):
+        # El cierre exacto, si no el anterior y si no hay anterior el siguiente
+        if not dates:
+            return None
+        before = [i for i, d in enumerate(dates) if d <= target]
+        return closes[before[-1]] if before else closes[0]
+
+    current_time = transactions[0]['datetime'] - MINUTE
+    end_datetime = transactions[-1]['datetime'] + MINUTE
+    cash_balance, position, avg_price, commission_total, tx_index = initial_balance, 0, 0, 0, 0
+    points = []
+    while current_time <= end_datetime:
+        while tx_index < len(transactions) and transactions[tx_index]['datetime'] <= current_time:
+            tx = transactions[tx_index]
+            commission = tx['commission'] or 0
+            commission_total += commission
+            cash_balance -= commission
+            amount = tx['price'] * tx['quantity']
+            if tx['type'] == trade_type:
+                cash_balance += -amount if trade_type == 'LONG' else amount
+                if position > 0:
+                    total = avg_price * position + amount
+                    position += tx['quantity']
+                    avg_price = total / position
+                else:
+                    position = tx['quantity']
+                    avg_price = tx['price']
+            else:
+                cash_balance += amount if trade_type == 'LONG' else -amount
+                position -= tx['quantity']
+                if position <= 0:
+                    position = 0
+                    avg_price = 0
+            tx_index += 1
+
+        current_price = priceAt(current_time)
+        if current_price is None and avg_price > 0:
+            current_price = avg_price
+
+        position_value = unrealized_pnl = 0
+        if position > 0 and current_price is not None:
+            if trade_type == 'LONG':
+                position_value = current_price * position
+                unrealized_pnl = (current_price - avg_price) * position
+            else:
+                position_value = (2 * avg_price - current_price) * position
+                unrealized_pnl = (avg_price - current_price) * position
+
+        total_balance = cash_balance + position_value
+        points.append({
+            'datetime': current_time,
+            'balance': total_balance,
+            'cash_balance': cash_balance,
+            'position_value': position_value,
+            'realized_pnl': cash_balance - initial_balance,
+            'unrealized_pnl': unrealized_pnl,
+            'total_pnl': total_balance - initial_balance,
+            'commission': commission_total,
+            'position_size': position,
+            'avg_price': avg_price,
+            'current_price': current_price,
+        })
+        current_time += MINUTE
+
+    return points
+
+def checkEquityCurve(rng:np.random.Generator, trades:int=12) -> list[str]:
+    candles = minuteArrays('EQTY', rng)
+    errors = []
+    for k in range(trades):
+        trade_type = 'LONG' if k % 2 == 0 else 'SHORT'
+        exit_type = 'SHORT' if trade_type == 'LONG' else 'LONG'
+        # Entradas y salidas escalonadas en la sesión regular; uno de cada cuatro sin velas
+        start = dt.datetime.combine(DAY, dt.time(14, 30)) + dt.timedelta(minutes=int(rng.integers(0, 300)))
+        entries, exits = int(rng.integers(1, 4)), int(rng.integers(1, 4))
+        minutes = np.sort(rng.choice(90, entries + exits, replace=False))
+        quantity = float(rng.integers(1, 10) * 10 * exits)
+        transactions = [{
+            'datetime': start + dt.timedelta(minutes=int(m), seconds=int(rng.integers(0, 60))),
+            'type': trade_type if i < entries else exit_type,
+            'price': float(np.round(rng.uniform(9, 11), 2)),
+            'quantity': quantity / entries if i < entries else quantity / exits,
+            'commission': None if i == 0 else 1.0,
+        } for i, m in enumerate(minutes)]
+
+        dates, closes = (candles['date'], candles['close']) if k % 4 != 3 else (candles['date'][:0], candles['close'][:0])
+        old = legacyEquityCurve(trade_type, transactions, dates, closes, initial_balance=1000)
+        new = EquityCurve(trade_type, 'EQTY', transactions, dates, closes, initial_balance=1000).getArrays()
+
+        if [p['datetime'] for p in old] != new['datetime'].astype(dt.datetime).tolist():
+            errors.append(f'equity_curve[{k}].datetime: minutos distintos')
+            continue
+        columns = [col for col in old[0] if col != 'datetime']
+        errors += _compare(f'equity_curve[{k}]', {col: [p[col] for p in old] for col in columns}, new, columns)
+    return errors
+
+# ===== RESAMPLE =====
+
+def legacyResample(arrays:dict[str, np.ndarray], timeframe:str, sessions:list[str]=None) -> dict[str, list]:
+    """Agregación vela a vela: una vela nueva al cambiar de intervalo (o de sesión en intradía)"""
+    intraday = isIntraday(timeframe)
+    if sessions is None and not intraday:
+        sessions = ['REG']
+
+    buckets = bucketStart(arrays['date'], timeframe)
+    result = {col: [] for col in ['date', 'open', 'high', 'low', 'close', 'volume', 'session']}
+    previous = None
+    for i in range(len(arrays['date'])):
+        session = str(arrays['session'][i])
+        if sessions is not None and session not in sessions:
+            continue
+
+        key = (buckets[i], session if intraday else None)
+        if key != previous:
+            result['date'].append(max(buckets[i], arrays['date'][i]) if intraday else buckets[i])
+            result['open'].append(arrays['open'][i])
+            result['high'].append(arrays['high'][i])
+            result['low'].append(arrays['low'][i])
+            result['volume'].append(0.0)
+            result['close'].append(None)
+            result['session'].append(session)
+            previous = key
+        result['high'][-1] = max(result['high'][-1], arrays['high'][i])
+        result['low'][-1] = min(result['low'][-1], arrays['low'][i])
+        result['close'][-1] = arrays['close'][i]
+        result['volume'][-1] += arrays['volume'][i]
+
+    return result
+
+def checkResample(rng:np.random.Generator) -> list[str]:
+    arrays = minuteArrays('RSMP', rng, days=8)
+    errors = []
+    for timeframe, sessions in [('5m', None), ('15m', None), ('1h', None), ('1h', ['REG']), ('4h', None),
+                                ('1d', None), ('1d', ['PRE', 'REG', 'POST']), ('1wk', None)]:
+        old = legacyResample(arrays, timeframe, sessions)
+        new = resampleArrays(arrays, timeframe, sessions)
+        name = f"resample[{timeframe}{'' if sessions is None else ',' + '+'.join(sessions)}]"
+        if not np.array_equal(np.array(old['date'], dtype='datetime64[s]'), new['date']):
+            errors.append(f"{name}.date: {len(old['date'])} velas frente a {len(new['date'])} o fechas distintas")
+            continue
+        errors += _compare(name, old, {col: new[col].tolist() for col in new}, ['open', 'high', 'low', 'close', 'volume', 'session'])
+    return errors
+
+# ===== EXCURSIONS =====
+
+def legacyExcursions(trade, dates:list[dt.datetime], highs:list[float], lows:list[float]) -> dict[str, float] | None:
+    """MFE/MAE de un trade recorriendo sus velas (maximumFavorableAverse con cortos y en R)"""
+    start = dt.datetime.combine(trade.entry_date, dt.time.fromisoformat(trade.entry_time)).replace(second=0)
+    end = dt.datetime.combine(trade.exit_date, dt.time.fromisoformat(trade.exit_time))
+    window = [i for i, d in enumerate(dates) if start <= d <= end]
+    if not window:
+        return None
+
+    if trade.trade_type == 'SHORT':
+        mfe = max(max(trade.entry_price - lows[i] for i in window), 0)
+        mae = max(max(highs[i] - trade.entry_price for i in window), 0)
+    else:
+        mfe = max(max(highs[i] - trade.entry_price for i in window), 0)
+        mae = max(max(trade.entry_price - lows[i] for i in window), 0)
+
+    risk = abs(trade.entry_price - trade.stop_loss) if trade.stop_loss is not None else 0
+    return {'mfe': mfe, 'mae': mae, 'mfe_r': mfe / risk if risk else None, 'mae_r': mae / risk if risk else None}
+
+def checkExcursions(rng:np.random.Generator, trades:int=40) -> list[str]:
+    symbols = ['EXA', 'EXB']
+    candles = {symbol: minuteArrays(symbol, rng, days=2) for symbol in symbols}
+    days = synthetic.businessDays(DAY, 2).astype(dt.date).tolist()
+
+    items = []
+    for k in range(trades):
+        entry = dt.datetime.combine(days[k % 2], dt.time(9)) + dt.timedelta(minutes=int(rng.integers(0, 900)), seconds=int(rng.integers(0, 60)))
+        exit_ = entry + dt.timedelta(minutes=int(rng.integers(0, 240)))
+        price = float(candles[symbols[k % 2]]['close'][0])
+        items.append(SimpleNamespace(
+            id=k + 1, symbol=symbols[k % 2], trade_type='SHORT' if k % 3 == 0 else 'LONG',
+            entry_date=entry.date(), entry_time=entry.strftime('%H:%M:%S'),
+            exit_date=exit_.date(), exit_time=exit_.strftime('%H:%M:%S'),
+            entry_price=round(price * float(rng.uniform(0.97, 1.03)), 2),
+            stop_loss=None if k % 5 == 0 else round(price * float(rng.uniform(0.95, 1.05)), 2),
+        ))
+    # Un trade fuera del rango de las velas se omite en las dos versiones
+    items[-1].entry_date = items[-1].exit_date = dt.date(2025, 1, 6)
+
+    errors = []
+    with tempfile.TemporaryDirectory() as root:
+        store = MemmapCandleStore(root)
+        for symbol, arrays in candles.items():
+            store.writeArrays(symbol=symbol, timeframe='1m', arrays=arrays)
+        new = computeExcursions(items, store=store)
+
+    for trade in items:
+        arrays = candles[trade.symbol]
+        old = legacyExcursions(trade, arrays['date'].astype(dt.datetime).tolist(), arrays['high'].tolist(), arrays['low'].tolist())
+        name = f'excursions[{trade.id},{trade.trade_type}]'
+        if old is None or trade.id not in new:
+            if (old is None) != (trade.id not in new):
+                errors.append(f'{name}: {old} frente a {new.get(trade.id)}')
+            continue
+        errors += _compare(name, old, new[trade.id])
+    return errors
+
+# ===== PERFORMANCE METRICS =====
+
+class LegacyMetrics:
+    """getStats y calculateHoldTimes de PerformanceMetrics antes de TradeFrame"""
+
+    def __init__(self, trades:list):
+        self.trades = trades
+        # p-value y formato de tiempos no cambiaron
+        self.metrics = PerformanceMetrics(trades=[])
+
+    def maxDrawDown(self, pnl_values:list[float]) -> float:
+        cumulative_pnl, peak, max_dd = 0, 0, 0
+        for pnl in pnl_values:
+            cumulative_pnl += pnl
+            peak = max(peak, cumulative_pnl)
+            max_dd = max(max_dd, peak - cumulative_pnl)
+        return max_dd
+
+    def advancedStats(self, pnl_values:list[float]) -> dict:
+        if len(pnl_values) < 2:
+            return {'sqn': 0, 'k_ratio': 0, 'kelly_percent': 0, 'p_value': 1.0}
+
+        avg_pnl, std_pnl = np.mean(pnl_values), np.std(pnl_values)
+        sqn = (avg_pnl / std_pnl) * np.sqrt(len(pnl_values)) if std_pnl != 0 else 0
+
+        cumulative_pnl = np.cumsum(pnl_values)
+        slope = np.polyfit(range(len(cumulative_pnl)), cumulative_pnl, 1)[0]
+        std_residuals = np.std(cumulative_pnl - np.polyval([slope, 0], range(len(cumulative_pnl))))
+        k_ratio = slope / std_residuals if std_residuals != 0 else 0
+
+        win_rate = len([p for p in pnl_values if p > 0]) / len(pnl_values)
+        if 0 < win_rate < 1:
+            avg_win = np.mean([p for p in pnl_values if p > 0])
+            avg_loss = abs(np.mean([p for p in pnl_values if p < 0])) if any(p < 0 for p in pnl_values) else 1
+            kelly_percent = (win_rate * avg_win - (1 - win_rate) * avg_loss) / avg_win * 100
+        else:
+            kelly_percent = 0
+
+        return {'sqn': sqn, 'k_ratio': k_ratio, 'kelly_percent': kelly_percent,
+                'p_value': self.metrics.calculatePvalue(pnl_values=pnl_values, method='custom')}
+
+    def streaks(self, pnl_values:list[float]) -> dict:
+        max_wins = max_losses = current_wins = current_losses = 0
+        for pnl in pnl_values:
+            if pnl > 0:
+                current_wins, current_losses = current_wins + 1, 0
+                max_wins = max(max_wins, current_wins)
+            elif pnl < 0:
+                current_wins, current_losses = 0, current_losses + 1
+                max_losses = max(max_losses, current_losses)
+            else:
+                current_wins = current_losses = 0
+        return {'max_wins': max_wins, 'max_losses': max_losses}
+
+    def getStats(self, mode:str='net', scratch_percentage:float=0.01) -> dict:
+        pnl_values = [(t.profit_loss + t.commission) if mode == 'gross' else t.profit_loss for t in self.trades]
+        total_pnl = sum(pnl_values)
+        total_quantity = sum(t.exit_quantity for t in self.trades)
+        total_trades = len(pnl_values)
+        winning_pnl = [p for p in pnl_values if p > 0]
+        losing_pnl = [p for p in pnl_values if p < 0]
+
+        avg_trade_pnl = np.mean(pnl_values)
+        avg_win = np.mean(winning_pnl) if winning_pnl else 0
+        avg_loss = np.mean(losing_pnl) if losing_pnl else 0
+        scratch_threshold = abs(avg_trade_pnl) * scratch_percentage
+        winning_trades = len([p for p in pnl_values if p > scratch_threshold])
+        losing_trades = len([p for p in pnl_values if p < -scratch_threshold])
+        total_wins, total_losses = sum(winning_pnl), abs(sum(losing_pnl))
+        trade_pnl_std = np.std(pnl_values) if len(pnl_values) > 1 else 0
+        advanced_stats = self.advancedStats(pnl_values)
+        streaks = self.streaks(pnl_values)
+        trading_days = (max(t.entry_date for t in self.trades) - min(t.entry_date for t in self.trades)).days + 1
+
+        return {
+            'total_pnl': total_pnl,
+            'winning_trades': winning_trades,
+            'losing_trades': losing_trades,
+            'scratch_trades': len([p for p in pnl_values if -scratch_threshold < p < scratch_threshold]),
+            'win_rate': winning_trades / total_trades * 100,
+            'loss_rate': losing_trades / total_trades * 100,
+            'winning_pnl': sum(winning_pnl),
+            'losing_pnl': sum(losing_pnl),
+            'avg_trade_pnl': avg_trade_pnl,
+            'avg_pnl_per_share': round(total_pnl / total_quantity, 4) if total_quantity != 0 else 0,
+            'median_trade_pnl': np.median(pnl_values),
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'largest_gain': max(pnl_values),
+            'largest_loss': min(pnl_values),
+            'risk_reward': avg_win / abs(avg_loss) if avg_loss != 0 else 0,
+            'total_wins': total_wins,
+            'total_losses': total_losses,
+            'profit_factor': total_wins / total_losses if total_losses > 0 else 1e99 if total_wins > 0 else 0,
+            'trade_pnl_std': trade_pnl_std,
+            'sharpe_ratio': avg_trade_pnl / trade_pnl_std if trade_pnl_std != 0 else 0,
+            'max_drawdown': self.maxDrawDown(pnl_values),
+            'sqn': round(advanced_stats['sqn'], 2),
+            'k_ratio': round(advanced_stats['k_ratio'], 2),
+            'kelly_percent': round(advanced_stats['kelly_percent'], 2),
+            'p_value': round(advanced_stats['p_value'], 4),
+            'max_consecutive_wins': streaks['max_wins'],
+            'max_consecutive_losses': streaks['max_losses'],
+            'avg_daily_pnl': round(total_pnl / trading_days, 2),
+            'avg_daily_volume': round(total_quantity / trading_days, 2),
+        }
+
+    def holdTimes(self) -> dict:
+        groups = {'overall': [], 'winners': [], 'losers': [], 'scratches': []}
+        for t in self.trades:
+            entry = dt.datetime.combine(t.entry_date, dt.time.fromisoformat(t.entry_time))
+            exit_ = dt.datetime.combine(t.exit_date, dt.time.fromisoformat(t.exit_time))
+            minutes = (exit_ - entry).total_seconds() / 60
+            groups['overall'].append(minutes)
+            groups['winners' if t.profit_loss > 0 else 'losers' if t.profit_loss < 0 else 'scratches'].append(minutes)
+        return {key: self.metrics._formatHoldTime(np.mean(values)) if values else '0h' for key, values in groups.items()}
+
+def checkMetrics(rng:np.random.Generator, trades:int=500) -> list[str]:
+    days = synthetic.businessDays(DAY, 60).astype(dt.date).tolist()
+    items = []
+    for k in range(trades):
+        entry = dt.datetime.combine(days[k * len(days) // trades], dt.time(14, 30)) + dt.timedelta(minutes=int(rng.integers(0, 380)))
+        exit_ = entry + dt.timedelta(minutes=int(rng.integers(1, 3000)))
+        # Algunos trades a cero para que haya scratches y rachas cortadas
+        pnl = 0.0 if k % 17 == 0 else float(np.round(rng.normal(5, 60), 2))
+        items.append(SimpleNamespace(
+            profit_loss=pnl, commission=float(rng.integers(1, 7)), fees=0.0, exit_quantity=float(rng.integers(1, 50) * 10),
+            entry_date=entry.date(), entry_time=entry.strftime('%H:%M:%S'), exit_date=exit_.date(), exit_time=exit_.strftime('%H:%M:%S'),
+            symbol=f'SY{k % 7}', strategy_id=k % 3 or None, mfe=None, mae=None, mfe_r=None, mae_r=None,
+        ))
+
+    legacy = LegacyMetrics(items)
+    new = PerformanceMetrics(trades=items).getComplete()
+    errors = []
+    for mode in ['net', 'gross']:
+        old = legacy.getStats(mode=mode)
+        errors += _compare(f'metrics.{mode}', old, new[mode])
+        errors += _compare(f'metrics.{mode}.getStats', old, PerformanceMetrics(trades=items).getStats(mode=mode))
+    old = legacy.holdTimes()
+    errors += _compare('metrics.hold_time', old, {key: new[f'avg_hold_time_{key}'] for key in old})
+    return errors
+
+CHECKS: dict[str, callable] = {
+    'equity_curve': checkEquityCurve,
+    'resample': checkResample,
+    'excursions': checkExcursions,
+    'performance_metrics': checkMetrics,
+}
+
+def run(seed:int=0) -> dict[str, list[str]]:
+    """Diferencias de cada comprobación (listas vacías si todo coincide)"""
+    return {name: check(np.random.default_rng(seed)) for name, check in CHECKS.items()}
+
+def printReport(results:dict[str, list[str]]) -> bool:
+    for name, errors in results.items():
+        print(f"{name:<22} {'OK' if not errors else f'{len(errors)} diferencias'}")
+        for error in errors[:10]:
+            print(f'    {error}')
+    return not any(results.values())
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Equivalencia de las versiones vectorizadas con las implementaciones anteriores.')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos.')
+    args = parser.parse_args()
+
+    if not printReport(run(seed=args.seed)):
+        sys.exit(1)
@@ -0,0 +1,90 @@
+'''
+Benchmark de YahooTicker._parseSessions.
+
+Compara la versión original (un bucle por periodo con una máscara sobre todo
+el índice) con la actual (searchsorted sobre los periodos ordenados) en
+descargas sintéticas de 1m con horario extendido. El tiempo por vela de la
+versión actual debe mantenerse constante al crecer el número de días.
+
+Uso:
+    python -m journal.benchmarks.sessions
+'''
+import time
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+from ..src.yahoofinance import YahooTicker
+
+def syntheticDownload(days:int, start:dt.datetime=dt.datetime(2026, 1, 5)) -> tuple[pd.DataFrame, dict]:
+    """Velas de 1m de 04:00 a 20:00 ET (09:00-01:00 UTC) y los tradingPeriods de Yahoo para esos días"""
+    periods = {'pre': [], 'regular': [], 'post': []}
+    index = []
+    for day in range(days):
+        date = start + dt.timedelta(days=day)
+        if date.weekday() >= 5:
+            continue
+        open_ = int((date + dt.timedelta(hours=9)).timestamp())
+        periods['pre'].append([{'start': open_, 'end': open_ + 330 * 60}])
+        periods['regular'].append([{'start': open_ + 330 * 60, 'end': open_ + 720 * 60}])
+        periods['post'].append([{'start': open_ + 720 * 60, 'end': open_ + 960 * 60}])
+        index.append(open_ + 60 * np.arange(960))
+
+    index = pd.to_datetime(np.concatenate(index), unit='s', utc=True)
+    prices = pd.DataFrame({'close': np.random.default_rng(0).normal(100, 1, len(index))}, index=index)
+    return prices, periods
+
+def legacyParseSessions(prices_df:pd.DataFrame, trading_periods:dict) -> pd.DataFrame:
+    """Implementación anterior, O(periodos x velas)"""
+    session_data = []
+    for session_type, daily_sessions in trading_periods.items():
+        for day in daily_sessions:
+            for period in day:
+                session_data.append({
+                    'session': {'REGULAR': 'REG'}.get(session_type.upper(), session_type.upper()),
+                    'start': pd.to_datetime(period['start'], unit='s', utc=True),
+                    'end': pd.to_datetime(period['end'], unit='s', utc=True),
+                })
+
+    prices_df['session'] = None
+    for row in session_data:
+        mask = (prices_df.index >= row['start']) & (prices_df.index < row['end'])
+        prices_df.loc[mask, 'session'] = row['session']
+    return prices_df
+
+def timeit(func, *args, repeat:int=3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(days_list:list[int]=[7, 14, 30]) -> list[dict]:
+    results = []
+    for days in days_list:
+        prices, periods = syntheticDownload(days=days)
+        legacy = timeit(legacyParseSessions, prices.copy(), periods)
+        current = timeit(YahooTicker._parseSessions, None, prices.copy(), periods)
+
+        # Ambas versiones deben etiquetar igual
+        expected = legacyParseSessions(prices.copy(), periods)['session']
+        result = YahooTicker._parseSessions(None, prices.copy(), periods)['session']
+        assert expected.tolist() == result.tolist(), 'Las sesiones no coinciden con la implementación anterior'
+
+        results.append({
+            'days': days,
+            'bars': len(prices),
+            'periods': sum(len(p) for p in periods.values()),
+            'legacy_ms': legacy * 1000,
+            'current_ms': current * 1000,
+            'current_us_per_bar': current * 1e6 / len(prices),
+            'speedup': legacy / current,
+        })
+    return results
+
+if __name__ == '__main__':
+    print(f"{'days':>5} {'bars':>7} {'periods':>8} {'legacy ms':>10} {'current ms':>11} {'us/bar':>7} {'speedup':>8}")
+    for r in run():
+        print(f"{r['days']:>5} {r['bars']:>7} {r['periods']:>8} {r['legacy_ms']:>10.1f} {r['current_ms']:>11.2f} "
+              f"{r['current_us_per_bar']:>7.3f} {r['speedup']:>7.0f}x")
@@ -0,0 +1,251 @@
+'''
+Benchmarks de los caminos críticos de analítica e ingesta sobre datos
+sintéticos (synthetic.generate), con líneas base guardadas e informe de
+regresiones.
+
+Cada escala usa su propia base de datos SQLite en instance/benchmarks, que se
+reutiliza entre ejecuciones (--fresh para regenerarla). Cada caso se ejecuta
+una vez sin medir y después se toma el mejor de --repeat. La caché de
+resultados de performance se desactiva para medir siempre el cálculo.
+
+Antes de medir se comprueba que las versiones vectorizadas dan lo mismo que
+las implementaciones anteriores con la misma semilla (equivalence.py). Si
+alguna difiere no se mide nada.
+
+Casos:
+    metrics_complete      PerformanceMetrics.getComplete (filas ya cargadas)
+    charts_all            PerformanceCharts.getAll en net y gross con un TradeFrame compartido
+    equity_curve          Trade.equity_curve de hasta 20 trades con velas de 1m
+    global_performance    GET /journal/complete-performance
+    month_trades          GET /journal/trades/<date>/month (curvas ya en caché)
+    month_trades_summary  GET /journal/trades/<date>/month?summary=1
+    candle_ingest         download_candles de 20 días de 1m y un año de 1d (sin red)
+
+Uso:
+    python -m journal.benchmarks.suite --trades 1000 10000
+    python -m journal.benchmarks.suite --trades 10000 --update    # guarda las líneas base
+    python -m journal.benchmarks.suite --trades 1000000 --cases metrics_complete charts_all
+'''
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime as dt
+from unittest import mock
+import numpy as np
+
+from ..app import create_app
+from ..config import DevConfig
+from ..models import db, User, Trade, Candle, CandleCoverage
+from ..routers import utils
+from ..src.candle_store import getCandleStore
+from ..src.performance import PerformanceMetrics, PerformanceCharts
+from ..src.trade_frame import TradeFrame
+from . import equivalence, synthetic
+
+BASELINES_PATH: str = os.path.join(os.path.dirname(__file__), 'baselines.json')
+INGEST_SYMBOL: str = 'BENCH'
+
+class SyntheticTicker:
+    """Sustituye a YahooTicker en download_candles: mismas columnas que getPrice, sin peticiones"""
+
+    def __init__(self, ticker:str, *args, **kwargs):
+        self.ticker = ticker
+
+    def getPrice(self, start:dt.datetime, end:dt.datetime, timeframe:str='1m', df:bool=True):
+        rng = np.random.default_rng(0)
+        count = int(np.busday_count(np.datetime64(start.date(), 'D'), np.datetime64(end.date(), 'D') + 1))
+        days = synthetic.businessDays(start.date(), count)
+        if timeframe == '1d':
+            return synthetic.dailyFrame(self.ticker, days, rng)
+        return synthetic.minuteFrame(self.ticker, days, rng)
+
+def benchmarkConfig(trades:int, seed:int) -> type:
+    """DevConfig con una base de datos por escala y sin caché de resultados"""
+    return type('BenchmarkConfig', (DevConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///path/benchmarks/trades_{trades}_seed_{seed}.db',
+        'PERFORMANCE_CACHE_SIZE': 0,
+        'PERFORMANCE_CACHE_PATH': None,
+    })
+
+def prepare(trades:int, seed:int=0, fresh:bool=False):
+    '''
+    Aplicación con los datos sintéticos de la escala. Si la base de datos ya
+    existe se reutiliza salvo con fresh.
+    '''
+    config = benchmarkConfig(trades=trades, seed=seed)
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'benchmarks', f'trades_{trades}_seed_{seed}.db')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if fresh and os.path.exists(path):
+        os.remove(path)
+
+    app = create_app(config)
+    with app.app_context():
+        if User.query.count() == 0:
+            start = time.perf_counter()
+            info = synthetic.generate(trades=trades, seed=seed)
+            print(f"Datos generados en {time.perf_counter() - start:.1f}s: {info['trades']} trades, "
+                  f"{info['transactions']} transacciones, {info['candles']} velas")
+    return app
+
+def context(app) -> dict:
+    """Lo que necesitan los casos, leído de la base de datos (sirve igual con datos reutilizados)"""
+    with app.app_context():
+        user = User.query.order_by(User.id).first()
+        last_day = db.session.query(db.func.max(Trade.exit_date)).filter(Trade.user_id == user.id).scalar()
+        first_day = db.session.query(db.func.min(Trade.entry_date)).filter(Trade.user_id == user.id).scalar()
+        minute_symbols = [s for (s,) in db.session.query(Candle.symbol).filter(Candle.timeframe == '1m', Candle.symbol != INGEST_SYMBOL).distinct()]
+        equity_ids = [t for (t,) in db.session.query(Trade.id).filter(Trade.user_id == user.id, Trade.exit_date == last_day,
+                                                                        Trade.symbol.in_(minute_symbols)).order_by(Trade.id).limit(20)]
+        return {'user_id': user.id, 'first_day': first_day, 'last_day': last_day, 'equity_ids': equity_ids}
+
+def cases(app, ctx:dict) -> dict[str, tuple[callable, callable]]:
+    '''
+    Casos del suite: nombre -> (setup, run). setup se ejecuta antes de cada
+    medida sin contar en el tiempo y devuelve el argumento de run.
+    '''
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(ctx['user_id'])
+
+    def rows():
+        return Trade.analyticsRows(Trade.query.filter(Trade.user_id == ctx['user_id']).order_by(Trade.entry_date))
+
+    def charts(trades):
+        frame = TradeFrame(trades)
+        return [PerformanceCharts(trades=trades, mode=mode, frame=frame, max_points=app.config['CHART_MAX_POINTS']).getAll()
+                for mode in TradeFrame.MODES]
+
+    def equity(_):
+        return [trade.equity_curve() for trade in Trade.query.filter(Trade.id.in_(ctx['equity_ids'])).all()]
+
+    def get(url:str):
+        def run(_):
+            response = client.get(url)
+            assert response.status_code == 200, f'{url}: {response.status_code}'
+            return response
+        return run
+
+    def clearIngest():
+        getCandleStore().delete(symbol=INGEST_SYMBOL)
+        CandleCoverage.query.filter(CandleCoverage.symbol == INGEST_SYMBOL).delete(synchronize_session=False)
+        db.session.commit()
+
+    def ingest(_):
+        end = dt.datetime.combine(ctx['last_day'], dt.time(23, 59, 59))
+        config = [{'start': end - dt.timedelta(days=365), 'end': end, 'timeframe': '1d'},
+                  {'start': end - dt.timedelta(days=27), 'end': end, 'timeframe': '1m'}]
+        with mock.patch.object(utils, 'YahooTicker', SyntheticTicker):
+            utils.download_candles(db=db, symbol=INGEST_SYMBOL, config=config)
+
+    month = ctx['last_day'].strftime('%Y-%m-%d')
+    return {
+        'metrics_complete': (rows, lambda trades: PerformanceMetrics(trades=trades).getComplete()),
+        'charts_all': (rows, charts),
+        'equity_curve': (lambda: None, equity),
+        'global_performance': (lambda: None, get(f"/journal/complete-performance?start={ctx['first_day']}")),
+        'month_trades': (lambda: None, get(f'/journal/trades/{month}/month')),
+        'month_trades_summary': (lambda: None, get(f'/journal/trades/{month}/month?summary=1')),
+        'candle_ingest': (clearIngest, ingest),
+    }
+
+def measure(setup:callable, run:callable, repeat:int=3) -> float:
+    """Mejor tiempo en segundos de repeat ejecuciones, tras una sin medir"""
+    run(setup())
+    best = float('inf')
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(trades_list:list[int]=[1000, 10000], names:list[str]=None, repeat:int=3, seed:int=0, fresh:bool=False) -> list[dict]:
+    results = []
+    for trades in trades_list:
+        app = prepare(trades=trades, seed=seed, fresh=fresh)
+        ctx = context(app)
+        with app.app_context():
+            for name, (setup, func) in cases(app, ctx).items():
+                if names and name not in names:
+                    continue
+                seconds = measure(setup, func, repeat=repeat)
+                results.append({'case': name, 'trades': trades, 'ms': seconds * 1000, 'us_per_trade': seconds * 1e6 / trades})
+    return results
+
+def loadBaselines(path:str=BASELINES_PATH) -> dict:
+    if not os.path.exists(path):
+        return {'machine': None, 'results': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def saveBaselines(results:list[dict], path:str=BASELINES_PATH):
+    """Añade (o sustituye) las medidas en el fichero de líneas base"""
+    baselines = loadBaselines(path)
+    baselines['machine'] = {'platform': platform.platform(), 'processor': platform.processor() or platform.machine(),
+                            'python': platform.python_version(), 'numpy': np.__version__, 'date': dt.date.today().isoformat()}
+    for r in results:
+        baselines['results'].setdefault(str(r['trades']), {})[r['case']] = round(r['ms'], 3)
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def compare(results:list[dict], baselines:dict, tolerance:float=0.25, noise_ms:float=2.0) -> list[dict]:
+    '''
+    Compara cada medida con su línea base. Es una regresión si es más lenta
+    que la base en más de tolerance (relativo) y de noise_ms (absoluto).
+    '''
+    report = []
+    for r in results:
+        base = baselines['results'].get(str(r['trades']), {}).get(r['case'])
+        if base is None:
+            status, ratio = 'NEW', None
+        else:
+            ratio = r['ms'] / base if base else None
+            if r['ms'] > base * (1 + tolerance) and r['ms'] - base > noise_ms:
+                status = 'REGRESSION'
+            elif r['ms'] < base * (1 - tolerance) and base - r['ms'] > noise_ms:
+                status = 'FASTER'
+            else:
+                status = 'OK'
+        report.append({**r, 'baseline_ms': base, 'ratio': ratio, 'status': status})
+    return report
+
+def printReport(report:list[dict], baselines:dict):
+    if baselines.get('machine'):
+        machine = baselines['machine']
+        print(f"Líneas base: {machine['platform']} / Python {machine['python']} / numpy {machine['numpy']} ({machine['date']})")
+    print(f"{'case':<22} {'trades':>8} {'baseline ms':>12} {'current ms':>11} {'us/trade':>9} {'ratio':>6}  status")
+    for r in report:
+        baseline = f"{r['baseline_ms']:>12.1f}" if r['baseline_ms'] is not None else f"{'-':>12}"
+        ratio = f"{r['ratio']:>6.2f}" if r['ratio'] is not None else f"{'-':>6}"
+        print(f"{r['case']:<22} {r['trades']:>8} {baseline} {r['ms']:>11.1f} {r['us_per_trade']:>9.2f} {ratio}  {r['status']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks de analítica e ingesta sobre datos sintéticos.')
+    parser.add_argument('--trades', type=int, nargs='+', default=[1000, 10000], help='Escalas a medir (1k a 1M trades).')
+    parser.add_argument('--cases', nargs='+', default=None, help='Medir solo estos casos.')
+    parser.add_argument('--repeat', type=int, default=3, help='Ejecuciones medidas por caso (se toma la mejor).')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos sintéticos.')
+    parser.add_argument('--fresh', action='store_true', help='Regenerar la base de datos aunque exista.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Margen relativo antes de marcar una regresión.')
+    parser.add_argument('--update', action='store_true', help='Guardar las medidas como nuevas líneas base.')
+    parser.add_argument('--skip-checks', action='store_true', help='Medir sin comprobar antes la equivalencia.')
+    args = parser.parse_args()
+
+    if not args.skip_checks and not equivalence.printReport(equivalence.run(seed=args.seed)):
+        print('Los resultados no coinciden con las implementaciones anteriores: no se mide')
+        sys.exit(1)
+
+    results = run(trades_list=args.trades, names=args.cases, repeat=args.repeat, seed=args.seed, fresh=args.fresh)
+    baselines = loadBaselines()
+    report = compare(results, baselines, tolerance=args.tolerance)
+    printReport(report, baselines)
+
+    if args.update:
+        saveBaselines(results)
+        print(f'Líneas base guardadas en {BASELINES_PATH}')
+    elif any(r['status'] == 'REGRESSION' for r in report):
+        sys.exit(1)
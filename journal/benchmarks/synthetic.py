@@ -0,0 +1,233 @@
+'''
+Generador determinista de datos sintéticos para los benchmarks.
+
+Crea usuarios, estrategias, errores, watchlists, trades con varias
+ejecuciones de entrada y salida (transacciones) y velas de 1d y 1m. Todo se
+inserta con sentencias Core por bloques, sin objetos del ORM, así que escala
+hasta 1M de trades. Con la misma semilla y escala los datos son idénticos.
+'''
+import datetime as dt
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, func, select
+
+from ..models import db, User, Strategy, Error, Watchlist, WatchlistEntry, Trade, Transaction, Candle, TradeRollup, trade_errors
+
+START_DATE: dt.date = dt.date(2022, 1, 3)
+CREATED_AT: dt.datetime = dt.datetime(2026, 1, 1)
+CATEGORIES: list[str] = ['psychological', 'technical', 'risk_management', 'execution']
+SEVERITIES: list[str] = ['low', 'medium', 'high']
+# Minutos UTC de cada sesión en las velas de 1m (04:00-20:00 ET en horario de invierno)
+SESSION_MINUTES: dict[str, tuple[int, int]] = {'PRE': (9 * 60, 14 * 60 + 30), 'REG': (14 * 60 + 30, 21 * 60), 'POST': (21 * 60, 25 * 60)}
+
+def businessDays(start:dt.date, count:int) -> np.ndarray:
+    """Los count primeros días laborables desde start"""
+    return np.busday_offset(np.datetime64(start, 'D'), np.arange(count), roll='forward')
+
+def symbolNames(count:int) -> list[str]:
+    return [f'SY{i:03d}' for i in range(count)]
+
+def minuteFrame(symbol:str, days:np.ndarray, rng:np.random.Generator, base:float=None) -> pd.DataFrame:
+    '''
+    Velas de 1m de varios días con el mismo formato que YahooTicker.getPrice
+    (índice en UTC, columnas open, high, low, close, volume y session).
+    '''
+    start, end = SESSION_MINUTES['PRE'][0], SESSION_MINUTES['POST'][1]
+    minutes = np.arange(start, end)
+    dates = (np.asarray(days, dtype='datetime64[D]')[:, None].astype('datetime64[m]') + minutes[None, :]).ravel()
+    n = len(dates)
+
+    base = base or 10 + (sum(map(ord, symbol)) % 190)
+    close = base * np.exp(np.cumsum(rng.normal(0, 0.0008, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    session = np.select([np.tile(minutes, len(days)) < SESSION_MINUTES['REG'][0], np.tile(minutes, len(days)) < SESSION_MINUTES['POST'][0]],
+                        ['PRE', 'REG'], 'POST')
+
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.integers(100, 50000, n).astype(float),
+        'session': session,
+    }, index=pd.DatetimeIndex(dates.astype('datetime64[ns]'), tz='UTC'))
+
+def dailyFrame(symbol:str, days:np.ndarray, rng:np.random.Generator) -> pd.DataFrame:
+    """Velas de 1d de los días dados, con el mismo formato que YahooTicker.getPrice"""
+    n = len(days)
+    base = 10 + (sum(map(ord, symbol)) % 190)
+    close = base * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * np.exp(rng.normal(0, 0.01, n))
+    spread = np.abs(rng.normal(0, 0.01, n)) * close
+
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.integers(10**5, 10**7, n).astype(float),
+        'session': 'REG',
+    }, index=pd.DatetimeIndex(np.asarray(days, dtype='datetime64[D]').astype('datetime64[ns]') + np.timedelta64(14 * 60 + 30, 'm'), tz='UTC'))
+
+def _nextId(table) -> int:
+    return (db.session.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+def _insert(table, rows:list[dict], chunk_size:int=20000):
+    for i in range(0, len(rows), chunk_size):
+        db.session.execute(insert(table), rows[i:i + chunk_size])
+
+def _time(minutes:np.ndarray) -> list[str]:
+    return [f'{m // 60:02d}:{m % 60:02d}:00' for m in minutes.tolist()]
+
+def generate(trades:int=1000, users:int=1, seed:int=0, minute_days:int=5, strategies:int=5, errors:int=10,
+             watchlists:int=2) -> dict:
+    '''
+    Genera el conjunto de datos dentro del contexto de la aplicación y hace commit.
+
+    trades: int
+        Total number of trades (from 1k to 1M), split among the users.
+    users: int
+        Number of users. The first one gets the remainder of the split.
+    seed: int
+        Seed of the generator. Same seed and parameters give the same data.
+    minute_days: int
+        Trading days (the last ones) with 1m candles for every symbol traded that day.
+    strategies, errors, watchlists: int
+        Number of each one per user.
+
+    Returns a dict with the ids and ranges of what was created, used by the suite.
+    '''
+    rng = np.random.default_rng(seed)
+
+    # Tamaño del universo según la escala: más símbolos y más días con más trades
+    symbols = symbolNames(int(np.clip(trades // 2000, 5, 500)))
+    per_day = int(np.clip(trades // 1000, 5, 1000))
+    days = businessDays(START_DATE, -(-trades // per_day))
+
+    user_ids = list(range(_nextId(User.__table__), _nextId(User.__table__) + users))
+    _insert(User.__table__, [{'id': uid, 'username': f'bench{uid}', 'email': f'bench{uid}@example.com', 'password': 'benchmark',
+                              'data_version': 0, 'created_at': CREATED_AT} for uid in user_ids])
+
+    strategy_ids, error_ids, watchlist_ids = {}, {}, {}
+    next_strategy, next_error, next_watchlist = _nextId(Strategy.__table__), _nextId(Error.__table__), _nextId(Watchlist.__table__)
+    for uid in user_ids:
+        strategy_ids[uid] = list(range(next_strategy, next_strategy + strategies))
+        error_ids[uid] = list(range(next_error, next_error + errors))
+        watchlist_ids[uid] = list(range(next_watchlist, next_watchlist + watchlists))
+        next_strategy, next_error, next_watchlist = next_strategy + strategies, next_error + errors, next_watchlist + watchlists
+
+    _insert(Strategy.__table__, [{'id': sid, 'user_id': uid, 'name': f'Strategy {i + 1}', 'description': f'Synthetic strategy {i + 1}',
+                                  'created_at': CREATED_AT} for uid in user_ids for i, sid in enumerate(strategy_ids[uid])])
+    # La descripción de los errores es única en toda la tabla
+    _insert(Error.__table__, [{'id': eid, 'user_id': uid, 'description': f'Synthetic error {eid}', 'category': CATEGORIES[i % len(CATEGORIES)],
+                               'severity': SEVERITIES[i % len(SEVERITIES)], 'is_active': True, 'created_at': CREATED_AT}
+                              for uid in user_ids for i, eid in enumerate(error_ids[uid])])
+    _insert(Watchlist.__table__, [{'id': wid, 'user_id': uid, 'name': f'Watchlist {i + 1}', 'type': 'DAY', 'created_at': CREATED_AT}
+                                  for uid in user_ids for i, wid in enumerate(watchlist_ids[uid])])
+
+    # ===== TRADES =====
+    n = trades
+    owners = rng.permutation(np.repeat(np.array(user_ids), [n // users + (n % users if i == 0 else 0) for i in range(users)]))
+    day = days[np.sort(rng.integers(0, len(days), n))]
+    symbol = np.array(symbols)[rng.integers(0, len(symbols), n)]
+    side = np.where(rng.random(n) < 0.7, 'LONG', 'SHORT')
+    sign = np.where(side == 'LONG', 1, -1)
+
+    entry_minute = rng.integers(SESSION_MINUTES['REG'][0], SESSION_MINUTES['POST'][0] - 5, n)
+    exit_minute = np.minimum(entry_minute + rng.integers(1, 120, n), SESSION_MINUTES['POST'][0] - 1)
+    entry_price = np.round(np.exp(rng.uniform(np.log(2), np.log(300), n)), 2)
+    exit_price = np.round(entry_price * np.exp(rng.normal(0.0005, 0.02, n)), 2)
+    quantity = rng.integers(1, 50, n) * 10.0
+
+    # Varias ejecuciones: 1-3 de entrada y 1-3 de salida, 1$ de comisión cada una
+    entry_fills, exit_fills = rng.integers(1, 4, n), rng.integers(1, 4, n)
+    commission = (entry_fills + exit_fills).astype(float)
+    profit_loss = np.round((exit_price - entry_price) * quantity * sign - commission, 2)
+    move = np.abs(exit_price - entry_price)
+    mfe = np.round(np.where(sign * (exit_price - entry_price) > 0, move, 0) + entry_price * np.abs(rng.normal(0, 0.005, n)), 4)
+    mae = np.round(np.where(sign * (exit_price - entry_price) < 0, move, 0) + entry_price * np.abs(rng.normal(0, 0.005, n)), 4)
+
+    strategy = [strategy_ids[uid][k] if k < strategies else None for uid, k in zip(owners.tolist(), rng.integers(0, strategies + 1, n).tolist())]
+    first_trade = _nextId(Trade.__table__)
+    trade_ids = np.arange(first_trade, first_trade + n)
+    day_list = day.astype(dt.date).tolist()
+    entry_times, exit_times = _time(entry_minute), _time(exit_minute)
+
+    _insert(Trade.__table__, [{
+        'id': tid, 'user_id': uid, 'strategy_id': sid, 'symbol': sym, 'trade_type': tt,
+        'entry_date': d, 'entry_time': et, 'exit_date': d, 'exit_time': xt,
+        'entry_price': ep, 'exit_price': xp, 'quantity': q, 'exit_quantity': q, 'commission': c, 'profit_loss': pl,
+        'mfe': fe, 'mae': ae, 'balance': None, 'created_at': CREATED_AT,
+    } for tid, uid, sid, sym, tt, d, et, xt, ep, xp, q, c, pl, fe, ae in zip(
+        trade_ids.tolist(), owners.tolist(), strategy, symbol.tolist(), side.tolist(), day_list, entry_times, exit_times,
+        entry_price.tolist(), exit_price.tolist(), quantity.tolist(), commission.tolist(), profit_loss.tolist(), mfe.tolist(), mae.tolist())])
+
+    # ===== TRANSACCIONES =====
+    fills = entry_fills + exit_fills
+    owner = np.repeat(np.arange(n), fills)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(fills) - fills, fills)
+    is_entry = position < entry_fills[owner]
+    # Cantidad repartida a partes iguales (la última ejecución lleva el resto)
+    count = np.where(is_entry, entry_fills[owner], exit_fills[owner])
+    index = np.where(is_entry, position, position - entry_fills[owner])
+    share = np.floor(quantity[owner] / count)
+    fill_quantity = np.where(index == count - 1, quantity[owner] - share * (count - 1), share)
+    # Entradas en los primeros minutos del trade, salidas en los últimos
+    span = exit_minute[owner] - entry_minute[owner]
+    minute = np.where(is_entry, entry_minute[owner] + np.minimum(index, span // 2),
+                      exit_minute[owner] - np.minimum(count - 1 - index, span // 2))
+    price = np.round(np.where(is_entry, entry_price[owner], exit_price[owner]) * (1 + rng.normal(0, 0.001, len(owner))), 4)
+    fill_type = np.where(is_entry, side[owner], np.where(side[owner] == 'LONG', 'SHORT', 'LONG'))
+
+    first_transaction = _nextId(Transaction.__table__)
+    _insert(Transaction.__table__, [{
+        'id': first_transaction + i, 'trade_id': tid, 'date': day_list[o], 'time': t, 'price': p, 'quantity': q,
+        'commission': 1.0, 'type': ft, 'created_at': CREATED_AT,
+    } for i, (o, tid, t, p, q, ft) in enumerate(zip(owner.tolist(), trade_ids[owner].tolist(), _time(minute), price.tolist(),
+                                                    fill_quantity.tolist(), fill_type.tolist()))])
+
+    # ===== ERRORES DE LOS TRADES =====
+    # Uno o dos errores en el 20% de los trades
+    flagged = np.flatnonzero(rng.random(n) < 0.2)
+    links = {(int(trade_ids[i]), error_ids[owners[i]][k]) for i in flagged.tolist() for k in rng.choice(errors, rng.integers(1, 3), replace=False).tolist()}
+    _insert(trade_errors, [{'trade_id': tid, 'error_id': eid, 'created_at': CREATED_AT} for tid, eid in sorted(links)])
+
+    # ===== WATCHLISTS =====
+    # Una entrada por símbolo y día en uno de cada 20 trades, abierta cinco días
+    picked = {}
+    for t in range(0, n, 20):
+        picked.setdefault((int(owners[t]), str(symbol[t]), day_list[t]), t)
+    scores = rng.integers(0, 10, len(picked)).astype(float).tolist()
+    first_entry = _nextId(WatchlistEntry.__table__)
+    _insert(WatchlistEntry.__table__, [{
+        'id': first_entry + i, 'watchlist_id': watchlist_ids[uid][i % watchlists], 'symbol': sym, 'date': d,
+        'date_exit': d + dt.timedelta(days=5), 'price': float(entry_price[t]), 'score': scores[i], 'created_at': CREATED_AT,
+    } for i, ((uid, sym, d), t) in enumerate(picked.items())])
+
+    # ===== VELAS =====
+    daily_days = businessDays(START_DATE - dt.timedelta(days=365), len(days) + 261)
+    candles = 0
+    for sym in symbols:
+        candles += Candle.upsertFrame(symbol=sym, timeframe='1d', prices=dailyFrame(sym, daily_days, rng))
+
+    minute_symbols = sorted(set(symbol[day >= days[-minute_days]].tolist()))
+    for sym in minute_symbols:
+        candles += Candle.upsertFrame(symbol=sym, timeframe='1m', prices=minuteFrame(sym, days[-minute_days:], rng))
+
+    db.session.commit()
+    # Los rollups se mantienen en los flush del ORM: tras la carga por Core se regeneran
+    for uid in user_ids:
+        TradeRollup.rebuild(user_id=uid)
+
+    return {
+        'user_ids': user_ids,
+        'trades': n,
+        'transactions': len(owner),
+        'symbols': symbols,
+        'first_day': days[0].astype(dt.date),
+        'last_day': days[-1].astype(dt.date),
+        'minute_days': days[-minute_days:].astype(dt.date).tolist(),
+        'minute_symbols': minute_symbols,
+        'candles': candles,
+    }
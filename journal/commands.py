@@ -0,0 +1,63 @@
+import os
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+candles_cli = AppGroup('candles', help='Gestión del almacén de velas.')
+
+@candles_cli.command('export')
+@click.option('--symbol', default=None, help='Exportar solo este símbolo.')
+@click.option('--timeframe', default=None, help='Exportar solo este timeframe (1m, 1d...).')
+@click.option('--path', default=None, help='Directorio destino. Por defecto CANDLE_STORE_PATH dentro de instance.')
+def export_candles(symbol:str, timeframe:str, path:str):
+    """Exporta las velas de la tabla candle a ficheros columnares .npy (almacén memmap)"""
+    from .src.candle_store import MemmapCandleStore, exportDatabaseCandles
+
+    root = path or os.path.join(current_app.instance_path, current_app.config.get('CANDLE_STORE_PATH', 'candles'))
+    exported = exportDatabaseCandles(store=MemmapCandleStore(root=root), symbol=symbol, timeframe=timeframe)
+
+    for (sym, tf), count in sorted(exported.items()):
+        click.echo(f'{sym} {tf}: {count} velas')
+    click.echo(f'Total: {sum(exported.values())} velas exportadas a {root}')
+    click.echo("Para usarlas, configura CANDLE_STORE = 'memmap'.")
+
+@candles_cli.command('compact')
+@click.option('--vacuum/--no-vacuum', default=True, help='Ejecutar VACUUM al terminar.')
+@click.option('--background', is_flag=True, help='Encolar el trabajo en lugar de ejecutarlo ahora.')
+def compact_candles(vacuum:bool, background:bool):
+    """Aplica la política de retención: compacta las velas de 1m antiguas y borra los símbolos huérfanos"""
+    if background:
+        from .jobs import job_queue
+
+        job = job_queue.enqueue(kind='compact_candles', payload={'vacuum': vacuum})
+        click.echo(f'Trabajo {job.id} encolado')
+        return
+
+    from .src.retention import getCandleRetention
+
+    report = getCandleRetention().run(vacuum=vacuum)
+    click.echo(f"Símbolos procesados: {report['symbols']}")
+    click.echo(f"Velas de 1m compactadas: {report['removed']} -> {report['written']} velas de {current_app.config.get('CANDLE_COMPACT_TIMEFRAME', '1h')}")
+    click.echo(f"Símbolos huérfanos eliminados: {len(report['orphans'])} ({report['orphan_removed']} velas)")
+    click.echo(f"Bytes recuperados: {report['bytes_reclaimed']} ({report['file_bytes_before']} -> {report['file_bytes_after']} en disco)")
+
+rollups_cli = AppGroup('rollups', help='Resúmenes diarios de trades (trade_rollup).')
+
+@rollups_cli.command('rebuild')
+@click.option('--user', 'user_id', type=int, default=None, help='Regenerar solo los de este usuario.')
+def rebuild_rollups(user_id:int):
+    """Regenera los resúmenes diarios desde los trades (se mantienen solos al guardar trades) y calcula los MFE/MAE pendientes"""
+    from .models import Trade, TradeRollup
+
+    written = TradeRollup.rebuild(user_id=user_id)
+    click.echo(f'Resúmenes escritos: {written}')
+    click.echo(f'Trades con MFE/MAE calculados: {Trade.updatePendingExcursions(user_id=user_id)}')
+
+jobs_cli = AppGroup('jobs', help='Cola de trabajos en segundo plano.')
+
+@jobs_cli.command('run')
+def run_jobs():
+    """Ejecuta los trabajos pendientes (también los que quedaron a medias al parar la aplicación)"""
+    from .jobs import job_queue
+
+    click.echo(f'Trabajos ejecutados: {job_queue.runPending()}')
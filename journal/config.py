@@ -15,10 +15,28 @@ class DevConfig:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     APPLICATION_ROOT = '/'  # desarrollo
     STATIC_URL_PATH = '/static'
+    CANDLE_STORE = 'database' # database, memmap
+    CANDLE_STORE_PATH = 'candles'
+    CANDLE_RETENTION_DAYS = 5 # Días de velas de 1m alrededor de cada trade
+    CANDLE_COMPACT_TIMEFRAME = '1h' # Timeframe al que se compacta el resto
+    CANDLE_DROP_ORPHANS = True
+    PERFORMANCE_CACHE_SIZE = 64 # Resultados de performance guardados (LRU)
+    PERFORMANCE_CACHE_PATH = None # Directorio dentro de instance para guardarlos también en disco
+    CHART_MAX_POINTS = 2000 # Puntos máximos de las series largas de los gráficos (equity, drawdown, P&L diario)
+    JOB_RESUME_ON_START = False # Relanzar al arrancar los trabajos pendientes (solo en un proceso; si no, flask jobs run)
 
 class ProdConfig:
     SECRET_KEY = 'tu_clave_secreta_aqui'
     SQLALCHEMY_DATABASE_URI = f"sqlite:///path/trading_journal.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     APPLICATION_ROOT = '/trading-journal'
-    STATIC_URL_PATH = '/trading-journal/static'
\ No newline at end of file
+    STATIC_URL_PATH = '/trading-journal/static'
+    CANDLE_STORE = 'database' # database, memmap
+    CANDLE_STORE_PATH = 'candles'
+    CANDLE_RETENTION_DAYS = 5 # Días de velas de 1m alrededor de cada trade
+    CANDLE_COMPACT_TIMEFRAME = '1h' # Timeframe al que se compacta el resto
+    CANDLE_DROP_ORPHANS = True
+    PERFORMANCE_CACHE_SIZE = 64 # Resultados de performance guardados (LRU)
+    PERFORMANCE_CACHE_PATH = 'performance_cache' # Directorio dentro de instance para guardarlos también en disco
+    CHART_MAX_POINTS = 2000 # Puntos máximos de las series largas de los gráficos (equity, drawdown, P&L diario)
+    JOB_RESUME_ON_START = False # Relanzar al arrancar los trabajos pendientes (solo en un proceso; si no, flask jobs run)
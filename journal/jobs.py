@@ -0,0 +1,172 @@
+import json
+import threading
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+from sqlalchemy import and_, or_
+
+from .models import db, Job
+
+class JobQueue:
+    '''
+    Cola de trabajos en segundo plano persistida en la tabla job.
+
+    Los trabajos se ejecutan en un pool de hilos dentro del propio proceso,
+    que se crea con el primer trabajo encolado. Si fallan se reintentan con
+    backoff exponencial hasta max_attempts. Los que quedan pendientes de un
+    proceso anterior solo se relanzan al arrancar con JOB_RESUME_ON_START (en
+    el único proceso que debe ejecutarlos) o con `flask jobs run`.
+    '''
+
+    def __init__(self, max_workers:int=2, backoff:float=5.0, stale_after:timedelta=timedelta(minutes=10)):
+        self.max_workers: int = max_workers
+        self.backoff: float = backoff
+        self.stale_after: timedelta = stale_after
+        self.handlers: dict[str, callable] = {}
+        self.executor: ThreadPoolExecutor = None
+        self.app: Flask = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app:Flask):
+        self.app = app
+        app.extensions['job_queue'] = self
+
+        # Los comandos (flask db upgrade, flask candles...) y los demás workers no relanzan nada
+        if app.config.get('JOB_RESUME_ON_START', False):
+            with app.app_context():
+                self.resume()
+
+    def getExecutor(self) -> ThreadPoolExecutor:
+        """Pool de hilos, creado la primera vez que hace falta"""
+        with self._lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.app.config.get('JOB_WORKERS', self.max_workers),
+                                                   thread_name_prefix='journal-job')
+            return self.executor
+
+    def register(self, kind:str):
+        """Decorador para registrar la función que ejecuta un tipo de trabajo"""
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def enqueue(self, kind:str, payload:dict, symbol:str=None, user_id:int=None, max_attempts:int=5) -> Job:
+        """Guarda el trabajo y lo lanza. Debe llamarse después de confirmar los datos de los que depende"""
+        job = Job(kind=kind, payload=json.dumps(payload), symbol=symbol, user_id=user_id,
+                  max_attempts=max_attempts, run_after=datetime.now())
+        db.session.add(job)
+        db.session.commit()
+
+        self.submit(job.id)
+        return job
+
+    def submit(self, job_id:int, delay:float=0):
+        if self.app is None:
+            return
+
+        if delay > 0:
+            timer = threading.Timer(delay, self.submit, args=(job_id,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.getExecutor().submit(self._run, job_id)
+
+    def _pending(self) -> list[Job]:
+        """Trabajos pendientes, incluidos los que se quedaron a medias en un proceso anterior"""
+        Job.query.filter(Job.status == 'RUNNING', Job.started_at < datetime.now() - self.stale_after) \
+                 .update({'status': 'PENDING'}, synchronize_session=False)
+        db.session.commit()
+
+        return Job.query.filter(Job.status == 'PENDING').order_by(Job.run_after, Job.id).all()
+
+    def resume(self):
+        """Relanza en el pool los trabajos pendientes"""
+        now = datetime.now()
+        for job in self._pending():
+            self.submit(job.id, delay=max(0, (job.run_after - now).total_seconds()))
+
+    def runPending(self) -> int:
+        '''
+        Ejecuta en este hilo los trabajos pendientes que ya tocan (flask jobs run).
+        Los reintentos quedan pendientes para la siguiente ejecución. Devuelve
+        cuántos se han lanzado.
+        '''
+        jobs = [job.id for job in self._pending() if job.run_after <= datetime.now()]
+        for job_id in jobs:
+            self._run(job_id, retry=False)
+        return len(jobs)
+
+    def _claim(self, job_id:int) -> bool:
+        # Marcado atómico para que dos workers no ejecuten el mismo trabajo
+        claimed = Job.query.filter(Job.id == job_id, Job.status == 'PENDING') \
+                           .update({'status': 'RUNNING', 'started_at': datetime.now(), 'attempts': Job.attempts + 1},
+                                   synchronize_session=False)
+        db.session.commit()
+        return claimed == 1
+
+    def _run(self, job_id:int, retry:bool=True):
+        with self.app.app_context():
+            try:
+                if not self._claim(job_id):
+                    return
+
+                job: Job = db.session.get(Job, job_id)
+                try:
+                    self.handlers[job.kind](**job.arguments)
+                    job.status = 'DONE'
+                    job.last_error = None
+                    job.finished_at = datetime.now()
+                    db.session.commit()
+
+                except Exception as e:
+                    db.session.rollback()
+                    job = db.session.get(Job, job_id)
+                    job.last_error = ''.join(traceback.format_exception_only(e)).strip()
+
+                    if job.attempts < job.max_attempts:
+                        delay = self.backoff * 2 ** (job.attempts - 1)
+                        job.status = 'PENDING'
+                        job.run_after = datetime.now() + timedelta(seconds=delay)
+                        db.session.commit()
+                        if retry:
+                            self.submit(job_id, delay=delay)
+                    else:
+                        job.status = 'FAILED'
+                        job.finished_at = datetime.now()
+                        db.session.commit()
+
+                    print(f'Error ejecutando el trabajo {job_id} ({job.kind}): {e}')
+            finally:
+                db.session.remove()
+
+job_queue = JobQueue()
+
+@job_queue.register('sync_candles')
+def sync_candles_job(symbol:str, config:list[dict[str, str]]):
+    from .routers.utils import sync_candles
+
+    downloaded = sync_candles(db=db, symbol=symbol, config=[{
+        'timeframe': conf['timeframe'],
+        'start': datetime.fromisoformat(conf['start']),
+        'end': datetime.fromisoformat(conf['end']),
+    } for conf in config])
+
+    # Con velas nuevas se regeneran las curvas de equity de los trades afectados
+    from .models import EquityCurveCache, Trade
+    EquityCurveCache.refreshSymbol(symbol)
+
+    # Y las excursiones (MFE/MAE) de sus trades cerrados pendientes o cuyo rango tiene velas de 1m nuevas
+    pending = [Trade.excursions_at.is_(None)]
+    pending += [and_(Trade.entry_date <= gap['end'].date(), Trade.exit_date >= gap['start'].date())
+                for gap in downloaded if gap['timeframe'] == '1m']
+    Trade.updateExcursions(Trade.query.filter(Trade.symbol == symbol, Trade.exit_date.isnot(None), or_(*pending)).all())
+    db.session.commit()
+
+@job_queue.register('compact_candles')
+def compact_candles_job(vacuum:bool=True):
+    from .src.retention import getCandleRetention
+
+    report = getCandleRetention().run(vacuum=vacuum)
+    print(f"Velas compactadas: {report['removed']} -> {report['written']}, {report['bytes_reclaimed']} bytes recuperados")
@@ -14,6 +14,10 @@ from .watchlist_condition import WatchlistCondition
 from .watchlist_entry import WatchlistEntry, watchlist_scoring
 
 from .candle import Candle
+from .candle_coverage import CandleCoverage
 from .error import Error, trade_errors
 from .level import Level, watchlist_levels
-from .media import Media
\ No newline at end of file
+from .media import Media
+from .job import Job
+from .equity_curve import EquityCurveCache
+from .trade_rollup import TradeRollup
@@ -1,9 +1,15 @@
-
 from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+
 from .base import Model, db
 
 class Candle(Model):
     __tablename__ = 'candle'
+    __table_args__ = (
+        # Clave natural de la vela: permite lecturas por rango sobre el índice y upserts
+        db.Index('ix_candle_symbol_timeframe_date', 'symbol', 'timeframe', 'date', unique=True),
+    )
 
     symbol = db.Column(db.String(100), nullable=False)
     date = db.Column(db.DateTime, nullable=False, default=datetime.now(timezone.utc))
@@ -14,7 +20,7 @@ class Candle(Model):
     volume = db.Column(db.Float, nullable=True)
     session = db.Column(db.String, nullable=True, default='REG') # PRE, REG, POST
     timeframe = db.Column(db.String, nullable=False)
-    
+
     def to_dict(self, exclude:list=[]):
         return {
             'id': self.id,
@@ -27,4 +33,103 @@ class Candle(Model):
             'volume': float(self.volume),
             'session': self.session,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def upsert(rows:list[dict], chunk_size:int=500, session=None) -> int:
+        '''
+        Inserta o actualiza velas por lotes con INSERT ... ON CONFLICT DO UPDATE.
+
+        rows: list[dict]
+            Candles with the keys symbol, timeframe, date, open, high, low, close, volume and session.
+        chunk_size: int
+            Number of rows sent on each statement.
+        session:
+            SQLAlchemy session to use. db.session by default.
+        '''
+        if not rows:
+            return 0
+
+        session = session or db.session
+        dialect = session.get_bind().dialect.name
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+
+        stmt = insert(Candle.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['symbol', 'timeframe', 'date'],
+            set_={col: stmt.excluded[col] for col in ['open', 'high', 'low', 'close', 'volume', 'session']}
+        )
+
+        for i in range(0, len(rows), chunk_size):
+            session.execute(stmt, rows[i:i + chunk_size])
+
+        return len(rows)
+
+    @staticmethod
+    def arraysFromFrame(prices) -> dict[str, np.ndarray]:
+        """Columnas de un DataFrame de YahooTicker.getPrice (índice en UTC) como arrays de numpy"""
+        n = 0 if prices is None else len(prices)
+        if n == 0:
+            return {
+                'date': np.array([], dtype='datetime64[s]'),
+                **{col: np.array([], dtype=float) for col in ['open', 'high', 'low', 'close', 'volume']},
+                'session': np.array([], dtype='U4'),
+            }
+
+        index = prices.index.tz_convert(None) if getattr(prices.index, 'tz', None) is not None else prices.index
+        return {
+            'date': index.to_numpy(dtype='datetime64[s]'),
+            **{col: prices[col].to_numpy(dtype=float) if col in prices else np.zeros(n) for col in ['open', 'high', 'low', 'close', 'volume']},
+            'session': prices['session'].to_numpy(dtype='U4') if 'session' in prices else np.full(n, 'REG', dtype='U4'),
+        }
+
+    @staticmethod
+    def upsertArrays(symbol:str, timeframe:str, arrays:dict[str, np.ndarray], chunk_size:int=5000, session=None) -> int:
+        '''
+        Inserta o actualiza velas a partir de arrays columnares sin crear objetos
+        del ORM. En SQLite las fechas se convierten de forma vectorizada al
+        formato de texto que usa SQLAlchemy y las filas van directamente al
+        executemany del driver.
+
+        arrays: dict[str, np.ndarray]
+            Columns date (UTC), open, high, low, close, volume and session.
+        session:
+            SQLAlchemy session to use. db.session by default.
+        '''
+        session = session or db.session
+        n = len(arrays['date'])
+        if n == 0:
+            return 0
+
+        dates = np.asarray(arrays['date'], dtype='datetime64[us]')
+        prices = [np.asarray(arrays[col], dtype=float).tolist() for col in ['open', 'high', 'low', 'close', 'volume']]
+        sessions = np.asarray(arrays['session']).astype(str).tolist()
+
+        if session.get_bind().dialect.name != 'sqlite':
+            rows = [dict(zip(['date', 'open', 'high', 'low', 'close', 'volume', 'session'], values), symbol=symbol, timeframe=timeframe)
+                    for values in zip(dates.astype(datetime).tolist(), *prices, sessions)]
+            return Candle.upsert(rows, chunk_size=chunk_size, session=session)
+
+        # Mismo formato que guarda el tipo DateTime de SQLAlchemy en SQLite, para que el índice único coincida
+        dates = np.char.replace(np.datetime_as_string(dates, unit='us'), 'T', ' ').tolist()
+        created_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+        sql = (
+            'INSERT INTO candle (symbol, timeframe, date, open, high, low, close, volume, session, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (symbol, timeframe, date) DO UPDATE SET open = excluded.open, high = excluded.high, '
+            'low = excluded.low, close = excluded.close, volume = excluded.volume, session = excluded.session'
+        )
+        connection = session.connection()
+        for i in range(0, n, chunk_size):
+            j = min(i + chunk_size, n)
+            connection.exec_driver_sql(sql, list(zip([symbol] * (j - i), [timeframe] * (j - i), dates[i:j],
+                                                     *[col[i:j] for col in prices], sessions[i:j], [created_at] * (j - i))))
+
+        return n
+
+    @staticmethod
+    def upsertFrame(symbol:str, timeframe:str, prices, chunk_size:int=5000, session=None) -> int:
+        """Ingesta directa del DataFrame devuelto por YahooTicker.getPrice"""
+        return Candle.upsertArrays(symbol=symbol, timeframe=timeframe, arrays=Candle.arraysFromFrame(prices),
+                                   chunk_size=chunk_size, session=session)
@@ -0,0 +1,105 @@
+import re
+from datetime import datetime, timedelta
+
+from .base import Model, db
+
+TIMEFRAME_UNITS: dict[str, timedelta] = {
+    'm': timedelta(minutes=1),
+    'h': timedelta(hours=1),
+    'd': timedelta(days=1),
+    'wk': timedelta(weeks=1),
+    'mo': timedelta(days=30),
+}
+
+def timeframeDelta(timeframe:str) -> timedelta:
+    """Duración de una vela del timeframe (1m, 5m, 1h, 1d, 1wk, 1mo...)"""
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', timeframe)
+    if not match:
+        return timedelta(minutes=1)
+    return int(match.group(1)) * TIMEFRAME_UNITS[match.group(2)]
+
+class CandleCoverage(Model):
+    '''
+    Intervalos de tiempo ya descargados para cada (symbol, timeframe).
+
+    Los intervalos de un mismo símbolo y timeframe nunca se solapan: al añadir
+    uno nuevo se fusiona con los que toca.
+    '''
+    __tablename__ = 'candle_coverage'
+    __table_args__ = (
+        db.Index('ix_candle_coverage_symbol_timeframe', 'symbol', 'timeframe', 'start_date'),
+    )
+
+    symbol = db.Column(db.String(100), nullable=False)
+    timeframe = db.Column(db.String, nullable=False)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+
+    def to_dict(self, exclude:list=[]):
+        return {
+            'id': self.id,
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    @staticmethod
+    def _overlapping(symbol:str, timeframe:str, start:datetime, end:datetime) -> list['CandleCoverage']:
+        return CandleCoverage.query.filter(
+            CandleCoverage.symbol == symbol,
+            CandleCoverage.timeframe == timeframe,
+            CandleCoverage.start_date <= end,
+            CandleCoverage.end_date >= start
+        ).order_by(CandleCoverage.start_date).all()
+
+    @staticmethod
+    def missing(symbol:str, timeframe:str, start:datetime, end:datetime) -> list[tuple[datetime, datetime]]:
+        """Subintervalos de [start, end] que no están cubiertos. Se ignoran los huecos menores que una vela"""
+        tolerance = timeframeDelta(timeframe)
+        gaps = []
+        cursor = start
+
+        for interval in CandleCoverage._overlapping(symbol, timeframe, start, end):
+            if interval.start_date - cursor >= tolerance:
+                gaps.append((cursor, interval.start_date))
+            cursor = max(cursor, interval.end_date)
+
+        if end - cursor >= tolerance:
+            gaps.append((cursor, end))
+
+        return gaps
+
+    @staticmethod
+    def add(symbol:str, timeframe:str, start:datetime, end:datetime) -> 'CandleCoverage':
+        """Registra [start, end] como descargado fusionándolo con los intervalos contiguos"""
+        tolerance = timeframeDelta(timeframe)
+        intervals = CandleCoverage._overlapping(symbol, timeframe, start - tolerance, end + tolerance)
+
+        for interval in intervals:
+            start = min(start, interval.start_date)
+            end = max(end, interval.end_date)
+            db.session.delete(interval)
+
+        coverage = CandleCoverage(symbol=symbol, timeframe=timeframe, start_date=start, end_date=end)
+        db.session.add(coverage)
+
+        return coverage
+
+    @staticmethod
+    def remove(symbol:str, timeframe:str, start:datetime=None, end:datetime=None):
+        """Quita [start, end] de los intervalos descargados (todo si no se indica rango)"""
+        query = CandleCoverage.query.filter(CandleCoverage.symbol == symbol, CandleCoverage.timeframe == timeframe)
+        if start is None and end is None:
+            query.delete(synchronize_session=False)
+            return
+
+        start = start or datetime.min
+        end = end or datetime.max
+        for interval in CandleCoverage._overlapping(symbol, timeframe, start, end):
+            if interval.start_date < start:
+                db.session.add(CandleCoverage(symbol=symbol, timeframe=timeframe, start_date=interval.start_date, end_date=start))
+            if interval.end_date > end:
+                db.session.add(CandleCoverage(symbol=symbol, timeframe=timeframe, start_date=end, end_date=interval.end_date))
+            db.session.delete(interval)
@@ -0,0 +1,164 @@
+import io
+import hashlib
+from datetime import datetime, timedelta
+import numpy as np
+
+from .base import Model, db
+from .candle_coverage import CandleCoverage
+from .transaction import Transaction
+
+class EquityCurveCache(Model):
+    '''
+    Curva de equity precalculada de cada trade en formato columnar (npz comprimido).
+
+    content_hash resume las transacciones y la cobertura de velas de 1m usadas
+    para calcularla: si alguna de las dos cambia la curva se vuelve a generar.
+    '''
+    __tablename__ = 'equity_curve_cache'
+
+    trade_id = db.Column(db.Integer, db.ForeignKey('trade.id', ondelete='CASCADE'), nullable=False, unique=True, index=True)
+    content_hash = db.Column(db.String(40), nullable=False)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    trade = db.relationship('Trade', back_populates='equity_cache')
+
+    def to_dict(self, exclude:list=[]):
+        return {
+            'id': self.id,
+            'trade_id': self.trade_id,
+            'content_hash': self.content_hash,
+            'points': self.points,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    @staticmethod
+    def encode(arrays:dict[str, np.ndarray]) -> bytes:
+        buffer = io.BytesIO()
+        if arrays:
+            arrays = {**arrays, 'datetime': np.asarray(arrays['datetime'], dtype='datetime64[s]').astype(np.int64)}
+        np.savez_compressed(buffer, **arrays)
+        return buffer.getvalue()
+
+    @staticmethod
+    def decode(data:bytes) -> dict[str, np.ndarray]:
+        with np.load(io.BytesIO(data)) as npz:
+            arrays = {col: npz[col] for col in npz.files}
+        if arrays:
+            arrays['datetime'] = arrays['datetime'].astype('datetime64[s]')
+        return arrays
+
+    @property
+    def arrays(self) -> dict[str, np.ndarray]:
+        return EquityCurveCache.decode(self.data)
+
+    def getPoints(self, max_points:int=None) -> list[dict]:
+        from ..src.equity import equityPoints
+
+        return equityPoints(self.arrays, symbol=self.trade.symbol, max_points=max_points) if self.points else []
+
+    @staticmethod
+    def contentHash(trade) -> str:
+        """Hash de lo que determina la curva: tipo, transacciones y cobertura de 1m dentro de la ventana del trade"""
+        return EquityCurveCache.contentHashes([trade])[trade.id]
+
+    @staticmethod
+    def contentHashes(trades:list, chunk_size:int=500) -> dict[int, str]:
+        '''
+        contentHash de varios trades con una consulta de transacciones (por
+        bloques de ids) y otra de la cobertura de 1m de sus símbolos.
+        '''
+        ids = [trade.id for trade in trades]
+        transactions = {trade_id: [] for trade_id in ids}
+        for i in range(0, len(ids), chunk_size):
+            for tx in Transaction.query.filter(Transaction.trade_id.in_(ids[i:i + chunk_size])) \
+                    .order_by(Transaction.trade_id, Transaction.date, Transaction.time, Transaction.id).all():
+                transactions[tx.trade_id].append(tx)
+
+        coverage = {}
+        symbols = {trade.symbol for trade in trades}
+        if symbols:
+            for interval in CandleCoverage.query.filter(CandleCoverage.symbol.in_(symbols), CandleCoverage.timeframe == '1m') \
+                    .order_by(CandleCoverage.start_date).all():
+                coverage.setdefault(interval.symbol, []).append(interval)
+
+        hashes = {}
+        for trade in trades:
+            content = hashlib.sha1(f'{trade.symbol}|{trade.trade_type}'.encode())
+            for tx in transactions[trade.id]:
+                content.update(f'|{tx.date}T{tx.time}|{tx.type}|{tx.price}|{tx.quantity}|{tx.commission}'.encode())
+
+            if transactions[trade.id] and trade.entry_date and trade.exit_date:
+                start = datetime.combine(trade.entry_date, datetime.strptime(trade.entry_time, '%H:%M:%S').time())
+                end = datetime.combine(trade.exit_date, datetime.strptime(trade.exit_time, '%H:%M:%S').time()) + timedelta(minutes=1)
+                # Solo cuenta la parte de la cobertura que cae dentro de la ventana del trade
+                for interval in coverage.get(trade.symbol, []):
+                    if interval.start_date <= end and interval.end_date >= start:
+                        content.update(f'|{max(interval.start_date, start)}-{min(interval.end_date, end)}'.encode())
+
+            hashes[trade.id] = content.hexdigest()
+
+        return hashes
+
+    @staticmethod
+    def build(trade, content_hash:str=None, candles:dict=None) -> 'EquityCurveCache':
+        """Calcula la curva del trade y la guarda (no hace commit)"""
+        content_hash = content_hash or EquityCurveCache.contentHash(trade)
+        arrays = trade.getEquityArrays(candles=candles)
+        cache = trade.equity_cache or EquityCurveCache(trade=trade)
+        cache.content_hash = content_hash
+        cache.points = len(arrays['datetime']) if arrays else 0
+        cache.data = EquityCurveCache.encode(arrays)
+        cache.updated_at = datetime.now()
+        db.session.add(cache)
+
+        return cache
+
+    @staticmethod
+    def refresh(trade) -> 'EquityCurveCache':
+        """Regenera la curva solo si han cambiado las transacciones o las velas"""
+        content_hash = EquityCurveCache.contentHash(trade)
+        if trade.equity_cache is not None and trade.equity_cache.content_hash == content_hash:
+            return trade.equity_cache
+
+        return EquityCurveCache.build(trade, content_hash=content_hash)
+
+    @staticmethod
+    def refreshTrades(trades:list, chunk_size:int=500) -> int:
+        '''
+        Regenera las curvas desactualizadas de varios trades cerrados con una
+        consulta de hashes, contentHashes y una lectura de velas para todos los
+        que hay que regenerar. Los trades quedan marcados para que getEquity no
+        vuelva a comprobarlos. No hace commit. Devuelve cuántas se han regenerado.
+        '''
+        from .trade import Trade
+
+        trades = [trade for trade in trades if trade.exit_date is not None]
+        hashes = EquityCurveCache.contentHashes(trades, chunk_size=chunk_size)
+        ids = [trade.id for trade in trades]
+        cached = {}
+        for i in range(0, len(ids), chunk_size):
+            cached.update(db.session.query(EquityCurveCache.trade_id, EquityCurveCache.content_hash)
+                          .filter(EquityCurveCache.trade_id.in_(ids[i:i + chunk_size])).all())
+        stale = [trade for trade in trades if cached.get(trade.id) != hashes[trade.id]]
+
+        # Las velas de todos los trades a regenerar se leen de una vez
+        candles = Trade.loadCandles(stale)
+        for trade in stale:
+            EquityCurveCache.build(trade, content_hash=hashes[trade.id], candles=candles[trade])
+        for trade in trades:
+            trade._equity_checked = True
+
+        return len(stale)
+
+    @staticmethod
+    def refreshSymbol(symbol:str) -> int:
+        """Revisa las curvas de todos los trades cerrados del símbolo. Devuelve cuántas se han regenerado"""
+        from .trade import Trade
+
+        refreshed = EquityCurveCache.refreshTrades(Trade.query.filter(Trade.symbol == symbol, Trade.exit_date.isnot(None)).all())
+        db.session.commit()
+
+        return refreshed
@@ -1,5 +1,7 @@
 
+from collections import defaultdict
 from datetime import date, datetime, timezone
+from sqlalchemy import case, func
 
 from .base import Model, db
 
@@ -37,17 +39,121 @@ class Error(Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
     
+    @staticmethod
+    def emptyImpact() -> dict:
+        """Resumen de un error sin trades"""
+        return {'frequency': 0, 'last_occurrence': None, 'last_exit': None, 'total_loss': 0.0,
+                'losing_trades': 0, 'average_impact': 0.0, 'avg_loss': 0.0, 'recent_trades': []}
+
+    @staticmethod
+    def impactSummary(user_id:int, error_ids:list[int]=None, recent:int=5) -> dict[int, dict]:
+        '''
+        Frecuencia, última ocurrencia, pérdidas y trades más recientes de cada
+        error del usuario con una sola consulta agrupada sobre trade_error ⨝ trade.
+        Los agregados se calculan con funciones de ventana por error y solo se
+        devuelven las primeras filas de cada uno por fecha de entrada.
+
+        user_id: int
+            Owner of the errors.
+        error_ids: list[int]
+            Only these errors. All the user's errors by default.
+        recent: int
+            Number of most recent trades to return per error.
+        '''
+        from .trade import Trade
+
+        window = {'partition_by': trade_errors.c.error_id}
+        loss = case((Trade.profit_loss < 0, Trade.profit_loss), else_=0)
+        ranked = db.select(
+            trade_errors.c.error_id,
+            Trade.id.label('trade_id'), Trade.symbol, Trade.entry_date, Trade.profit_loss,
+            func.row_number().over(order_by=(Trade.entry_date.desc(), Trade.id.desc()), **window).label('position'),
+            func.count().over(**window).label('frequency'),
+            func.max(Trade.entry_date).over(**window).label('last_occurrence'),
+            func.max(Trade.exit_date).over(**window).label('last_exit'),
+            func.sum(loss).over(**window).label('total_loss'),
+            func.sum(case((Trade.profit_loss < 0, 1), else_=0)).over(**window).label('losing_trades'),
+        ).join(Trade, Trade.id == trade_errors.c.trade_id) \
+         .join(Error, Error.id == trade_errors.c.error_id).where(Error.user_id == user_id)
+        if error_ids is not None:
+            ranked = ranked.where(trade_errors.c.error_id.in_(error_ids))
+        ranked = ranked.subquery()
+
+        # Al menos una fila por error para tener sus agregados
+        rows = db.session.execute(db.select(ranked).where(ranked.c.position <= max(recent, 1))
+                                  .order_by(ranked.c.error_id, ranked.c.position)).all()
+
+        summary = {}
+        for row in rows:
+            if row.error_id not in summary:
+                total_loss = float(row.total_loss or 0)
+                summary[row.error_id] = {
+                    'frequency': row.frequency,
+                    'last_occurrence': row.last_occurrence,
+                    'last_exit': row.last_exit,
+                    'total_loss': total_loss,
+                    'losing_trades': row.losing_trades or 0,
+                    'average_impact': total_loss / row.frequency,
+                    'avg_loss': total_loss / row.losing_trades if row.losing_trades else 0.0,
+                    'recent_trades': [],
+                }
+            if row.position <= recent:
+                summary[row.error_id]['recent_trades'].append({'id': row.trade_id, 'symbol': row.symbol,
+                                                               'entry_date': row.entry_date, 'profit_loss': row.profit_loss})
+        return summary
+
+    @staticmethod
+    def loadImpact(errors:list['Error'], recent:int=5) -> list['Error']:
+        '''
+        Carga con una consulta el resumen de impacto de todos los errores (de un
+        mismo usuario) para que las propiedades no recorran error.trades.
+        '''
+        if errors:
+            summary = Error.impactSummary(errors[0].user_id, recent=recent)
+            for error in errors:
+                error._impact = summary.get(error.id) or Error.emptyImpact()
+        return errors
+
+    @staticmethod
+    def tradeSummaries(error_ids:list[int]) -> dict[int, list[dict]]:
+        """Trades de varios errores con solo las columnas que muestran las vistas, con una consulta"""
+        from .trade import Trade
+        from .strategy import Strategy
+
+        rows = db.session.execute(db.select(
+            trade_errors.c.error_id, Trade.id, Trade.entry_date, Trade.symbol, Trade.profit_loss,
+            Strategy.id.label('strategy_id'), Strategy.name.label('strategy_name'), Strategy.description.label('strategy_description')
+        ).join(Trade, Trade.id == trade_errors.c.trade_id).outerjoin(Strategy, Strategy.id == Trade.strategy_id) \
+         .where(trade_errors.c.error_id.in_(error_ids)).order_by(trade_errors.c.error_id, Trade.entry_date.desc(), Trade.id.desc())).all()
+
+        trades = defaultdict(list)
+        for row in rows:
+            trades[row.error_id].append({
+                'id': row.id,
+                'entry_date': row.entry_date.isoformat() if row.entry_date else None,
+                'symbol': row.symbol,
+                'profit_loss': row.profit_loss,
+                'strategy': {} if row.strategy_id is None else {'id': row.strategy_id, 'name': row.strategy_name,
+                                                                'description': row.strategy_description},
+            })
+        return trades
+
+    @property
+    def impact(self) -> dict:
+        """Resumen de impacto (Error.impactSummary), cargado con Error.loadImpact o calculado para este error"""
+        if getattr(self, '_impact', None) is None:
+            self._impact = Error.impactSummary(self.user_id, error_ids=[self.id]).get(self.id) or Error.emptyImpact()
+        return self._impact
+
     @property
     def occurrence_count(self):
         """Cuenta cuántas veces ha ocurrido este error"""
-        return len(self.trades)
+        return self.impact['frequency']
     
     @property
     def last_occurrence(self):
         """Fecha de la última ocurrencia del error"""
-        if not self.trades:
-            return None
-        return max(trade.entry_date for trade in self.trades)
+        return self.impact['last_occurrence']
     
     @property
     def days_since_last_occurrence(self):
@@ -60,15 +166,17 @@ class Error(Model):
     @property
     def recent_examples(self):
         """Últimos 5 trades con este error"""
-        return sorted(self.trades, key=lambda t: t.entry_date, reverse=True)[:5]
+        return self.impact['recent_trades'][:5]
+    
+    @property
+    def total_loss(self):
+        """Suma de las pérdidas de los trades con este error"""
+        return self.impact['total_loss']
     
     @property
     def average_impact(self):
         """Impacto promedio en P&L de este error"""
-        if not self.trades:
-            return 0
-        total_loss = sum(trade.profit_loss for trade in self.trades if trade.profit_loss < 0)
-        return total_loss / len(self.trades) if self.trades else 0
+        return self.impact['average_impact']
     
     def __repr__(self):
         return f'<Error {self.description}>'
@@ -1,14 +1,14 @@
 
 from datetime import datetime, date, timedelta, timezone
 import pytz
-import pandas as pd
-from sqlalchemy import and_
+from sqlalchemy import and_, event, inspect, update
 
 from .base import Model, db
 from .error import Error, trade_errors
 from .transaction import Transaction
 from .strategy_condition import StrategyCondition
 from .candle import Candle
+from .user import User
 
 # Tabla de asociación para la relación muchos a muchos entre Watchlist y Level
 trade_scoring = db.Table('trade_scoring',
@@ -20,6 +20,9 @@ trade_scoring = db.Table('trade_scoring',
 
 class Trade(Model):
     __tablename__ = 'trade'
+    __table_args__ = (
+        db.Index('ix_trade_user_exit_date', 'user_id', 'exit_date'),
+    )
 
     entry_date = db.Column(db.Date)
     exit_date = db.Column(db.Date)
@@ -42,16 +45,33 @@ class Trade(Model):
     profit_loss = db.Column(db.Float, default=0)
     hashtags = db.Column(db.String(500)) # TODO: Define table for hashtags?
     strategy_id = db.Column(db.Integer, db.ForeignKey('strategy.id'))
+    # Maximum Favorable/Adverse Excursion en precio y en R (se calculan con las velas de 1m)
+    mfe = db.Column(db.Float)
+    mae = db.Column(db.Float)
+    mfe_r = db.Column(db.Float)
+    mae_r = db.Column(db.Float)
+    # Cuándo se calcularon (también si no había velas): None si hay que calcularlas
+    excursions_at = db.Column(db.DateTime)
     
     strategy = db.relationship('Strategy', back_populates='trades')
     errors = db.relationship('Error', secondary='trade_error', back_populates='trades')
     conditions = db.relationship('StrategyCondition', secondary='trade_scoring', back_populates='trades')
     media = db.relationship('Media', back_populates='trade', cascade='all, delete-orphan', lazy='dynamic')
     transactions = db.relationship('Transaction', back_populates='trade', cascade='all, delete-orphan', lazy='dynamic')
+    equity_cache = db.relationship('EquityCurveCache', back_populates='trade', cascade='all, delete-orphan', uselist=False)
     
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship('User', back_populates='trades')
 
+    # Columnas que necesitan las estadísticas (sin los textos largos de las notas)
+    ANALYTICS_COLUMNS: tuple[str] = ('id', 'user_id', 'strategy_id', 'symbol', 'trade_type', 'entry_date', 'entry_time',
+                                     'exit_date', 'exit_time', 'entry_price', 'exit_price', 'stop_loss', 'quantity',
+                                     'exit_quantity', 'commission', 'profit_loss', 'mfe', 'mae', 'mfe_r', 'mae_r',
+                                     'excursions_at')
+    # Columnas de las que dependen MFE/MAE: si cambian hay que recalcularlas
+    EXCURSION_COLUMNS: tuple[str] = ('symbol', 'trade_type', 'entry_date', 'entry_time', 'exit_date', 'exit_time',
+                                     'entry_price', 'stop_loss')
+
     def __init__(self, **kwargs):
         # Convertir cadenas vacías a None para campos float
         float_fields: list[str] = ['entry_price', 'exit_price', 'stop_loss', 'take_profit', 
@@ -86,13 +106,17 @@ class Trade(Model):
             'profit_loss': self.profit_loss,
             'hashtags': self.hashtags,
             'strategy_id': self.strategy_id,
-            'strategy': {} if 'strategy' in exclude else self.strategy.to_dict(exclude=['trades']+exclude),
+            'mfe': self.mfe,
+            'mae': self.mae,
+            'mfe_r': self.mfe_r,
+            'mae_r': self.mae_r,
+            'strategy': {} if 'strategy' in exclude or self.strategy is None else self.strategy.to_dict(exclude=['trades']+exclude),
             'media': [] if 'media' in exclude else [m.to_dict(exclude=['trade']+exclude) for m in self.media],
             'errors': [] if 'errors' in exclude else [e.to_dict(exclude=['trades']+exclude) for e in self.errors],
             'conditions': [] if 'conditions' in exclude else [c.to_dict(exclude=['trades', 'strategy']+exclude) for c in self.conditions],
             'transactions': [] if 'transactions' in exclude else [c.to_dict(exclude=['trade']+exclude) for c in self.transactions],
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'equity': self.equity_curve() if equity else [],
+            'equity': self.getEquity() if equity else [],
         }
     
     @property
@@ -179,6 +203,7 @@ class Trade(Model):
                     impact_level=impact_level
                 )
             )
+            self._bumpDataVersion()
         
         db.session.commit()
     
@@ -190,10 +215,13 @@ class Trade(Model):
     
     def remove_errors(self):
         """Remover un level de este trade"""
+        removed = 0
         for error in self.errors:
-            db.session.execute(
+            removed += db.session.execute(
                 trade_errors.delete().where(and_(trade_errors.c.error_id == error.id, trade_errors.c.trade_id == self.id))
-            )
+            ).rowcount
+        if removed:
+            self._bumpDataVersion()
             
         db.session.commit()
     
@@ -227,28 +255,34 @@ class Trade(Model):
                     value=float(value),
                 )
             )
+            self._bumpDataVersion()
 
         db.session.commit()
 
     def remove_conditions(self):
+        removed = 0
         for condition in self.conditions:
-            db.session.execute(
+            removed += db.session.execute(
                 trade_scoring.delete().where(and_(trade_scoring.c.scoring_id == condition.id, trade_scoring.c.trade_id == self.id))
-            )
+            ).rowcount
+        if removed:
+            self._bumpDataVersion()
         
         db.session.commit()
+    
+    def _bumpDataVersion(self):
+        """Sube la versión de datos del usuario: las tablas de enlace se escriben sin pasar por el flush del ORM"""
+        User.bumpDataVersion(db.session.connection(), user_ids={self.user_id})
 
     def getCandles(self, timeframe='1m') -> list[Candle]:
         
         start_datetime = datetime.combine(self.entry_date, datetime.strptime(self.entry_time, '%H:%M:%S').time())
         end_datetime = datetime.combine(self.exit_date, datetime.strptime(self.exit_time, '%H:%M:%S').time())
 
-        candles = Candle.query.filter(
-            Candle.symbol == self.symbol,
-            Candle.date >= start_datetime,
-            Candle.date <= end_datetime + timedelta(minutes=1),
-            Candle.timeframe == timeframe
-        ).all()
+        from ..src.candle_store import getCandleStore
+
+        candles = getCandleStore().getCandles(symbol=self.symbol, timeframe=timeframe,
+                                              start=start_datetime, end=end_datetime + timedelta(minutes=1))
 
         if not candles:
             print(f'No candles data between {start_datetime} and {end_datetime}')
@@ -256,6 +290,24 @@ class Trade(Model):
         
         return candles
     
+    def getCandleArrays(self, timeframe='1m') -> dict:
+        """Igual que getCandles pero en formato columnar (arrays de numpy)"""
+        from ..src.candle_store import getCandleStore
+
+        start_datetime = datetime.combine(self.entry_date, datetime.strptime(self.entry_time, '%H:%M:%S').time())
+        end_datetime = datetime.combine(self.exit_date, datetime.strptime(self.exit_time, '%H:%M:%S').time())
+
+        return getCandleStore().getArrays(symbol=self.symbol, timeframe=timeframe,
+                                          start=start_datetime, end=end_datetime + timedelta(minutes=1))
+    
+    @staticmethod
+    def loadCandles(trades:list['Trade'], timeframe:str='1m', window=None):
+        """CandleBatchLoader con las velas de todos los trades, leídas con el mínimo de consultas"""
+        from ..src.candle_batch import CandleBatchLoader
+        from ..src.candle_store import getCandleStore
+
+        return CandleBatchLoader(trades, store=getCandleStore(), timeframe=timeframe, window=window).load()
+
     def get_transaction_datetime(self, tx:Transaction) -> datetime:
         # Combinar fecha (date) con hora UTC (time)
         time_str = tx.time or '00:00:00'
@@ -277,208 +329,146 @@ class Trade(Model):
 
         return start_datetime, end_datetime, sorted_transactions
     
-    def equity_curve(self, initial_balance: float = 0):
+    def _equityCurve(self, initial_balance: float = 0, candles:dict=None):
+        from ..src.equity import EquityCurve
+
+        _, _, sorted_transactions = self.getStartEndDatetime()
+        if candles is None:
+            candles = self.getCandleArrays(timeframe='1m')
+
+        transactions = [{
+            'datetime': self.get_transaction_datetime(tx),
+            'type': tx.type,
+            'price': tx.price,
+            'quantity': tx.quantity,
+            'commission': tx.commission,
+        } for tx in sorted_transactions]
+
+        return EquityCurve(trade_type=self.trade_type, symbol=self.symbol, transactions=transactions,
+                           candle_dates=candles['date'], candle_closes=candles['close'],
+                           initial_balance=initial_balance)
+
+    def equity_curve(self, initial_balance: float = 0, max_points:int=None):
         if not self.transactions:
             return []
 
-        start_datetime, end_datetime, sorted_transactions = self.getStartEndDatetime()
-
-        # Buscar candles en el rango (date ya es datetime con UTC)
-        candles = self.getCandles(timeframe='1m')
-
-        # Preparar DataFrame de candles
-        df_candles = pd.DataFrame([c.to_dict() for c in candles])
-        # date ya es datetime UTC, solo necesitamos asegurar que es datetime
-        df_candles['datetime'] = pd.to_datetime(df_candles['date'], utc=True)
-        df_candles.set_index('datetime', inplace=True)
-        df_candles.sort_index(inplace=True)
-
-        # Crear lista de transacciones con datetime completo
-        transactions_with_dt = []
-        for tx in sorted_transactions:
-            tx_dt = self.get_transaction_datetime(tx)
-            transactions_with_dt.append({
-                'datetime': tx_dt,
-                'transaction': tx
-            })
-
-        equity_points = []
-        cash_balance = initial_balance  # Dinero en efectivo disponible
-        position = 0  # Cantidad de acciones/contratos
-        avg_price = 0  # Precio promedio de entrada
-        commission_total = 0
-        tx_index = 0
-        
-        # Inicializar current_time
-        current_time = start_datetime # + timedelta(minutes=1)
-
-        while current_time <= end_datetime:
-            # Ejecutar transacciones hasta este momento
-            while tx_index < len(transactions_with_dt):
-                tx_data = transactions_with_dt[tx_index]
-                tx_time = tx_data['datetime']
-                tx: Transaction = tx_data['transaction']
-                
-                if tx_time > current_time:
-                    break
-
-                commission = tx.commission or 0
-                commission_total += commission
-                cash_balance -= commission  # Las comisiones siempre reducen el cash
-
-                if tx.type == self.trade_type:  # Transacción de entrada (compra para LONG, venta para SHORT)
-                    if self.trade_type == 'LONG':
-                        # COMPRA: gastamos dinero, aumentamos posición
-                        cost = tx.price * tx.quantity
-                        cash_balance -= cost
-                        
-                        if position > 0:
-                            # Recalcular precio promedio ponderado
-                            total_cost = avg_price * position + tx.price * tx.quantity
-                            position += tx.quantity
-                            avg_price = total_cost / position
-                        else:
-                            position = tx.quantity
-                            avg_price = tx.price
-                            
-                    else:  # SHORT
-                        # VENTA EN CORTO: recibimos dinero, aumentamos posición corta
-                        proceeds = tx.price * tx.quantity
-                        cash_balance += proceeds
-                        
-                        if position > 0:
-                            # Recalcular precio promedio ponderado para posición corta
-                            total_proceeds = avg_price * position + tx.price * tx.quantity
-                            position += tx.quantity
-                            avg_price = total_proceeds / position
-                        else:
-                            position = tx.quantity
-                            avg_price = tx.price
-                            
-                else:  # Transacción de salida (venta para LONG, compra para SHORT)
-                    if self.trade_type == 'LONG':
-                        # VENTA: recibimos dinero, reducimos posición
-                        proceeds = tx.price * tx.quantity
-                        cash_balance += proceeds
-                        position -= tx.quantity
-                        
-                    else:  # SHORT
-                        # COMPRA PARA CERRAR CORTO: gastamos dinero, reducimos posición corta
-                        cost = tx.price * tx.quantity
-                        cash_balance -= cost
-                        position -= tx.quantity
-                    
-                    if position <= 0:
-                        position = 0
-                        avg_price = 0
-
-                tx_index += 1
-
-            # Obtener precio actual de las candles
-            current_price = self._get_price_at_time(df_candles, current_time)
-            if current_price is None and avg_price > 0:
-                current_price = avg_price
-
-            # Calcular valor de la posición actual
-            position_value = 0
-            if position > 0 and current_price is not None:
-                if self.trade_type == 'LONG':
-                    # Para LONG: valor = precio_actual * cantidad
-                    position_value = current_price * position
-                else:  # SHORT
-                    # Para SHORT: valor = (precio_entrada - precio_actual) * cantidad + precio_entrada * cantidad
-                    # Simplificado: valor = (2 * precio_entrada - precio_actual) * cantidad
-                    position_value = (2 * avg_price - current_price) * position
-
-            # El balance total es el cash más el valor de la posición
-            total_balance = cash_balance + position_value
-            
-            # PnL realizado es la diferencia entre cash actual e inicial (menos comisiones)
-            realized_pnl = cash_balance - initial_balance
-            
-            # PnL no realizado es el valor de la posición menos lo que costó/se recibió originalmente
-            unrealized_pnl = 0
-            if position > 0 and current_price is not None:
-                if self.trade_type == 'LONG':
-                    unrealized_pnl = (current_price - avg_price) * position
-                else:  # SHORT
-                    unrealized_pnl = (avg_price - current_price) * position
-
-            # Guardar punto de la curva
-            equity_points.append({
-                'datetime': current_time.isoformat(),
-                'date': current_time.date().isoformat(),
-                'time': current_time.time().strftime('%H:%M:%S'),
-                'balance': total_balance,
-                'cash_balance': cash_balance,
-                'position_value': position_value,
-                'realized_pnl': realized_pnl,
-                'unrealized_pnl': unrealized_pnl,
-                'total_pnl': total_balance - initial_balance,
-                'commission': commission_total,
-                'position_size': position,
-                'avg_price': avg_price,
-                'current_price': current_price,
-                'symbol': self.symbol
-            })
-
-            current_time += timedelta(minutes=1)
-
-        return equity_points
-
-    def _get_price_at_time(self, df_candles, target_time):
-        """
-        Obtiene el precio más cercano al tiempo objetivo.
-        
-        Args:
-            df_candles (DataFrame): DataFrame con velas indexado por datetime UTC
-            target_time (datetime): Tiempo objetivo en UTC
-            
-        Returns:
-            float: Precio de cierre más cercano
-        """
-        if df_candles.empty:
-            return None
-        
-        # Asegurar que target_time tiene timezone UTC
-        if target_time.tzinfo is None:
-            target_time = target_time.replace(tzinfo=timezone.utc)
-        
-        try:
-            # Buscar el precio exacto
-            if target_time in df_candles.index:
-                return float(df_candles.loc[target_time, 'close'])
-            
-            # Buscar el precio más cercano (anterior)
-            before = df_candles[df_candles.index <= target_time]
-            if not before.empty:
-                return float(before.iloc[-1]['close'])
-            
-            # Si no hay precios anteriores, usar el siguiente
-            after = df_candles[df_candles.index > target_time]
-            if not after.empty:
-                return float(after.iloc[0]['close'])
-                
-        except Exception as e:
-            print(f"Error getting price at time {target_time}: {e}")
-            pass
-        
-        return None
-    
-    def maximumFavorableAverse(self) -> tuple[float, float]:
-        
-        if not self.transactions:
-            return 0.0, 0.0
-        
-        # Obtener precios de entrada y salida
-        entry_price = self.entry_price
-        exit_price = self.exit_price
-        candles: list[Candle] = self.getCandles(timeframe='1m')
-        
-        if entry_price is None or exit_price is None:
-            return 0.0, 0.0
+        return self._equityCurve(initial_balance=initial_balance).getPoints(max_points=max_points)
+
+    def getEquityArrays(self, candles:dict=None) -> dict:
+        """Curva de equity en formato columnar ({} si no hay transacciones). candles evita la consulta si ya están cargadas"""
+        if not self.transactions.count():
+            return {}
+
+        return self._equityCurve(candles=candles).getArrays()
 
-        mae = max(self.entry_price - candle.low for candle in candles)
-        mfe = max(candle.high - self.entry_price for candle in candles)
+    def getEquity(self, max_points:int=None) -> list[dict]:
+        '''
+        Curva de equity desde la caché. Si el trade aún no la tiene o está desactualizada se calcula y se guarda (sin commit).
 
-        return mae, mfe
\ No newline at end of file
+        max_points: int
+            Maximum number of points (LTTB). None for the full curve.
+        '''
+        if self.exit_date is None:
+            return self.equity_curve(max_points=max_points)
+
+        from .equity_curve import EquityCurveCache
+
+        # Se comprueba el hash por si las transacciones o las velas han cambiado desde que se guardó
+        # (salvo si ya lo ha hecho EquityCurveCache.refreshTrades para un lote de trades)
+        cache = self.equity_cache if getattr(self, '_equity_checked', False) else EquityCurveCache.refresh(self)
+        return cache.getPoints(max_points=max_points)
+
+    def maximumFavorableAverse(self) -> tuple[float, float]:
+        """(MAE, MFE) en precio por acción. Usa los valores guardados y si no los calcula"""
+        if self.excursions_at is None:
+            Trade.updateExcursions([self])
+
+        return self.mae or 0.0, self.mfe or 0.0
+
+    @staticmethod
+    def updateExcursions(trades:list['Trade']) -> int:
+        '''
+        Calcula y guarda (sin commit) MFE/MAE de varios trades con una sola
+        lectura de velas. Los trades sin velas quedan marcados como calculados
+        (excursions_at) para no volver a leerlas hasta que cambien sus
+        transacciones o se descarguen velas nuevas.
+        '''
+        from ..src.excursions import computeExcursions
+
+        excursions = computeExcursions(trades)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for trade in trades:
+            values = excursions.get(trade.id, {})
+            trade.mfe = values.get('mfe')
+            trade.mae = values.get('mae')
+            trade.mfe_r = values.get('mfe_r')
+            trade.mae_r = values.get('mae_r')
+            trade.excursions_at = now
+
+        return len(excursions)
+
+    @staticmethod
+    def updatePendingExcursions(user_id:int=None, chunk_size:int=500) -> int:
+        '''
+        Calcula y guarda MFE/MAE de los trades cerrados que aún no se han
+        calculado (flask rollups rebuild), por bloques con un commit por bloque.
+        Devuelve cuántos trades tenían velas.
+        '''
+        query = Trade.query.filter(Trade.excursions_at.is_(None), Trade.exit_date.isnot(None))
+        if user_id is not None:
+            query = query.filter(Trade.user_id == user_id)
+
+        computed = 0
+        while True:
+            # Cada bloque deja de estar pendiente: la siguiente consulta devuelve los siguientes
+            trades = query.order_by(Trade.id).limit(chunk_size).all()
+            if not trades:
+                break
+            computed += Trade.updateExcursions(trades)
+            db.session.commit()
+
+        return computed
+
+    @staticmethod
+    def analyticsOptions():
+        """load_only de las columnas de estadísticas: objetos Trade sin cargar las notas (para páginas que los renderizan)"""
+        from sqlalchemy.orm import load_only
+
+        return load_only(*[getattr(Trade, col) for col in Trade.ANALYTICS_COLUMNS])
+
+    @staticmethod
+    def analyticsRows(query) -> list:
+        '''
+        Ejecuta la consulta seleccionando solo las columnas de estadísticas.
+        Devuelve filas ligeras (Row, con acceso por atributo) en lugar de objetos del ORM.
+
+        query: Query
+            Trade query with the filters and order already applied.
+        '''
+        return query.with_entities(*[getattr(Trade, col) for col in Trade.ANALYTICS_COLUMNS]).all()
+
+@event.listens_for(db.session, 'before_flush')
+def _collectExcursionChanges(session, flush_context, instances):
+    """Apunta los trades cuyas transacciones o ventana cambian en este flush"""
+    trade_ids = session.info.setdefault('excursion_trade_ids', set())
+    for obj in [*session.new, *session.deleted, *[o for o in session.dirty if session.is_modified(o)]]:
+        if isinstance(obj, Transaction):
+            trade_ids.add(obj.trade_id)
+    for trade in session.dirty:
+        if isinstance(trade, Trade) and session.is_modified(trade):
+            state = inspect(trade)
+            if any(state.attrs[col].history.has_changes() for col in Trade.EXCURSION_COLUMNS):
+                trade_ids.add(trade.id)
+    trade_ids.discard(None)
+
+@event.listens_for(db.session, 'after_flush')
+def _resetExcursions(session, flush_context):
+    """Marca esos trades para recalcular MFE/MAE (la ruta de performance o el trabajo de velas lo hará)"""
+    trade_ids = session.info.pop('excursion_trade_ids', None)
+    if trade_ids:
+        session.connection().execute(update(Trade.__table__).where(Trade.__table__.c.id.in_(trade_ids)).values(excursions_at=None))
+
+@event.listens_for(Trade, 'expire')
+def _clearEquityChecked(trade, attrs):
+    """La comprobación de EquityCurveCache.refreshTrades deja de valer al expirar el trade (commit, rollback, refresh)"""
+    trade.__dict__.pop('_equity_checked', None)
@@ -0,0 +1,286 @@
+from datetime import date, datetime
+from itertools import groupby
+import numpy as np
+from sqlalchemy import event, inspect, select, delete, insert, and_, or_
+
+from .base import Model, db
+from .trade import Trade
+
+# Columnas de Trade que forman la clave del rollup (mismo orden que KEY_COLUMNS) y las que cambian sus valores
+TRADE_KEY_COLUMNS: tuple[str] = ('user_id', 'entry_date', 'symbol', 'strategy_id', 'trade_type')
+TRADE_VALUE_COLUMNS: tuple[str] = ('profit_loss', 'commission', 'exit_quantity')
+
+class TradeRollup(Model):
+    '''
+    Resumen diario de los trades por (usuario, día de entrada, símbolo, estrategia, lado).
+
+    Solo guarda estadísticas combinables: contadores, sumas, suma de cuadrados,
+    mínimo/máximo y un sketch de cuantiles del P&L neto. Un rango de fechas se
+    resume combinando sus filas (TradeRollup.merge) sin leer los trades.
+
+    Se mantiene desde los eventos de flush de la sesión: cada grupo afectado por
+    un trade nuevo, modificado o borrado se recalcula en la misma transacción.
+    TradeRollup.rebuild lo regenera todo (comando flask rollups rebuild).
+    '''
+    __tablename__ = 'trade_rollup'
+    __table_args__ = (
+        db.Index('ix_trade_rollup_key', 'user_id', 'day', 'symbol', 'strategy_id', 'side'),
+    )
+    KEY_COLUMNS: tuple[str] = ('user_id', 'day', 'symbol', 'strategy_id', 'side')
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    strategy_id = db.Column(db.Integer, db.ForeignKey('strategy.id', ondelete='SET NULL'))
+    side = db.Column(db.String(10))
+    trades = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    losses = db.Column(db.Integer, nullable=False, default=0)
+    pnl_sum = db.Column(db.Float, nullable=False, default=0)
+    pnl_sq_sum = db.Column(db.Float, nullable=False, default=0)
+    pnl_min = db.Column(db.Float)
+    pnl_max = db.Column(db.Float)
+    win_sum = db.Column(db.Float, nullable=False, default=0)
+    loss_sum = db.Column(db.Float, nullable=False, default=0)
+    commission_sum = db.Column(db.Float, nullable=False, default=0)
+    quantity_sum = db.Column(db.Float, nullable=False, default=0)
+    sketch = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def to_dict(self, exclude:list=[]):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'day': self.day.isoformat() if self.day else None,
+            'symbol': self.symbol,
+            'strategy_id': self.strategy_id,
+            'side': self.side,
+            'trades': self.trades,
+            'wins': self.wins,
+            'losses': self.losses,
+            'pnl_sum': self.pnl_sum,
+            'pnl_sq_sum': self.pnl_sq_sum,
+            'pnl_min': self.pnl_min,
+            'pnl_max': self.pnl_max,
+            'win_sum': self.win_sum,
+            'loss_sum': self.loss_sum,
+            'commission_sum': self.commission_sum,
+            'quantity_sum': self.quantity_sum,
+            'sketch': self.sketch,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    @staticmethod
+    def summarize(rows:list[tuple]) -> dict:
+        """Valores de las columnas de un grupo a partir de sus trades (profit_loss, commission, exit_quantity)"""
+        from ..src.sketch import QuantileSketch
+
+        pnl = np.array([row[0] or 0 for row in rows], dtype=float)
+        return {
+            'trades': len(pnl),
+            'wins': int((pnl > 0).sum()),
+            'losses': int((pnl < 0).sum()),
+            'pnl_sum': float(pnl.sum()),
+            'pnl_sq_sum': float((pnl ** 2).sum()),
+            'pnl_min': float(pnl.min()),
+            'pnl_max': float(pnl.max()),
+            'win_sum': float(pnl[pnl > 0].sum()),
+            'loss_sum': float(pnl[pnl < 0].sum()),
+            'commission_sum': float(sum(row[1] or 0 for row in rows)),
+            'quantity_sum': float(sum(row[2] or 0 for row in rows)),
+            'sketch': QuantileSketch.fromValues(pnl).dumps(),
+            'updated_at': datetime.now(),
+        }
+
+    @staticmethod
+    def _keyFilter(columns:list, key:tuple):
+        """Condición de igualdad con la clave (strategy_id y side pueden ser NULL)"""
+        return and_(*[column.is_(None) if value is None else column == value for column, value in zip(columns, key)])
+
+    @staticmethod
+    def refreshKeys(connection, keys:set[tuple], chunk_size:int=100) -> int:
+        '''
+        Recalcula los grupos de las claves dadas leyendo sus trades. Usa la
+        conexión directamente para poder ejecutarse dentro de un flush.
+
+        connection:
+            SQLAlchemy connection (session.connection() inside the flush events).
+        keys: set[tuple]
+            (user_id, day, symbol, strategy_id, side) of the groups to refresh.
+        '''
+        trade, rollup = Trade.__table__, TradeRollup.__table__
+        trade_key = [trade.c[col] for col in TRADE_KEY_COLUMNS]
+        rollup_key = [rollup.c[col] for col in TradeRollup.KEY_COLUMNS]
+
+        keys = list(keys)
+        written = 0
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            rows = connection.execute(
+                select(*trade_key, *[trade.c[col] for col in TRADE_VALUE_COLUMNS])
+                .where(or_(*[TradeRollup._keyFilter(trade_key, key) for key in chunk]))
+            ).all()
+            groups = {}
+            for row in rows:
+                groups.setdefault(tuple(row[:5]), []).append(row[5:])
+
+            connection.execute(delete(rollup).where(or_(*[TradeRollup._keyFilter(rollup_key, key) for key in chunk])))
+            values = [{**dict(zip(TradeRollup.KEY_COLUMNS, key)), **TradeRollup.summarize(group)}
+                      for key, group in groups.items()]
+            if values:
+                connection.execute(insert(rollup), values)
+            written += len(values)
+
+        return written
+
+    @staticmethod
+    def rebuild(user_id:int=None) -> int:
+        """Regenera todos los rollups (o los de un usuario) desde los trades. Devuelve cuántas filas se han escrito"""
+        trade, rollup = Trade.__table__, TradeRollup.__table__
+        trade_key = [trade.c[col] for col in TRADE_KEY_COLUMNS]
+
+        query = select(*trade_key, *[trade.c[col] for col in TRADE_VALUE_COLUMNS]) \
+                .where(trade.c.user_id.isnot(None), trade.c.entry_date.isnot(None))
+        clear = delete(rollup)
+        if user_id is not None:
+            query = query.where(trade.c.user_id == user_id)
+            clear = clear.where(rollup.c.user_id == user_id)
+
+        # Un único recorrido ordenado por la clave: cada grupo es un tramo contiguo
+        rows = db.session.execute(query.order_by(*trade_key)).all()
+        values = [{**dict(zip(TradeRollup.KEY_COLUMNS, key)), **TradeRollup.summarize([row[5:] for row in group])}
+                  for key, group in groupby(rows, key=lambda row: tuple(row[:5]))]
+
+        db.session.execute(clear)
+        if values:
+            db.session.execute(insert(rollup), values)
+        db.session.commit()
+
+        return len(values)
+
+    @staticmethod
+    def merge(rollups:list['TradeRollup']) -> dict:
+        """Estadísticas de la unión de varios grupos, incluidos mediana y percentiles"""
+        from ..src.sketch import QuantileSketch
+
+        total = sum(r.trades for r in rollups)
+        if total == 0:
+            return {
+                'total_trades': 0, 'winning_trades': 0, 'losing_trades': 0, 'scratch_trades': 0, 'win_rate': 0,
+                'total_pnl': 0, 'gross_pnl': 0, 'avg_trade_pnl': 0, 'trade_pnl_std': 0, 'avg_win': 0, 'avg_loss': 0,
+                'largest_gain': 0, 'largest_loss': 0, 'profit_factor': 0, 'risk_reward': 0, 'total_commissions': 0,
+                'total_volume': 0, 'median_trade_pnl': 0, 'percentiles': {}, 'days': 0
+            }
+
+        wins = sum(r.wins for r in rollups)
+        losses = sum(r.losses for r in rollups)
+        pnl_sum = sum(r.pnl_sum for r in rollups)
+        win_sum = sum(r.win_sum for r in rollups)
+        loss_sum = sum(r.loss_sum for r in rollups)
+        commission = sum(r.commission_sum for r in rollups)
+        mean = pnl_sum / total
+        # Varianza poblacional a partir de la suma de cuadrados
+        variance = max(sum(r.pnl_sq_sum for r in rollups) / total - mean ** 2, 0)
+        largest_gain = max(r.pnl_max for r in rollups)
+        largest_loss = min(r.pnl_min for r in rollups)
+
+        sketch = QuantileSketch()
+        for r in rollups:
+            sketch.merge(QuantileSketch.loads(r.sketch))
+        # El sketch tiene error relativo: se acota con el mínimo y máximo exactos
+        quantile = lambda q: min(max(sketch.quantile(q), largest_loss), largest_gain)
+
+        avg_win = win_sum / wins if wins else 0
+        avg_loss = loss_sum / losses if losses else 0
+        return {
+            'total_trades': total,
+            'winning_trades': wins,
+            'losing_trades': losses,
+            'scratch_trades': total - wins - losses,
+            'win_rate': wins / total * 100,
+            'total_pnl': pnl_sum,
+            'gross_pnl': pnl_sum + commission,
+            'avg_trade_pnl': mean,
+            'trade_pnl_std': variance ** 0.5,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'largest_gain': largest_gain,
+            'largest_loss': largest_loss,
+            'profit_factor': win_sum / abs(loss_sum) if loss_sum else 1e99 if win_sum > 0 else 0,
+            'risk_reward': avg_win / abs(avg_loss) if avg_loss else 0,
+            'total_commissions': commission,
+            'total_volume': sum(r.quantity_sum for r in rollups),
+            'median_trade_pnl': quantile(0.5),
+            'percentiles': {f'p{int(q * 100)}': quantile(q) for q in (0.05, 0.25, 0.5, 0.75, 0.95)},
+            'days': len({r.day for r in rollups}),
+        }
+
+    @staticmethod
+    def getBySymbol(user_id:int) -> list:
+        """Trades, P&L y ganadores de cada símbolo del usuario sumando sus rollups (sin leer los trades)"""
+        return db.session.query(
+            TradeRollup.symbol,
+            db.func.sum(TradeRollup.trades).label('trades'),
+            db.func.sum(TradeRollup.pnl_sum).label('pnl'),
+            db.func.sum(TradeRollup.wins).label('wins')
+        ).filter(TradeRollup.user_id == user_id).group_by(TradeRollup.symbol).order_by(TradeRollup.symbol).all()
+
+    @staticmethod
+    def getSummary(user_id:int, start:date=None, end:date=None, strategy_id:int=None, symbol:str=None, side:str=None) -> dict:
+        '''
+        Resumen de los trades de un usuario combinando sus rollups.
+
+        start, end: date
+            Entry date range (both included).
+        '''
+        query = TradeRollup.query.filter(TradeRollup.user_id == user_id)
+        if start:
+            query = query.filter(TradeRollup.day >= start)
+        if end:
+            query = query.filter(TradeRollup.day <= end)
+        if strategy_id:
+            query = query.filter(TradeRollup.strategy_id == strategy_id)
+        if symbol:
+            query = query.filter(TradeRollup.symbol == symbol)
+        if side:
+            query = query.filter(TradeRollup.side == side)
+
+        return TradeRollup.merge(query.all())
+
+def _tradeKey(trade:Trade, old:bool=False) -> tuple | None:
+    """Clave del rollup del trade con los valores actuales o con los de la base de datos (old)"""
+    state = inspect(trade)
+    values = []
+    for col in TRADE_KEY_COLUMNS:
+        if old:
+            history = state.attrs[col].load_history()
+            values.append((history.deleted or history.unchanged or [None])[0])
+        else:
+            values.append(getattr(trade, col))
+    return tuple(values) if values[0] is not None and values[1] is not None else None
+
+@event.listens_for(db.session, 'before_flush')
+def _collectRollupKeys(session, flush_context, instances):
+    """Apunta los grupos afectados por los trades que se van a guardar"""
+    keys = session.info.setdefault('rollup_keys', set())
+    for trade in session.new:
+        if isinstance(trade, Trade):
+            keys.add(_tradeKey(trade))
+    for trade in session.deleted:
+        if isinstance(trade, Trade):
+            keys.add(_tradeKey(trade, old=True))
+    for trade in session.dirty:
+        if isinstance(trade, Trade) and session.is_modified(trade):
+            state = inspect(trade)
+            if any(state.attrs[col].history.has_changes() for col in TRADE_KEY_COLUMNS + TRADE_VALUE_COLUMNS):
+                keys.add(_tradeKey(trade, old=True))
+                keys.add(_tradeKey(trade))
+    keys.discard(None)
+
+@event.listens_for(db.session, 'after_flush')
+def _refreshRollups(session, flush_context):
+    """Recalcula los grupos apuntados en la misma transacción del flush"""
+    keys = session.info.pop('rollup_keys', None)
+    if keys:
+        TradeRollup.refreshKeys(session.connection(), keys)
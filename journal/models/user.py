@@ -1,6 +1,7 @@
 
 from datetime import date, datetime, timezone
 from flask_login import UserMixin
+from sqlalchemy import event, update, select, or_
 
 from .base import Model, db
 
@@ -8,10 +9,56 @@ class User(Model, UserMixin):
     username = db.Column(db.String(150), unique=True)
     email = db.Column(db.String(150), unique=True)
     password = db.Column(db.String(150))
+    # Sube con cada escritura de sus trades, transacciones, balances, estrategias, watchlists o errores (claves de caché)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     balances = db.relationship('AccountBalance', back_populates='user', lazy=True)
     errors = db.relationship('Error', back_populates='user', lazy=True)
     settings = db.relationship('Setting', back_populates='user', lazy=True)
     strategies = db.relationship('Strategy', back_populates='user', lazy=True)
     trades = db.relationship('Trade', back_populates='user', lazy=True)
-    watchlists = db.relationship('Watchlist', back_populates='user', lazy=True)
\ No newline at end of file
+    watchlists = db.relationship('Watchlist', back_populates='user', lazy=True)
+
+    @staticmethod
+    def bumpDataVersion(connection, user_ids:set[int]=set(), trade_ids:set[int]=set(), watchlist_ids:set[int]=set()) -> None:
+        """Sube la versión de datos de los usuarios indicados directamente o a través de sus trades y watchlists"""
+        from .trade import Trade
+        from .watchlist import Watchlist
+
+        conditions = []
+        if user_ids:
+            conditions.append(User.id.in_(user_ids))
+        if trade_ids:
+            conditions.append(User.id.in_(select(Trade.user_id).where(Trade.id.in_(trade_ids))))
+        if watchlist_ids:
+            conditions.append(User.id.in_(select(Watchlist.user_id).where(Watchlist.id.in_(watchlist_ids))))
+        if conditions:
+            connection.execute(update(User.__table__).where(or_(*conditions)).values(data_version=User.data_version + 1))
+
+@event.listens_for(db.session, 'before_flush')
+def _collectDataChanges(session, flush_context, instances):
+    """Apunta los usuarios cuyos datos de performance cambian en este flush"""
+    from .balance import AccountBalance
+    from .error import Error
+    from .strategy import Strategy
+    from .trade import Trade
+    from .transaction import Transaction
+    from .watchlist import Watchlist
+    from .watchlist_entry import WatchlistEntry
+
+    changes = session.info.setdefault('data_changes', {'user_ids': set(), 'trade_ids': set(), 'watchlist_ids': set()})
+    for obj in [*session.new, *session.deleted, *[o for o in session.dirty if session.is_modified(o)]]:
+        if isinstance(obj, (Trade, AccountBalance, Strategy, Watchlist, Error)):
+            changes['user_ids'].add(obj.user_id)
+        elif isinstance(obj, Transaction):
+            changes['trade_ids'].add(obj.trade_id)
+        elif isinstance(obj, WatchlistEntry):
+            changes['watchlist_ids'].add(obj.watchlist_id)
+    for ids in changes.values():
+        ids.discard(None)
+
+@event.listens_for(db.session, 'after_flush')
+def _bumpDataVersions(session, flush_context):
+    changes = session.info.pop('data_changes', None)
+    if changes:
+        User.bumpDataVersion(session.connection(), **changes)
@@ -12,6 +12,7 @@ from flask_login import login_required, current_user
 
 from ..models import Watchlist, Candle
 from ..src.yahoofinance import YahooTicker
+from ..src.candle_store import toColumnar
 from ..src.benzinga import Benzinga
 from ..src.finviz import FinvizScraper, FinvizTicker
 
@@ -70,9 +71,9 @@ def api_asset(symbol:str) -> str:
     finviz_data = finviz_info if isinstance(finviz_info, dict) else {}
 
     yahoo = YahooTicker(ticker=symbol)
-    finviz_candles = yahoo.getPrice(start=(datetime.now() - timedelta(days=365)).timestamp(),
-                                    end=datetime.now().timestamp(), 
-                                    timeframe='1d', df=False)
+    yahoo_candles = yahoo.getPrice(start=(datetime.now() - timedelta(days=365)).timestamp(),
+                                   end=datetime.now().timestamp(), 
+                                   timeframe='1d', df=True)
     
     # Combinar y estructurar los datos
     overview_data = {
@@ -115,7 +116,7 @@ def api_asset(symbol:str) -> str:
             # Timestamps
             'last_updated': datetime.now().isoformat(),
             'last_trade_time': share_data.get('lastTradeTime', ''),
-            'candles': finviz_candles,
+            'candles': toColumnar(Candle.arraysFromFrame(yahoo_candles)),
         }
     }
     
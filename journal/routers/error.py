@@ -45,12 +45,13 @@ class ErrorAnalytics:
         if severity != 'all':
             query = query.filter(Error.severity == severity)
         
-        # Filtrar por período si se especifica
+        # Resumen de impacto de todos los errores con una consulta
+        errors = Error.loadImpact(query.all())
+        
+        # Filtrar por período si se especifica (errores con alguna ocurrencia desde la fecha de corte)
         if period_days:
             cutoff_date = date.today() - timedelta(days=period_days)
-            query = query.join(trade_errors).join(Trade).filter(Trade.entry_date >= cutoff_date)
-        
-        errors = query.all()
+            errors = [error for error in errors if error.last_occurrence and error.last_occurrence >= cutoff_date]
         
         # Filtrar por mínimo de ocurrencias
         filtered_errors = [error for error in errors if error.occurrence_count >= min_count]
@@ -87,14 +88,13 @@ class ErrorAnalytics:
         """Obtener los errores más costosos"""
         error_costs = []
         
-        for error in Error.query.filter(Error.user_id == current_user.id).all():
-            if error.trades:
-                total_loss = sum(trade.profit_loss for trade in error.trades if trade.profit_loss < 0)
+        for error in Error.loadImpact(Error.query.filter(Error.user_id == current_user.id).all(), recent=0):
+            if error.occurrence_count:
                 error_costs.append({
                     'error': error,
-                    'total_loss': total_loss,
-                    'avg_loss': total_loss / len(error.trades),
-                    'occurrences': len(error.trades)
+                    'total_loss': error.total_loss,
+                    'avg_loss': error.average_impact,
+                    'occurrences': error.occurrence_count
                 })
         
         return sorted(error_costs, key=lambda x: x['total_loss'])[:limit]
@@ -140,6 +140,9 @@ def errors():
     # Crear objeto de paginación simple
     pagination = SimplePagination(page, per_page, total_items)
     
+    # Trades de los errores de la página con una consulta
+    error_trades = Error.tradeSummaries([error.id for error in paginated_errors])
+    
     # Enriquecer datos de errores con información adicional
     enriched_errors = []
     for error in paginated_errors:
@@ -150,9 +153,9 @@ def errors():
             "severity": error.severity,
             "count": error.occurrence_count,
             "frequency": error.occurrence_count / stats["total_occurrences"],
-            "last_occurrence": error.last_occurrence.strftime('%Y-%m-%d'),
+            "last_occurrence": error.last_occurrence.strftime('%Y-%m-%d') if error.last_occurrence else None,
             "days_ago": error.days_since_last_occurrence or 0,
-            "trades": [e.to_dict() for e in error.trades],
+            "trades": error_trades.get(error.id, []),
             "average_impact": error.average_impact
         })
     
@@ -273,7 +276,7 @@ def export_errors():
             error.last_occurrence.strftime('%d/%m/%Y') if error.last_occurrence else 'N/A',
             error.days_since_last_occurrence or 'N/A',
             f'{error.average_impact:.2f}',
-            ', '.join([f"{t.symbol} ({t.date.strftime('%d/%m')})" for t in error.recent_examples])
+            ', '.join([f"{t['symbol']} ({t['entry_date'].strftime('%d/%m')})" for t in error.recent_examples])
         ])
     
     output.seek(0)
@@ -1,5 +1,6 @@
 
 import os
+import json
 from datetime import date, datetime, timedelta, time
 from collections import defaultdict
 
@@ -7,7 +8,7 @@ import numpy as np
 
 from werkzeug.datastructures.file_storage import FileStorage
 from sqlalchemy import desc, func, case, extract, and_
-from flask import Blueprint, Response, render_template, request, flash, redirect, url_for, jsonify, abort
+from flask import Blueprint, Response, current_app, render_template, request, flash, redirect, url_for, jsonify, abort, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.wrappers.response import Response
 
@@ -18,9 +19,13 @@ from ..models.watchlist_entry import WatchlistEntry
 from ..models.watchlist_entry import WatchlistEntry
 
 from ..config import UPLOAD_FOLDER
-from ..models import db, AccountBalance, Trade, Media, Strategy, StrategyCondition, Error, Watchlist, Candle, trade_scoring, trade_errors
+from ..models import db, AccountBalance, Trade, TradeRollup, Media, Strategy, StrategyCondition, Error, Watchlist, Candle, Job, EquityCurveCache, trade_scoring, trade_errors
 from ..src.performance import PerformanceMetrics, PerformanceCharts
-from .utils import save_uploaded_files, calculate_max_drawdown, download_candles, localToUtc
+from ..src.trade_frame import TradeFrame
+from ..src.candle_store import getCandleStore, toColumnar
+from ..src.portfolio import PortfolioEquity
+from ..src.result_cache import ResultCache, getResultCache
+from .utils import save_uploaded_files, calculate_max_drawdown, queue_candles, localToUtc
 
 journal_bp = Blueprint(name='journal_endpoints', import_name=__name__)
 
@@ -44,14 +49,122 @@ def journal() -> str:
     return render_template(template_name_or_list='trade/journal.html', calendar_data=calendar_data, 
                          trades=trades, selected_date=selected_date)
 
+# Relaciones que no se serializan en modo resumen
+SUMMARY_EXCLUDE: list[str] = ['strategy', 'media', 'errors', 'conditions', 'transactions']
+
 @journal_bp.route(rule='/trades/<date>/month')
 @login_required
 def month_trades(date) -> Response:
+    '''
+    Trades cerrados en el mes de date.
+
+    Query params:
+    summary: bool
+        Only the trade columns, without relationships nor equity curve
+        (fetch it per trade from /trade/<id>/equity).
+    page, per_page: int
+        Return one page {trades, page, per_page, total, pages}.
+    stream: bool
+        Stream the trades as NDJSON, one trade per line.
+    '''
     date: datetime = datetime.strptime(date, '%Y-%m-%d')
     start = datetime(date.year, date.month, 1).date()
-    end = datetime(date.year, date.month+1, 1).date()
-    trades: list = Trade.query.filter((start <= Trade.exit_date) & (Trade.exit_date < end) & (Trade.user_id==current_user.id)).all()
-    return jsonify([t.to_dict(equity=True) for t in trades])
+    end = (start + timedelta(days=32)).replace(day=1)
+    summary = request.args.get('summary', default=False, type=lambda v: v.lower() in ('1', 'true', 'yes'))
+    stream = request.args.get('stream', default=False, type=lambda v: v.lower() in ('1', 'true', 'yes'))
+    page = request.args.get('page', type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 500)
+
+    user_id = current_user.id
+
+    def getQuery():
+        query = Trade.query.filter((Trade.user_id==user_id) & (start <= Trade.exit_date) & (Trade.exit_date < end)) \
+                           .order_by(Trade.exit_date, Trade.id)
+        if not summary:
+            # Las curvas de equity se leen de la caché en la misma consulta
+            query = query.outerjoin(Trade.equity_cache).options(db.contains_eager(Trade.equity_cache))
+        return query
+
+    def serialize(trade:Trade) -> dict:
+        return trade.to_dict(exclude=SUMMARY_EXCLUDE) if summary else trade.to_dict(equity=True)
+
+    def serializeAll(trades:list[Trade]) -> list[dict]:
+        # Las curvas desactualizadas o que faltan se regeneran por lotes antes de serializar
+        if not summary:
+            EquityCurveCache.refreshTrades(trades)
+        return [serialize(t) for t in trades]
+
+    if stream:
+        # La consulta se lanza dentro del generador: la sesión de la petición ya se ha cerrado al empezar a enviar
+        def generate():
+            batch = []
+            for trade in getQuery().yield_per(50):
+                batch.append(trade)
+                if len(batch) == 50:
+                    yield ''.join(json.dumps(t) + '\n' for t in serializeAll(batch))
+                    batch = []
+            if batch:
+                yield ''.join(json.dumps(t) + '\n' for t in serializeAll(batch))
+            # Curvas calculadas durante la serialización
+            if db.session.new or db.session.dirty:
+                db.session.commit()
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    if page is not None:
+        pagination = getQuery().paginate(page=page, per_page=per_page, error_out=False)
+        result = {
+            'trades': serializeAll(pagination.items),
+            'page': pagination.page,
+            'per_page': pagination.per_page,
+            'total': pagination.total,
+            'pages': pagination.pages,
+        }
+    else:
+        result = serializeAll(getQuery().all())
+
+    if db.session.new or db.session.dirty:
+        db.session.commit()
+    return jsonify(result)
+
+@journal_bp.route(rule='/portfolio/<date>')
+@login_required
+def portfolio_equity(date) -> Response:
+    '''
+    Equity de la cuenta minuto a minuto con todos los trades abiertos en el
+    día (period=day) o en la semana de lunes a domingo (period=week) de date.
+    '''
+    date: datetime = datetime.strptime(date, '%Y-%m-%d')
+    period = request.args.get('period', 'day')
+    start = date - timedelta(days=date.weekday()) if period == 'week' else date
+    end = start + timedelta(days=7 if period == 'week' else 1)
+
+    trades: list[Trade] = Trade.query.filter(Trade.user_id == current_user.id, Trade.entry_date < end.date(),
+                                             (Trade.exit_date == None) | (Trade.exit_date >= start.date())).all()
+
+    # Balance de apertura: el último registrado antes del periodo
+    opening: AccountBalance = AccountBalance.query.filter(AccountBalance.user_id == current_user.id, AccountBalance.date < start.date()) \
+                                                  .order_by(AccountBalance.date.desc()).first()
+
+    # Presupuesto de puntos como en los demás gráficos
+    points = request.args.get('points', current_app.config.get('CHART_MAX_POINTS'), type=int)
+    result = PortfolioEquity(trades=trades, start=start, end=end, initial_balance=opening.balance if opening else 0,
+                             max_points=points).to_dict()
+    result['period'] = {'start': start.isoformat(), 'end': end.isoformat(), 'trades': len(trades)}
+    return jsonify(result)
+
+@journal_bp.route(rule='/trade/<int:id>/equity')
+@login_required
+def trade_equity(id) -> Response:
+    trade: Trade = Trade.query.get_or_404(id)
+
+    if trade.user_id != current_user.id:
+        abort(403)
+
+    equity = trade.getEquity(max_points=request.args.get('points', None, type=int))
+    if db.session.new or db.session.dirty:
+        db.session.commit()
+    return jsonify(equity)
 
 @journal_bp.route(rule='/trade/<int:id>')
 @login_required
@@ -92,14 +205,13 @@ def get_trade(id) -> str:
     week_ago = trade.entry_date - timedelta(days=5)
     symbol = trade.symbol
     
-    daily = Candle.query.filter(Candle.symbol == trade.symbol, 
-                                Candle.date >= datetime.combine(one_year_ago, time(0, 0, 0)), 
-                                Candle.date <= datetime.combine(today, time(23, 59, 59)), 
-                                Candle.timeframe == '1d').all()
-    intraday = Candle.query.filter(Candle.symbol == symbol, 
-                                   Candle.date >= datetime.combine(week_ago, time(0, 0, 0)), 
-                                   Candle.date <= datetime.combine(today, time(23, 59, 59)), 
-                                   Candle.timeframe == '1m').all()
+    store = getCandleStore()
+    daily = store.getArrays(symbol=symbol, timeframe='1d',
+                            start=datetime.combine(one_year_ago, time(0, 0, 0)),
+                            end=datetime.combine(today, time(23, 59, 59)))
+    intraday = store.getArrays(symbol=symbol, timeframe='1m',
+                               start=datetime.combine(week_ago, time(0, 0, 0)),
+                               end=datetime.combine(today, time(23, 59, 59)))
 
     trade_data = {
         "id": trade.id,
@@ -149,13 +261,47 @@ def get_trade(id) -> str:
             for i, m in enumerate(trade.media.all())
         ],
         "candles": {
-            "1d": [t.to_dict() for t in daily],
-            "1m": [t.to_dict() for t in intraday],
+            "1d": toColumnar(daily),
+            "1m": toColumnar(intraday),
         }
     }
 
     return render_template('trade/detail.html', trade_data=trade_data)
 
+@journal_bp.route(rule='/trade/<int:id>/candles')
+@login_required
+def trade_candles(id) -> Response:
+    trade: Trade = Trade.query.get_or_404(id)
+
+    if trade.user_id != current_user.id:
+        abort(403)
+
+    # Mismo rango que el gráfico intradía del detalle, en el timeframe pedido
+    timeframe = request.args.get('timeframe', '1m')
+    today = trade.exit_date if trade.exit_date else date.today()
+    week_ago = trade.entry_date - timedelta(days=5)
+
+    candles = getCandleStore().getResampledArrays(symbol=trade.symbol, timeframe=timeframe,
+                                                 start=datetime.combine(week_ago, time(0, 0, 0)),
+                                                 end=datetime.combine(today, time(23, 59, 59)))
+
+    return jsonify(toColumnar(candles, encoding=request.args.get('encoding', 'json'),
+                              max_points=request.args.get('points', None, type=int)))
+
+@journal_bp.route(rule='/trade/<int:id>/candles/status')
+@login_required
+def trade_candles_status(id) -> Response:
+    trade: Trade = Trade.query.get_or_404(id)
+
+    if trade.user_id != current_user.id:
+        abort(403)
+
+    # Último trabajo de descarga de velas del símbolo
+    job: Job = Job.query.filter(Job.kind == 'sync_candles', Job.symbol == trade.symbol, Job.user_id == current_user.id) \
+                        .order_by(Job.id.desc()).first()
+
+    return jsonify(job.to_dict() if job else {'status': None})
+
 @journal_bp.route(rule='/add', methods=['GET', 'POST'])
 @login_required
 def add_trade() -> Response | str:
@@ -234,15 +380,13 @@ def add_trade() -> Response | str:
         today = date.today()
         one_year_ago = today - timedelta(days=365)
         week_ago = today - timedelta(days=5)
-        # Descargar velas con Yahoo Finance
-        download_candles(db=db,
-                         symbol=symbol,
-                         config=[
-                             {'timeframe': '1d', 'start':one_year_ago, 'end':today},
-                             {'timeframe': '1m', 'start': datetime.combine(week_ago, time(0, 0, 0)), 'end': datetime.combine(today, time(23, 59, 59)) },
-                         ])
-        
         db.session.commit()
+
+        # La descarga se hace en segundo plano una vez guardados los datos
+        queue_candles(symbol=symbol, user_id=current_user.id, config=[
+            {'timeframe': '1d', 'start':one_year_ago, 'end':today},
+            {'timeframe': '1m', 'start': datetime.combine(week_ago, time(0, 0, 0)), 'end': datetime.combine(today, time(23, 59, 59)) },
+        ])
         flash('Trade registrado exitosamente!', 'success')
         return redirect(url_for('journal_endpoints.journal'))
         
@@ -331,14 +475,13 @@ def edit_trade(trade_id):
             one_year_ago = trade.entry_date - timedelta(days=365)
             week_ago = trade.entry_date - timedelta(days=5)
             symbol = trade.symbol
-            download_candles(db=db,
-                            symbol=symbol,
-                            config=[
-                                {'timeframe': '1d', 'start':one_year_ago, 'end':today},
-                                {'timeframe': '1m', 'start': datetime.combine(week_ago, time(0, 0, 0)), 'end': datetime.combine(today, time(23, 59, 59)) },
-                            ])
-
             db.session.commit()
+
+            # La descarga se hace en segundo plano una vez guardados los datos
+            queue_candles(symbol=symbol, user_id=current_user.id, config=[
+                {'timeframe': '1d', 'start':one_year_ago, 'end':today},
+                {'timeframe': '1m', 'start': datetime.combine(week_ago, time(0, 0, 0)), 'end': datetime.combine(today, time(23, 59, 59)) },
+            ])
             flash('Trade actualizado correctamente', 'success')
             return redirect(url_for('journal_endpoints.journal'))
 
@@ -387,283 +530,304 @@ def globalPerformance():
     watchlist_id = request.args.get('watchlist', type=int)
     limit = request.args.get('limit', type=int)
     
-    # Construir query base
-    base_query = Trade.query.filter(Trade.user_id==current_user.id)
-    
-    if watchlist_id:
-        base_query = base_query.join(
-            WatchlistEntry,
-            and_(
-                Trade.symbol == WatchlistEntry.symbol,
-                Trade.entry_date >= WatchlistEntry.date,
-                Trade.entry_date <= WatchlistEntry.date_exit
-            )
-        ).filter(WatchlistEntry.watchlist_id == watchlist_id).distinct().all()
+    # ===== CACHÉ =====
+    cache = getResultCache()
+    # El mes actual también forma parte de la clave (trades_this_month y pnl_change dependen de él)
+    params = {'start': start, 'end': end, 'strategy': strategy_id, 'symbol': asset_symbol, 'watchlist': watchlist_id, 'limit': limit,
+              'month': date.today().strftime('%Y-%m')}
+    stats = cache.get(ResultCache.makeKey('complete-performance', current_user.id, current_user.data_version, params))
+    
+    if stats is None:
+        # Construir query base
+        base_query = Trade.query.filter(Trade.user_id==current_user.id)
+    
+        if watchlist_id:
+            base_query = base_query.join(
+                WatchlistEntry,
+                and_(
+                    Trade.symbol == WatchlistEntry.symbol,
+                    Trade.entry_date >= WatchlistEntry.date,
+                    Trade.entry_date <= WatchlistEntry.date_exit
+                )
+            ).filter(WatchlistEntry.watchlist_id == watchlist_id).distinct()
         
-    if strategy_id:
-        base_query = base_query.filter(Trade.strategy_id == strategy_id)
+        if strategy_id:
+            base_query = base_query.filter(Trade.strategy_id == strategy_id)
         
-    if asset_symbol:
-        base_query = base_query.filter(Trade.symbol == asset_symbol)
+        if asset_symbol:
+            base_query = base_query.filter(Trade.symbol == asset_symbol)
+    
+        # Aplicar filtros de fecha
+        if start:
+            start_date = datetime.strptime(start, '%Y-%m-%d').date()
+            base_query = base_query.filter(Trade.entry_date >= start_date)
+        if end:
+            end_date = datetime.strptime(end, '%Y-%m-%d').date()
+            base_query = base_query.filter(Trade.entry_date <= end_date)
         
-    if limit:
-        base_query = base_query.limit(limit=limit)
-    
-    # Aplicar filtros de fecha
-    if start:
-        start_date = datetime.strptime(start, '%Y-%m-%d').date()
-        base_query = base_query.filter(Trade.entry_date >= start_date)
-    if end:
-        end_date = datetime.strptime(end, '%Y-%m-%d').date()
-        base_query = base_query.filter(Trade.entry_date <= end_date)
-    
-    # ===== ESTADÍSTICAS GENERALES =====
-    total_trades = base_query.count()
-    winning_trades = base_query.filter(Trade.profit_loss > 0).count()
-    losing_trades = base_query.filter(Trade.profit_loss < 0).count()
-    
-    win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-    
-    # P&L y métricas básicas
-    total_pnl = base_query.with_entities(func.sum(Trade.profit_loss)).scalar() or 0
-    avg_win = base_query.filter(Trade.profit_loss > 0).with_entities(func.avg(Trade.profit_loss)).scalar() or 0
-    avg_loss = base_query.filter(Trade.profit_loss < 0).with_entities(func.avg(Trade.profit_loss)).scalar() or 0
-    avg_trade = total_pnl / total_trades if total_trades > 0 else 0
-    risk_reward = avg_win / abs(avg_loss)
-    
-    # Profit factor
-    total_wins = base_query.filter(Trade.profit_loss > 0).with_entities(func.sum(Trade.profit_loss)).scalar() or 0
-    total_losses = abs(base_query.filter(Trade.profit_loss < 0).with_entities(func.sum(Trade.profit_loss)).scalar() or 0)
-    profit_factor = total_wins / total_losses if total_losses > 0 else 0
-    
-    # Trades del mes actual
-    current_month = date.today().replace(day=1)
-    trades_this_month = Trade.query.filter(Trade.entry_date >= current_month, Trade.user_id==current_user.id).count()
-    
-    # Cambio P&L vs mes anterior
-    last_month = (current_month - timedelta(days=1)).replace(day=1)
-    pnl_last_month = Trade.query.filter(
-        Trade.exit_date >= last_month, Trade.exit_date < current_month, Trade.user_id==current_user.id
-    ).with_entities(func.sum(Trade.profit_loss)).scalar() or 0
-    
-    pnl_change = ((total_pnl - pnl_last_month) / abs(pnl_last_month) * 100) if pnl_last_month != 0 else 0
-    
-    # ===== CÁLCULOS AVANZADOS =====
-    
-    # Obtener todos los trades para cálculos complejos
-    all_trades = base_query.order_by(Trade.entry_date).all()
-    
-    # Calcular Sharpe Ratio
-    if len(all_trades) > 1:
-        returns = [trade.profit_loss for trade in all_trades]
-        avg_return = np.mean(returns)
-        std_return = np.std(returns)
-        sharpe_ratio = (avg_return / std_return) if std_return != 0 else 0
-    else:
-        sharpe_ratio = 0
-    
-    # Calcular Maximum Drawdown
-    max_drawdown = calculate_max_drawdown(all_trades)
-    
-    # ===== MEJORES Y PEORES TRADES =====
-    best_trades = base_query.order_by(desc(Trade.profit_loss)).limit(5).all()
-    worst_trades = base_query.order_by(Trade.profit_loss).limit(5).all()
-    
-    # ===== ANÁLISIS POR ESTRATEGIA =====
-    strategy_stats = []
-    strategies_query = db.session.query(
-        Strategy.id,
-        Strategy.name,
-        Strategy.description,
-        func.count(Trade.id).label('total_trades'),
-        func.sum(Trade.profit_loss).label('total_pnl'),
-        func.avg(Trade.profit_loss).label('avg_pnl'),
-        func.count(func.nullif(Trade.profit_loss > 0, False)).label('wins'),
-        func.sum(case((Trade.profit_loss > 0, Trade.profit_loss), else_=0)).label('total_wins'),
-        func.sum(case((Trade.profit_loss < 0, Trade.profit_loss), else_=0)).label('total_losses')
-    ).filter(Strategy.user_id==current_user.id).join(Trade).group_by(Strategy.id)
-    
-    if strategy_id:
-        strategies_query = strategies_query.filter(Strategy.id == strategy_id)
-    
-    for strategy in strategies_query.all():
-        win_rate_strategy = (strategy.wins / strategy.total_trades * 100) if strategy.total_trades > 0 else 0
-        profit_factor_strategy = abs(strategy.total_wins / strategy.total_losses) if strategy.total_losses < 0 else 0
+        # El límite va al final: después de LIMIT ya no se puede filtrar ni ordenar
+        base_query = base_query.order_by(Trade.entry_date)
+        if limit:
+            base_query = base_query.limit(limit=limit)
+    
+        # ===== ESTADÍSTICAS GENERALES =====
+        # Todos los contadores y sumas en una consulta con agregados condicionales
+        filtered = base_query.with_entities(Trade.id, Trade.profit_loss).subquery()
+        totals = db.session.query(
+            func.count(filtered.c.id).label('total_trades'),
+            func.sum(case((filtered.c.profit_loss > 0, 1), else_=0)).label('winning_trades'),
+            func.sum(case((filtered.c.profit_loss < 0, 1), else_=0)).label('losing_trades'),
+            func.sum(filtered.c.profit_loss).label('total_pnl'),
+            func.sum(case((filtered.c.profit_loss > 0, filtered.c.profit_loss), else_=0)).label('total_wins'),
+            func.sum(case((filtered.c.profit_loss < 0, filtered.c.profit_loss), else_=0)).label('total_losses')
+        ).one()
+    
+        total_trades = totals.total_trades
+        winning_trades = totals.winning_trades or 0
+        losing_trades = totals.losing_trades or 0
+        win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
+    
+        # P&L y métricas básicas
+        total_pnl = totals.total_pnl or 0
+        total_wins = totals.total_wins or 0
+        total_losses = abs(totals.total_losses or 0)
+        avg_win = total_wins / winning_trades if winning_trades > 0 else 0
+        avg_loss = -total_losses / losing_trades if losing_trades > 0 else 0
+        avg_trade = total_pnl / total_trades if total_trades > 0 else 0
+        risk_reward = avg_win / abs(avg_loss) if avg_loss else 0
+        profit_factor = total_wins / total_losses if total_losses > 0 else 0
+    
+        # Trades del mes actual y P&L del mes anterior (de todos los trades del usuario) en otra consulta
+        current_month = date.today().replace(day=1)
+        last_month = (current_month - timedelta(days=1)).replace(day=1)
+        trades_this_month, pnl_last_month = db.session.query(
+            func.sum(case((Trade.entry_date >= current_month, 1), else_=0)),
+            func.sum(case((and_(Trade.exit_date >= last_month, Trade.exit_date < current_month), Trade.profit_loss), else_=0))
+        ).filter(Trade.user_id==current_user.id).one()
+        trades_this_month, pnl_last_month = trades_this_month or 0, pnl_last_month or 0
+    
+        # Cambio P&L vs mes anterior
+        pnl_change = ((total_pnl - pnl_last_month) / abs(pnl_last_month) * 100) if pnl_last_month != 0 else 0
+    
+        # ===== CÁLCULOS AVANZADOS =====
+        # Una única lectura ordenada (solo las columnas numéricas) para Sharpe, drawdown, mejores/peores trades,
+        # drawdown por estrategia y watchlists
+        all_trades = Trade.analyticsRows(base_query)
+        pnl = np.array([t.profit_loss or 0 for t in all_trades], dtype=float)
+        trade_ids = np.array([t.id for t in all_trades], dtype=int)
+        trade_strategies = np.array([-1 if t.strategy_id is None else t.strategy_id for t in all_trades], dtype=int)
+        trade_symbols = np.array([t.symbol for t in all_trades], dtype=str)
+    
+        # Calcular Sharpe Ratio
+        std_return = pnl.std() if len(pnl) > 1 else 0
+        sharpe_ratio = float(pnl.mean() / std_return) if std_return != 0 else 0
+    
+        # Calcular Maximum Drawdown
+        max_drawdown = calculate_max_drawdown(pnl)
+    
+        # ===== MEJORES Y PEORES TRADES =====
+        best_trades = trade_ids[np.argsort(-pnl, kind='stable')[:5]].tolist()
+        worst_trades = trade_ids[np.argsort(pnl, kind='stable')[:5]].tolist()
+    
+        # ===== ANÁLISIS POR ESTRATEGIA =====
+        strategy_stats = []
+        strategies_query = db.session.query(
+            Strategy.id,
+            Strategy.name,
+            Strategy.description,
+            func.count(Trade.id).label('total_trades'),
+            func.sum(Trade.profit_loss).label('total_pnl'),
+            func.avg(Trade.profit_loss).label('avg_pnl'),
+            func.count(func.nullif(Trade.profit_loss > 0, False)).label('wins'),
+            func.sum(case((Trade.profit_loss > 0, Trade.profit_loss), else_=0)).label('total_wins'),
+            func.sum(case((Trade.profit_loss < 0, Trade.profit_loss), else_=0)).label('total_losses')
+        ).filter(Strategy.user_id==current_user.id).join(Trade).group_by(Strategy.id)
+    
+        if strategy_id:
+            strategies_query = strategies_query.filter(Strategy.id == strategy_id)
+    
+        for strategy in strategies_query.all():
+            win_rate_strategy = (strategy.wins / strategy.total_trades * 100) if strategy.total_trades > 0 else 0
+            profit_factor_strategy = abs(strategy.total_wins / strategy.total_losses) if strategy.total_losses < 0 else 0
         
-        # Calcular drawdown para esta estrategia
-        strategy_trades = [t for t in all_trades if t.strategy_id == strategy.id]
-        strategy_drawdown = calculate_max_drawdown(strategy_trades)
-        
-        strategy_stats.append({
-            'id': strategy.id,
-            'name': strategy.name,
-            'description': strategy.description,
-            'total_trades': strategy.total_trades,
-            'win_rate': win_rate_strategy,
-            'total_pnl': strategy.total_pnl or 0,
-            'avg_pnl': strategy.avg_pnl or 0,
-            'profit_factor': profit_factor_strategy,
-            'max_drawdown': strategy_drawdown
-        })
-    
-    # ===== ANÁLISIS POR WATCHLIST =====
-    watchlist_stats = []
-    watchlists: list[Watchlist] = Watchlist.query.filter(Watchlist.user_id==current_user.id).all()
-    
-    for watchlist in watchlists:
-        # Obtener símbolos de esta watchlist
-        symbols = [entry.symbol for entry in watchlist.entries]
-        if not symbols:
-            continue
-            
-        watchlist_trades = base_query.filter(Trade.symbol.in_(symbols)).all()
-        if not watchlist_trades:
-            continue
-            
-        total_trades_wl = len(watchlist_trades)
-        winning_trades_wl = len([t for t in watchlist_trades if t.profit_loss > 0])
-        total_pnl_wl = sum(t.profit_loss for t in watchlist_trades)
+            # Calcular drawdown para esta estrategia
+            strategy_drawdown = calculate_max_drawdown(pnl[trade_strategies == strategy.id])
         
-        # Mejor símbolo de la watchlist
-        symbol_performance = defaultdict(float)
-        for trade in watchlist_trades:
-            symbol_performance[trade.symbol] += trade.profit_loss
+            strategy_stats.append({
+                'id': strategy.id,
+                'name': strategy.name,
+                'description': strategy.description,
+                'total_trades': strategy.total_trades,
+                'win_rate': win_rate_strategy,
+                'total_pnl': strategy.total_pnl or 0,
+                'avg_pnl': strategy.avg_pnl or 0,
+                'profit_factor': profit_factor_strategy,
+                'max_drawdown': strategy_drawdown
+            })
+    
+        # ===== ANÁLISIS POR WATCHLIST =====
+        # Símbolos de todas las watchlists en una consulta; los trades ya están en memoria
+        watchlist_stats = []
+        watchlist_symbols = defaultdict(list)
+        watchlist_names = {}
+        for wl_id, name, symbol in db.session.query(Watchlist.id, Watchlist.name, WatchlistEntry.symbol) \
+                .join(WatchlistEntry, WatchlistEntry.watchlist_id == Watchlist.id).filter(Watchlist.user_id==current_user.id) \
+                .order_by(Watchlist.id, WatchlistEntry.id):
+            watchlist_symbols[wl_id].append(symbol)
+            watchlist_names[wl_id] = name
+    
+        for wl_id, symbols in watchlist_symbols.items():
+            mask = np.isin(trade_symbols, list(set(symbols)))
+            total_trades_wl = int(mask.sum())
+            if not total_trades_wl:
+                continue
         
-        best_symbol = max(symbol_performance.items(), key=lambda x: x[1]) if symbol_performance else ('', 0)
+            # Mejor símbolo de la watchlist
+            symbol_names, symbol_codes = np.unique(trade_symbols[mask], return_inverse=True)
+            symbol_pnl = np.bincount(symbol_codes.ravel(), weights=pnl[mask])
+            best = int(np.argmax(symbol_pnl))
         
-        watchlist_stats.append({
-            'name': watchlist.name,
-            'symbol_count': len(symbols),
-            'total_trades': total_trades_wl,
-            'win_rate': (winning_trades_wl / total_trades_wl * 100) if total_trades_wl > 0 else 0,
-            'total_pnl': total_pnl_wl,
-            'best_symbol': best_symbol[0],
-            'best_symbol_pnl': best_symbol[1]
-        })
-    
-    # ===== ANÁLISIS MENSUAL =====
-    monthly_stats = []
-    monthly_data = db.session.query(
-        extract('year', Trade.exit_date).label('year'),
-        extract('month', Trade.exit_date).label('month'),
-        func.sum(Trade.profit_loss).label('pnl'),
-        func.count(Trade.id).label('trades')
-    ).filter(Trade.user_id==current_user.id).group_by(
-        extract('year', Trade.exit_date),
-        extract('month', Trade.exit_date)
-    ).order_by(
-        extract('year', Trade.exit_date),
-        extract('month', Trade.exit_date)
-    ).all()
-    
-    month_names = ['', 'Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 
-                   'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
-    
-    for month_data in monthly_data[-12:]:  # Últimos 12 meses
-        monthly_stats.append({
-            'year': int(month_data.year),
-            'month': int(month_data.month),
-            'month_name': month_names[int(month_data.month)],
-            'pnl': month_data.pnl or 0,
-            'trades': month_data.trades
-        })
-    
-    # ===== ANÁLISIS POR SÍMBOLO =====
-    symbol_data = db.session.query(
-        Trade.symbol,
-        func.count(Trade.id).label('trades'),
-        func.sum(Trade.profit_loss).label('pnl'),
-        func.count(func.nullif(Trade.profit_loss > 0, False)).label('wins')
-    ).filter(Trade.user_id==current_user.id).group_by(Trade.symbol).all()
-    
-    symbol_stats = []
-    for symbol in symbol_data:
-        win_rate_symbol = (symbol.wins / symbol.trades * 100) if symbol.trades > 0 else 0
-        symbol_stats.append({
-            'symbol': symbol.symbol,
-            'trades': symbol.trades,
-            'win_rate': win_rate_symbol,
-            'pnl': symbol.pnl or 0
-        })
-    
-    # Top y worst performers
-    top_symbols = sorted(symbol_stats, key=lambda x: x['pnl'], reverse=True)[:10]
-    worst_symbols = sorted(symbol_stats, key=lambda x: x['pnl'])[:10]
-    
-    # ===== ANÁLISIS DE ERRORES =====
-    error_stats = []
-    errors_query = db.session.query(
-        Error.id,
-        Error.description,
-        Error.category,
-        func.count(trade_errors.c.trade_id).label('frequency'),
-        func.max(Trade.exit_date).label('last_occurrence')
-    ).filter(Error.user_id==current_user.id).join(trade_errors, trade_errors.c.error_id == Error.id) \
-    .join(Trade, Trade.id == trade_errors.c.trade_id).group_by(Error.id).all()
-    
-    for error in errors_query:
-        # Calcular impacto promedio y total
-        error_trades = db.session.query(Trade).filter(Trade.user_id==current_user.id).join(trade_errors).filter(
-            trade_errors.c.error_id == error.id
+            watchlist_stats.append({
+                'name': watchlist_names[wl_id],
+                'symbol_count': len(symbols),
+                'total_trades': total_trades_wl,
+                'win_rate': (pnl[mask] > 0).sum() / total_trades_wl * 100,
+                'total_pnl': float(pnl[mask].sum()),
+                'best_symbol': str(symbol_names[best]),
+                'best_symbol_pnl': float(symbol_pnl[best])
+            })
+    
+        # ===== ANÁLISIS MENSUAL =====
+        monthly_stats = []
+        monthly_data = db.session.query(
+            extract('year', Trade.exit_date).label('year'),
+            extract('month', Trade.exit_date).label('month'),
+            func.sum(Trade.profit_loss).label('pnl'),
+            func.count(Trade.id).label('trades')
+        ).filter(Trade.user_id==current_user.id).group_by(
+            extract('year', Trade.exit_date),
+            extract('month', Trade.exit_date)
+        ).order_by(
+            extract('year', Trade.exit_date),
+            extract('month', Trade.exit_date)
         ).all()
-        
-        if error_trades:
-            avg_impact = sum(abs(t.profit_loss) for t in error_trades if t.profit_loss < 0) / len([t for t in error_trades if t.profit_loss < 0]) \
-                        if len([t for t in error_trades if t.profit_loss < 0]) > 0 else 0.0
-            total_loss = sum(t.profit_loss for t in error_trades if t.profit_loss < 0)
-        else:
-            avg_impact = 0
-            total_loss = 0
-            
-        error_stats.append({
-            'description': error.description,
-            'category': error.category,
-            'frequency': error.frequency,
-            'avg_impact': avg_impact,
-            'total_loss': abs(total_loss),
-            'last_occurrence': error.last_occurrence
-        })
-    
-    # Ordenar por frecuencia
-    error_stats.sort(key=lambda x: x['frequency'], reverse=True)
-    
-    # ===== DATOS PARA GRÁFICOS =====
-    # Balance histórico
-    balances = AccountBalance.query.filter(AccountBalance.user_id==current_user.id).order_by(AccountBalance.date).all()
-    balance_data = [{'date': b.date.strftime('%Y-%m-%d'), 'balance': float(b.balance)} for b in balances]
+    
+        month_names = ['', 'Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 
+                       'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+    
+        for month_data in monthly_data[-12:]:  # Últimos 12 meses
+            monthly_stats.append({
+                'year': int(month_data.year),
+                'month': int(month_data.month),
+                'month_name': month_names[int(month_data.month)],
+                'pnl': month_data.pnl or 0,
+                'trades': month_data.trades
+            })
+    
+        # ===== ANÁLISIS POR SÍMBOLO =====
+        # De los resúmenes diarios: sin filtros, no hace falta leer los trades
+        symbol_data = TradeRollup.getBySymbol(current_user.id)
+    
+        symbol_stats = []
+        for symbol in symbol_data:
+            win_rate_symbol = (symbol.wins / symbol.trades * 100) if symbol.trades > 0 else 0
+            symbol_stats.append({
+                'symbol': symbol.symbol,
+                'trades': symbol.trades,
+                'win_rate': win_rate_symbol,
+                'pnl': symbol.pnl or 0
+            })
+    
+        # Top y worst performers
+        top_symbols = sorted(symbol_stats, key=lambda x: x['pnl'], reverse=True)[:10]
+        worst_symbols = sorted(symbol_stats, key=lambda x: x['pnl'])[:10]
+    
+        # ===== ANÁLISIS DE ERRORES =====
+        error_stats = []
+        impact = Error.impactSummary(current_user.id, recent=0)
+        errors = db.session.query(Error.id, Error.description, Error.category) \
+            .filter(Error.user_id==current_user.id, Error.id.in_(list(impact))).order_by(Error.id).all()
+    
+        for error in errors:
+            summary = impact[error.id]
+            error_stats.append({
+                'description': error.description,
+                'category': error.category,
+                'frequency': summary['frequency'],
+                'avg_impact': abs(summary['avg_loss']),
+                'total_loss': abs(summary['total_loss']),
+                'last_occurrence': summary['last_exit']
+            })
+    
+        # Ordenar por frecuencia
+        error_stats.sort(key=lambda x: x['frequency'], reverse=True)
+    
+        # ===== DATOS PARA GRÁFICOS =====
+        # Balance histórico
+        balances = AccountBalance.query.filter(AccountBalance.user_id==current_user.id).order_by(AccountBalance.date).all()
+        balance_data = [{'date': b.date.strftime('%Y-%m-%d'), 'balance': float(b.balance)} for b in balances]
+    
+        # ===== COMPILAR ESTADÍSTICAS =====
+        stats = {
+            'total_trades': total_trades,
+            'winning_trades': winning_trades,
+            'losing_trades': losing_trades,
+            'win_rate': round(win_rate, 2),
+            'total_pnl': round(total_pnl, 2),
+            'avg_win': round(avg_win, 2),
+            'avg_loss': round(avg_loss, 2),
+            'avg_trade': round(avg_trade, 2),
+            'risk_reward': round(risk_reward, 2),
+            'profit_factor': round(profit_factor, 2),
+            'sharpe_ratio': round(sharpe_ratio, 2),
+            'max_drawdown': round(max_drawdown, 2),
+            'trades_this_month': trades_this_month,
+            'pnl_change': round(pnl_change, 2),
+            'best_trades': best_trades,
+            'worst_trades': worst_trades,
+            'strategy_stats': strategy_stats,
+            'watchlist_stats': watchlist_stats,
+            'monthly_stats': monthly_stats,
+            'top_symbols': top_symbols,
+            'worst_symbols': worst_symbols,
+            'error_stats': error_stats,
+            'balances': balance_data
+        }
+
+        # Los mejores y peores trades se guardan como ids (los objetos del ORM no sobreviven a la sesión)
+        cache.set(ResultCache.makeKey('complete-performance', current_user.id, current_user.data_version, params), stats)
+    
+    trades = {t.id: t for t in Trade.query.options(Trade.analyticsOptions()).filter(Trade.id.in_(stats['best_trades'] + stats['worst_trades'])).all()}
+    stats = {**stats, 'best_trades': [trades[id] for id in stats['best_trades'] if id in trades],
+             'worst_trades': [trades[id] for id in stats['worst_trades'] if id in trades]}
     
     # ===== OBTENER ESTRATEGIAS PARA FILTROS =====
     strategies = Strategy.query.filter(Strategy.user_id==current_user.id).all()
     
-    # ===== COMPILAR ESTADÍSTICAS =====
-    stats = {
-        'total_trades': total_trades,
-        'winning_trades': winning_trades,
-        'losing_trades': losing_trades,
-        'win_rate': round(win_rate, 2),
-        'total_pnl': round(total_pnl, 2),
-        'avg_win': round(avg_win, 2),
-        'avg_loss': round(avg_loss, 2),
-        'avg_trade': round(avg_trade, 2),
-        'risk_reward': round(risk_reward, 2),
-        'profit_factor': round(profit_factor, 2),
-        'sharpe_ratio': round(sharpe_ratio, 2),
-        'max_drawdown': round(max_drawdown, 2),
-        'trades_this_month': trades_this_month,
-        'pnl_change': round(pnl_change, 2),
-        'best_trades': best_trades,
-        'worst_trades': worst_trades,
-        'strategy_stats': strategy_stats,
-        'watchlist_stats': watchlist_stats,
-        'monthly_stats': monthly_stats,
-        'top_symbols': top_symbols,
-        'worst_symbols': worst_symbols,
-        'error_stats': error_stats,
-        'balances': balance_data
-    }
     
     return render_template('trade/performance-global.html', stats=stats, strategies=strategies)
 
+@journal_bp.route(rule='/performance/summary')
+@login_required
+def performance_summary() -> Response:
+    '''
+    Resumen (con mediana y percentiles) de cualquier rango de fechas a partir
+    de los rollups diarios, sin leer los trades.
+    '''
+    start = request.args.get('start', type=str)
+    end = request.args.get('end', type=str)
+    side = request.args.get('side', type=str)
+
+    summary = TradeRollup.getSummary(
+        user_id=current_user.id,
+        start=datetime.strptime(start, '%Y-%m-%d').date() if start else None,
+        end=datetime.strptime(end, '%Y-%m-%d').date() if end else None,
+        strategy_id=request.args.get('strategy', type=int),
+        symbol=request.args.get('symbol', type=str) or None,
+        side=side.upper() if side in ['LONG', 'SHORT'] else None
+    )
+    return jsonify(summary)
+
 @journal_bp.route(rule='/performance')
 @login_required
 def performance() -> str:
@@ -677,59 +841,76 @@ def performance() -> str:
     side = request.args.get('side', type=str)  # LONG or SHORT
     min_price = request.args.get('min_price', type=float)
     max_price = request.args.get('max_price', type=float)
+    # Presupuesto de puntos por gráfico: las series más largas se reducen con LTTB
+    points = request.args.get('points', current_app.config.get('CHART_MAX_POINTS'), type=int)
     
-    # ===== CONSTRUIR QUERY BASE =====
-    base_query = Trade.query.filter(Trade.user_id == current_user.id)
-    
-    # Filtro por watchlist
-    if watchlist_id:
-        base_query = base_query.join(
-            WatchlistEntry,
-            and_(
-                Trade.symbol == WatchlistEntry.symbol,
-                Trade.entry_date >= WatchlistEntry.date,
-                Trade.entry_date <= WatchlistEntry.date_exit
-            )
-        ).filter(WatchlistEntry.watchlist_id == watchlist_id)
-    
-    # Filtros adicionales
-    if strategy_id:
-        base_query = base_query.filter(Trade.strategy_id == strategy_id)
-    if asset_symbol not in ['None', '', None]:
-        base_query = base_query.filter(Trade.symbol == asset_symbol)
-    if side in ['LONG', 'SHORT']:
-        base_query = base_query.filter(Trade.trade_type == side.upper())
-    
-    # Filtros de fecha
     start = (datetime.today() - timedelta(days=30)).strftime('%Y-%m-%d') if not start else start
-    start_date = datetime.strptime(start, '%Y-%m-%d').date()
-    base_query = base_query.filter(Trade.entry_date >= start_date)
+    
+    # ===== CACHÉ =====
+    # La versión de datos del usuario sube con cada escritura: si no ha cambiado nada se reutiliza el resultado
+    cache = getResultCache()
+    params = {'start': start, 'end': end, 'strategy': strategy_id, 'symbol': asset_symbol, 'watchlist': watchlist_id,
+              'limit': limit, 'side': side if side in ['LONG', 'SHORT'] else None, 'points': points}
+    cached = cache.get(ResultCache.makeKey('performance', current_user.id, current_user.data_version, params))
+    
+    if cached is None:
+        # ===== CONSTRUIR QUERY BASE =====
+        base_query = Trade.query.filter(Trade.user_id == current_user.id)
+    
+        # Filtro por watchlist
+        if watchlist_id:
+            base_query = base_query.join(
+                WatchlistEntry,
+                and_(
+                    Trade.symbol == WatchlistEntry.symbol,
+                    Trade.entry_date >= WatchlistEntry.date,
+                    Trade.entry_date <= WatchlistEntry.date_exit
+                )
+            ).filter(WatchlistEntry.watchlist_id == watchlist_id)
+    
+        # Filtros adicionales
+        if strategy_id:
+            base_query = base_query.filter(Trade.strategy_id == strategy_id)
+        if asset_symbol not in ['None', '', None]:
+            base_query = base_query.filter(Trade.symbol == asset_symbol)
+        if side in ['LONG', 'SHORT']:
+            base_query = base_query.filter(Trade.trade_type == side.upper())
+    
+        # Filtros de fecha
+        start_date = datetime.strptime(start, '%Y-%m-%d').date()
+        base_query = base_query.filter(Trade.entry_date >= start_date)
 
-    if end:
-        end_date = datetime.strptime(end, '%Y-%m-%d').date()
-        base_query = base_query.filter(Trade.entry_date <= end_date)
-    else:
-        end = base_query.with_entities(func.max(Trade.entry_date)).scalar().strftime('%Y-%m-%d')
+        if end:
+            end_date = datetime.strptime(end, '%Y-%m-%d').date()
+            base_query = base_query.filter(Trade.entry_date <= end_date)
+        else:
+            end = base_query.with_entities(func.max(Trade.entry_date)).scalar().strftime('%Y-%m-%d')
     
-    # Aplicar límite
-    if limit:
-        base_query = base_query.limit(limit)
+        # Orden y límite al final: Query no admite order_by después de limit
+        base_query = base_query.order_by(Trade.entry_date).distinct()
+        if limit:
+            base_query = base_query.limit(limit)
     
-    # ===== OBTENER DATOS =====
-    all_trades = base_query.order_by(Trade.entry_date).distinct().all()
+        # ===== OBTENER DATOS =====
+        # Filas con solo las columnas numéricas: sin hidratar objetos ni cargar las notas
+        all_trades = Trade.analyticsRows(base_query)
 
-    # ===== CALCULAR ESTADÍSTICAS =====
-    stats = PerformanceMetrics(trades=all_trades).getComplete()
+        # ===== CALCULAR ESTADÍSTICAS =====
+        # Columnas de los trades construidas una sola vez para las estadísticas y los gráficos net y gross
+        frame = TradeFrame(all_trades)
+        stats = PerformanceMetrics(trades=all_trades, frame=frame).getComplete()
+    
+        charts = {mode: PerformanceCharts(trades=all_trades, mode=mode, frame=frame, max_points=points).getAll() for mode in TradeFrame.MODES}
+
+        # Se guarda con la versión posterior al commit de los MFE/MAE
+        cached = {'stats': stats, 'charts': charts, 'end': end}
+        cache.set(ResultCache.makeKey('performance', current_user.id, current_user.data_version, params), cached)
     
-    charts = {
-        'net': PerformanceCharts(trades=all_trades, mode='net').getAll(),
-        'gross': PerformanceCharts(trades=all_trades, mode='gross').getAll(),
-    }
     # ===== OBTENER DATOS ADICIONALES =====
     strategies = Strategy.query.filter(Strategy.user_id == current_user.id).all()
     
-    return render_template('trade/performance.html', stats=stats, strategies=strategies, charts=charts, 
-                           start=start, end=end, strategy_id=strategy_id, asset_symbol=asset_symbol if asset_symbol else '', watchlist_id=watchlist_id, limit=limit, side=side)
+    return render_template('trade/performance.html', stats=cached['stats'], strategies=strategies, charts=cached['charts'], 
+                           start=start, end=cached['end'], strategy_id=strategy_id, asset_symbol=asset_symbol if asset_symbol else '', watchlist_id=watchlist_id, limit=limit, side=side)
 
 def get_balance_data():
     """Obtener datos de balance histórico"""
@@ -1,13 +1,17 @@
 
 import os
 import pytz
-from datetime import datetime
+import numpy as np
+from datetime import datetime, time, timezone
 from werkzeug.utils import secure_filename
 from flask import flash
 
 from ..config import UPLOAD_FOLDER, ALLOWED_IMAGE_EXTENSIONS, ALLOWED_VIDEO_EXTENSIONS, MAX_IMAGE_SIZE, MAX_VIDEO_SIZE
-from ..models import Trade, Candle
+from ..models import Trade, Candle, CandleCoverage
+from ..models.candle_coverage import timeframeDelta
 from ..src.yahoofinance import YahooTicker
+from ..src.candle_store import getCandleStore
+from ..jobs import job_queue
 
 def allowed_file(filename, allowed_extensions) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
@@ -55,34 +59,18 @@ def save_uploaded_files(files, file_type, trade_id) -> list:
 
 
 
-def calculate_max_drawdown(trades: list[Trade]) -> int:
-    """Calcular el maximum drawdown de una serie de trades"""
-    if not trades:
+def calculate_max_drawdown(trades: list[Trade] | np.ndarray) -> float:
+    """Calcular el maximum drawdown (% sobre el pico) de una serie de trades o de sus P&L"""
+    pnl = trades if isinstance(trades, np.ndarray) else np.array([trade.profit_loss for trade in trades], dtype=float)
+    if not len(pnl):
         return 0
     
-    # Calcular equity curve
-    equity: list = []
-    running_total = 0
+    # Equity curve y drawdown respecto al pico anterior
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(equity)
+    drawdown = np.divide(peak - equity, peak, out=np.zeros(len(equity)), where=peak != 0) * 100
     
-    for trade in trades:
-        running_total += trade.profit_loss
-        equity.append(running_total)
-    
-    if not equity:
-        return 0
-    
-    # Calcular drawdown
-    peak = equity[0]
-    max_dd: int = 0
-    
-    for value in equity:
-        if value > peak:
-            peak = value
-        
-        drawdown = (peak - value) / peak * 100 if peak != 0 else 0
-        max_dd = max(max_dd, drawdown)
-    
-    return max_dd
+    return max(float(drawdown.max()), 0)
 
 
 def download_candles(db, symbol:str, config:dict[str, datetime|str]):
@@ -95,50 +83,84 @@ def download_candles(db, symbol:str, config:dict[str, datetime|str]):
     '''
     try:
         yf = YahooTicker(symbol)
-        data = []
+        store = getCandleStore()
         for conf in config:
-            data.append([conf['timeframe'], yf.getPrice(start=conf['start'], end=conf['end'], timeframe=conf['timeframe'], df=True)])
-            db.session.query(Candle).filter(Candle.symbol == symbol, Candle.date >= conf['start'], Candle.date <= conf['end'], Candle.timeframe == conf['timeframe']).delete(synchronize_session=False)
+            candles = yf.getPrice(start=conf['start'], end=conf['end'], timeframe=conf['timeframe'], df=True)
+            # Las velas existentes se actualizan en lugar de borrar y reinsertar el rango
+            store.writeArrays(symbol=symbol, timeframe=conf['timeframe'], arrays=Candle.arraysFromFrame(candles))
 
-        db.session.commit()
+        # Registrar lo pedido, aunque no haya velas (noches, fines de semana, festivos), hasta
+        # el horizonte cerrado: la última vela aún puede cambiar. Si la descarga falla no se registra nada
+        for conf in config:
+            start, end = _configRange(conf)
+            end = min(end, _settledUntil(conf['timeframe']))
+            if start < end:
+                CandleCoverage.add(symbol=symbol, timeframe=conf['timeframe'], start=start, end=end)
 
-        candle_objs = []
-        for tf, candles in data:
-            if hasattr(candles, 'iterrows'):
-                candle_objs += [
-                    Candle(
-                        symbol=symbol,
-                        date=row['date'] if 'date' in row else idx, # .strftime('%Y-%m-%d %H:%M:%S%z')
-                        open=row['open'],
-                        high=row['high'],
-                        low=row['low'],
-                        close=row['close'],
-                        volume=row.get('volume', None),
-                        session=row.get('session', 'REG'),
-                        timeframe=tf
-                    ) for idx, row in candles.iterrows()
-                ]
-            elif isinstance(candles, list):
-                candle_objs += [
-                    Candle(
-                        symbol=symbol,
-                        date=row['date'], # .strftime('%Y-%m-%d %H:%M:%S%z'),
-                        open=row['open'],
-                        high=row['high'],
-                        low=row['low'],
-                        close=row['close'],
-                        volume=row.get('volume', None),
-                        session=row.get('session', 'REG'),
-                        timeframe=tf
-                    ) for row in candles
-                ]
-
-        if candle_objs:
-            db.session.bulk_save_objects(candle_objs)
-            db.session.commit()
+        db.session.commit()
+        # Otra vez tras el commit para no conservar velas remuestreadas de antes de confirmar
+        store.invalidate(symbol)
 
     except Exception as e:
+        db.session.rollback()
         print(f"Error descargando velas para {symbol}: {e}")
+        # Se relanza para que la cola de trabajos pueda reintentar
+        raise
+
+
+def _configRange(conf:dict[str, datetime|str]) -> tuple[datetime, datetime]:
+    """Rango de una configuración de descarga como datetimes (las fechas cubren el día completo)"""
+    start, end = conf['start'], conf['end']
+    if not isinstance(start, datetime):
+        start = datetime.combine(start, time(0, 0, 0))
+    if not isinstance(end, datetime):
+        end = datetime.combine(end, time(23, 59, 59))
+    return start, end
+
+def _settledUntil(timeframe:str) -> datetime:
+    """Hasta dónde las velas del timeframe ya no cambian: ahora (UTC, como las velas) menos una vela"""
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timeframeDelta(timeframe)
+
+def sync_candles(db, symbol:str, config:list[dict[str, datetime|str]]):
+    '''
+    Descarga únicamente los tramos de cada configuración que no estén ya en
+    la base de datos según CandleCoverage. Si todo está cubierto no hay
+    ninguna petición a Yahoo.
+
+    symbol: str
+        Symbol of the asset.
+    config: list[dict]
+        Same format as in download_candles.
+    '''
+    missing = []
+    for conf in config:
+        start, end = _configRange(conf)
+        # El futuro y la vela en curso todavía no tienen velas definitivas
+        end = min(end, _settledUntil(conf['timeframe']))
+        missing += [{'timeframe': conf['timeframe'], 'start': gap_start, 'end': gap_end} 
+                    for gap_start, gap_end in CandleCoverage.missing(symbol=symbol, timeframe=conf['timeframe'], start=start, end=end)]
+
+    if missing:
+        download_candles(db=db, symbol=symbol, config=missing)
+
+    return missing
+
+def queue_candles(symbol:str, config:list[dict[str, datetime|str]], user_id:int=None):
+    '''
+    Encola la sincronización de velas para ejecutarla fuera de la petición.
+    Llamar después del commit del trade para que el worker vea los datos.
+
+    symbol: str
+        Symbol of the asset.
+    config: list[dict]
+        Same format as in download_candles.
+    '''
+    payload = {'symbol': symbol, 'config': []}
+    for conf in config:
+        start, end = _configRange(conf)
+        payload['config'].append({'timeframe': conf['timeframe'], 'start': start.isoformat(), 'end': end.isoformat()})
+
+    return job_queue.enqueue(kind='sync_candles', payload=payload, symbol=symbol, user_id=user_id)
 
 
 def utcToLocal(date:str, time:str, tz:str='Europe/Madrid', mode:str='date'):
@@ -6,7 +6,7 @@ from flask_login import login_required, current_user
 
 from ..models import db, Watchlist, WatchlistEntry, WatchlistCondition, Candle
 from ..src.yahoofinance import YahooTicker
-from .utils import download_candles
+from .utils import queue_candles
 
 watchlist_bp = Blueprint(name='watchlist_endpoints', import_name=__name__)
 
@@ -178,14 +178,12 @@ def add_watchlist_entry():
                 entry.add_condition(condition_id=condition_ids[i], value=condition_values[i])
 
         one_year_ago = entry.date - timedelta(days=365)
-        # Descargar velas con Yahoo Finance y sobreescribir las existentes
-        download_candles(db=db,
-                        symbol=entry.symbol,
-                        config=[
-                            {'timeframe': '1d', 'start':one_year_ago, 'end':entry.date},
-                        ])
-        
         db.session.commit()
+
+        # La descarga se hace en segundo plano una vez guardados los datos
+        queue_candles(symbol=entry.symbol, user_id=current_user.id, config=[
+            {'timeframe': '1d', 'start':one_year_ago, 'end':entry.date},
+        ])
         flash('Activo añadido a la watchlist exitosamente!', 'success')
         return redirect(url_for('watchlist_endpoints.watchlist_detail', id=entry.watchlist_id))
     
@@ -251,13 +249,12 @@ def delete_watchlist_entry(id):
         
         # Agregar fecha de salida
         entry.date_exit = date.today()
-        download_candles(db=db,
-                        symbol=entry.symbol,
-                        config=[
-                            {'timeframe': '1d', 'start': entry.date, 'end':entry.date_exit},
-                        ])
-        
         db.session.commit()
+
+        # La descarga se hace en segundo plano una vez guardados los datos
+        queue_candles(symbol=entry.symbol, user_id=current_user.id, config=[
+            {'timeframe': '1d', 'start': entry.date, 'end':entry.date_exit},
+        ])
         
         flash(f'Activo {entry.symbol} dado de baja exitosamente', 'success')
         
@@ -369,14 +366,12 @@ def edit_watchlist_entry(id):
                 entry.add_condition(condition_id=condition_ids[i], value=condition_values[i])
 
         one_year_ago = entry.date - timedelta(days=365)
-        # Descargar velas con Yahoo Finance y sobreescribir las existentes
-        download_candles(db=db,
-                        symbol=entry.symbol,
-                        config=[
-                            {'timeframe': '1d', 'start':one_year_ago, 'end':entry.date},
-                        ])
-        
         db.session.commit()
+
+        # La descarga se hace en segundo plano una vez guardados los datos
+        queue_candles(symbol=entry.symbol, user_id=current_user.id, config=[
+            {'timeframe': '1d', 'start':one_year_ago, 'end':entry.date},
+        ])
         
         flash(f'Registro de {entry.symbol} actualizado exitosamente', 'success')
         return redirect(url_for('watchlist_endpoints.detail_watchlist_entry', id=entry.id))
@@ -0,0 +1,170 @@
+from datetime import datetime, time, timedelta, timezone
+import numpy as np
+
+# Sin imports relativos: los scripts de src (exotic_performance...) lo importan directamente
+
+COLUMNS: list[str] = ['date', 'open', 'high', 'low', 'close', 'volume', 'session']
+PRICE_COLUMNS: list[str] = ['open', 'high', 'low', 'close', 'volume']
+
+def _toUtcNaive(date:datetime) -> datetime:
+    return date.astimezone(timezone.utc).replace(tzinfo=None) if date.tzinfo is not None else date
+
+def _emptyArrays() -> dict[str, np.ndarray]:
+    arrays = {col: np.array([], dtype=float) for col in PRICE_COLUMNS}
+    arrays['date'] = np.array([], dtype='datetime64[s]')
+    arrays['session'] = np.array([], dtype='U4')
+    return arrays
+
+def mergeWindows(windows:list[tuple[str, datetime, datetime]], gap:timedelta=timedelta(0)) -> dict[str, list[tuple[datetime, datetime]]]:
+    '''
+    Agrupa los rangos por símbolo fusionando los que se solapan o están a menos
+    de gap, para leerlos con el mínimo número de rangos.
+    '''
+    merged = {}
+    for symbol, start, end in sorted((symbol, _toUtcNaive(start), _toUtcNaive(end)) for symbol, start, end in windows):
+        ranges = merged.setdefault(symbol, [])
+        if ranges and start <= ranges[-1][1] + gap:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((start, end))
+    return merged
+
+def queryWindowArrays(session, model, timeframe:str, ranges:list[tuple[str, datetime, datetime]],
+                      chunk_size:int=200) -> dict[str, dict[str, np.ndarray]]:
+    '''
+    Lee varios rangos de la tabla de velas con una consulta por cada chunk_size
+    rangos (SQLite limita la profundidad de las expresiones).
+
+    session:
+        SQLAlchemy session.
+    model:
+        Candle model (the app one or the one imported by the scripts).
+    ranges: list[tuple[str, datetime, datetime]]
+        Non overlapping (symbol, start, end) ranges sorted by symbol and start.
+    '''
+    from sqlalchemy import select, and_, or_
+
+    parts = {}
+    for i in range(0, len(ranges), chunk_size):
+        rows = session.execute(
+            select(model.symbol, *[getattr(model, col) for col in COLUMNS])
+            .filter(model.timeframe == timeframe, or_(*[
+                and_(model.symbol == symbol, model.date >= start, model.date <= end)
+                for symbol, start, end in ranges[i:i + chunk_size]
+            ]))
+            .order_by(model.symbol, model.date)
+        ).all()
+        if not rows:
+            continue
+
+        columns = list(zip(*rows))
+        symbols = np.array(columns[0])
+        arrays = {col: np.array(columns[j + 1], dtype=float) for j, col in enumerate(COLUMNS) if col in PRICE_COLUMNS}
+        arrays['date'] = np.array([_toUtcNaive(d) for d in columns[1]], dtype='datetime64[s]')
+        arrays['session'] = np.array([s or 'REG' for s in columns[-1]], dtype='U4')
+
+        # Las filas vienen ordenadas por símbolo: cada símbolo es un tramo contiguo
+        starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]])
+        for a, b in zip(starts, np.r_[starts[1:], len(symbols)]):
+            parts.setdefault(str(symbols[a]), []).append({col: values[a:b] for col, values in arrays.items()})
+
+    return {symbol: {col: np.concatenate([part[col] for part in chunks]) for col in COLUMNS}
+            for symbol, chunks in parts.items()}
+
+class SessionCandleSource:
+    '''
+    Origen de velas mínimo para CandleBatchLoader a partir de una sesión y un
+    modelo Candle, para los scripts que no tienen la aplicación de Flask.
+    '''
+
+    def __init__(self, session, model):
+        self.session = session
+        self.model = model
+
+    def getWindowArrays(self, timeframe:str, windows:list[tuple[str, datetime, datetime]]) -> dict[str, dict[str, np.ndarray]]:
+        ranges = [(symbol, start, end) for symbol, symbol_ranges in mergeWindows(windows).items() for start, end in symbol_ranges]
+        return queryWindowArrays(self.session, self.model, timeframe=timeframe, ranges=ranges)
+
+class CandleBatchLoader:
+    '''
+    Carga las velas de una lista de trades de una vez.
+
+    Las ventanas de todos los trades se fusionan por símbolo y se leen con el
+    mínimo número de consultas. Las velas de cada trade son vistas (slices) de
+    los arrays de su símbolo, sin copias.
+
+    >>> loader = CandleBatchLoader(trades, store=getCandleStore(), window=CandleBatchLoader.dayWindow)
+    >>> arrays = loader[trade]
+    '''
+
+    def __init__(self, trades:list, store, timeframe:str='1m', window=None, gap:timedelta=timedelta(hours=1)):
+        '''
+        trades: list[Trade]
+            Trades to load.
+        store:
+            CandleStore (or SessionCandleSource) with getWindowArrays.
+        timeframe: str
+            Candle timeframe.
+        window: Callable[[Trade], tuple[datetime, datetime] | None]
+            Range of candles of each trade. CandleBatchLoader.tradeWindow by default.
+        gap: timedelta
+            Windows of the same symbol closer than this are read as a single range.
+        '''
+        self.trades: list = trades
+        self.store = store
+        self.timeframe: str = timeframe
+        self.window = window or CandleBatchLoader.tradeWindow
+        self.gap: timedelta = gap
+        self.windows: dict[int, tuple[str, datetime, datetime]] = {}
+        self.arrays: dict[str, dict[str, np.ndarray]] = None
+
+    @staticmethod
+    def tradeWindow(trade) -> tuple[datetime, datetime] | None:
+        """Desde la entrada hasta el minuto siguiente a la salida (como Trade.getCandles)"""
+        if not (trade.entry_date and trade.entry_time and trade.exit_date and trade.exit_time):
+            return None
+        start = datetime.combine(trade.entry_date, datetime.strptime(trade.entry_time, '%H:%M:%S').time())
+        end = datetime.combine(trade.exit_date, datetime.strptime(trade.exit_time, '%H:%M:%S').time())
+        return start, end + timedelta(minutes=1)
+
+    @staticmethod
+    def dayWindow(trade) -> tuple[datetime, datetime] | None:
+        """Día UTC completo de la entrada"""
+        if not trade.entry_date:
+            return None
+        start = datetime.combine(trade.entry_date, time(0, 0, 0))
+        return start, start + timedelta(days=1) - timedelta(seconds=1)
+
+    def load(self) -> 'CandleBatchLoader':
+        for trade in self.trades:
+            window = self.window(trade)
+            if window is not None:
+                self.windows[trade.id] = (trade.symbol, _toUtcNaive(window[0]), _toUtcNaive(window[1]))
+
+        # Se amplían los rangos cercanos para que la consulta tenga menos condiciones
+        ranges = [(symbol, start, end) for symbol, symbol_ranges in mergeWindows(list(self.windows.values()), gap=self.gap).items()
+                  for start, end in symbol_ranges]
+        self.arrays = self.store.getWindowArrays(timeframe=self.timeframe, windows=ranges) if ranges else {}
+        return self
+
+    def get(self, trade) -> dict[str, np.ndarray]:
+        """Velas del trade como vistas de los arrays de su símbolo (vacías si no hay)"""
+        if self.arrays is None:
+            self.load()
+
+        window = self.windows.get(trade.id)
+        arrays = self.arrays.get(trade.symbol) if window else None
+        if arrays is None:
+            return _emptyArrays()
+
+        lo = np.searchsorted(arrays['date'], np.datetime64(window[1], 's'), side='left')
+        hi = np.searchsorted(arrays['date'], np.datetime64(window[2], 's'), side='right')
+        return {col: values[lo:hi] for col, values in arrays.items()}
+
+    def __getitem__(self, trade) -> dict[str, np.ndarray]:
+        return self.get(trade)
+
+    def __iter__(self):
+        """Pares (trade, velas) en el orden de la lista"""
+        for trade in self.trades:
+            yield trade, self.get(trade)
@@ -0,0 +1,480 @@
+import os
+import base64
+import shutil
+from abc import ABC, abstractmethod
+from urllib.parse import quote, unquote
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app, has_app_context
+
+from ..models import db
+from ..models.candle import Candle
+from .downsample import downsampleOhlc
+from .resample import LRUCache, bucketStart, isIntraday, resampleArrays
+from .candle_batch import COLUMNS, PRICE_COLUMNS, _toUtcNaive, _emptyArrays, mergeWindows, queryWindowArrays
+
+SESSIONS: list[str] = ['PRE', 'REG', 'POST']
+
+def toColumnar(arrays:dict[str, np.ndarray], encoding:str='json', decimals:int=6, max_points:int=None) -> dict:
+    '''
+    Velas en formato columnar para los gráficos: arrays paralelos t (epoch en
+    ms), o, h, l, c, v y s (índice en sessions).
+
+    encoding: str
+        'json' for plain lists or 'base64' for little-endian typed arrays
+        (Float64Array for t/o/h/l/c/v and Uint8Array for s).
+    decimals: int
+        Decimals kept on the json encoding.
+    max_points: int
+        Maximum number of candles. Consecutive candles of the same session are merged into OHLC buckets.
+    '''
+    arrays = downsampleOhlc(arrays, max_points)
+    session = np.asarray(arrays['session'])
+    codes = np.ones(len(session), dtype=np.uint8)
+    for i, name in enumerate(SESSIONS):
+        codes[session == name] = i
+
+    columns = {
+        't': np.asarray(arrays['date'], dtype='datetime64[ms]').astype(np.int64).astype(float),
+        **{col[0]: np.asarray(arrays[col], dtype=float) for col in PRICE_COLUMNS},
+    }
+
+    payload = {'format': 'columnar', 'encoding': encoding, 'sessions': SESSIONS, 'length': len(codes)}
+    if encoding == 'base64':
+        for key, values in columns.items():
+            payload[key] = base64.b64encode(values.astype('<f8').tobytes()).decode('ascii')
+        payload['s'] = base64.b64encode(codes.tobytes()).decode('ascii')
+    else:
+        payload['t'] = columns.pop('t').astype(np.int64).tolist()
+        for key, values in columns.items():
+            values = np.round(values, decimals)
+            # NaN no es JSON válido
+            payload[key] = [None if v != v else v for v in values.tolist()] if np.isnan(values).any() else values.tolist()
+        payload['s'] = codes.tolist()
+
+    return payload
+
+class CandleRecord:
+    '''
+    Vela de solo lectura con los mismos atributos que el modelo Candle. Es lo
+    que devuelven los almacenes que no guardan las velas en la base de datos.
+    '''
+    __slots__ = ('id', 'symbol', 'timeframe', 'date', 'open', 'high', 'low', 'close', 'volume', 'session', 'created_at')
+
+    def __init__(self, symbol:str, timeframe:str, date:datetime, open:float, high:float, low:float,
+                 close:float, volume:float, session:str):
+        self.id = None
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.date = date
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.session = session
+        self.created_at = None
+
+    def to_dict(self, exclude:list=[]):
+        return Candle.to_dict(self, exclude=exclude)
+
+class CandleStore(ABC):
+    '''
+    Interfaz común de los almacenes de velas.
+
+    Todas las fechas son UTC sin zona horaria y los rangos incluyen ambos extremos.
+    Un almacén al que le falte algún método abstracto falla al instanciarse.
+    '''
+
+    def __init__(self, cache_size:int=128):
+        # Velas remuestreadas por (symbol, timeframe, start, end, sessions)
+        self.cache: LRUCache = LRUCache(maxsize=cache_size)
+
+    def _toRecords(self, arrays:dict[str, np.ndarray], symbol:str, timeframe:str) -> list[CandleRecord]:
+        dates = arrays['date'].astype(datetime).tolist()
+        columns = {col: arrays[col].tolist() for col in PRICE_COLUMNS + ['session']}
+
+        return [CandleRecord(symbol=symbol, timeframe=timeframe, date=date,
+                             **{col: columns[col][i] for col in columns})
+                for i, date in enumerate(dates)]
+
+    def getCandles(self, symbol:str, timeframe:str, start:datetime, end:datetime) -> list:
+        """Velas ordenadas por fecha como objetos con los atributos de Candle"""
+        arrays = self.getArrays(symbol=symbol, timeframe=timeframe, start=start, end=end)
+        return self._toRecords(arrays, symbol=symbol, timeframe=timeframe)
+
+    @abstractmethod
+    def getArrays(self, symbol:str, timeframe:str, start:datetime, end:datetime) -> dict[str, np.ndarray]:
+        """Velas en formato columnar: date (datetime64[s]), open, high, low, close, volume y session"""
+        raise NotImplementedError
+
+    def getWindowArrays(self, timeframe:str, windows:list[tuple[str, datetime, datetime]]) -> dict[str, dict[str, np.ndarray]]:
+        '''
+        Velas de varios rangos de una vez, agrupadas por símbolo y ordenadas por
+        fecha. Los rangos que se solapan se leen una sola vez.
+
+        windows: list[tuple[str, datetime, datetime]]
+            (symbol, start, end) ranges, both ends included.
+        '''
+        result = {}
+        for symbol, ranges in mergeWindows(windows).items():
+            parts = [self.getArrays(symbol=symbol, timeframe=timeframe, start=start, end=end) for start, end in ranges]
+            result[symbol] = {col: np.concatenate([part[col] for part in parts]) for col in COLUMNS}
+        return result
+
+    def getResampledArrays(self, symbol:str, timeframe:str, start:datetime, end:datetime,
+                           sessions:list[str]=None, source:str='1m') -> dict[str, np.ndarray]:
+        '''
+        Velas de cualquier timeframe calculadas a partir de las velas guardadas
+        de source, sin descargas adicionales. El inicio se alinea al de la vela
+        para que la primera no quede incompleta.
+        '''
+        if timeframe == source and sessions is None:
+            return self.getArrays(symbol=symbol, timeframe=timeframe, start=start, end=end)
+
+        start = bucketStart(np.array([_toUtcNaive(start)], dtype='datetime64[s]'), timeframe)[0].astype(datetime)
+        key = (symbol, timeframe, start, _toUtcNaive(end), tuple(sessions) if sessions else None, source)
+        arrays = self.cache.get(key)
+        if arrays is None:
+            arrays = resampleArrays(self.getArrays(symbol=symbol, timeframe=source, start=start, end=end),
+                                    timeframe=timeframe, sessions=sessions)
+            self.cache.put(key, arrays)
+
+        return arrays
+
+    def getResampledCandles(self, symbol:str, timeframe:str, start:datetime, end:datetime,
+                            sessions:list[str]=None, source:str='1m') -> list[CandleRecord]:
+        arrays = self.getResampledArrays(symbol=symbol, timeframe=timeframe, start=start, end=end,
+                                         sessions=sessions, source=source)
+        return self._toRecords(arrays, symbol=symbol, timeframe=timeframe)
+
+    def invalidate(self, symbol:str):
+        """Descarta las velas remuestreadas del símbolo"""
+        self.cache.invalidate(lambda key: key[0] == symbol)
+
+    def write(self, rows:list[dict]) -> int:
+        """Inserta o sustituye velas. Cada fila con symbol, timeframe, date, open, high, low, close, volume y session"""
+        written = self._write(rows)
+        for symbol in {row['symbol'] for row in rows}:
+            self.invalidate(symbol)
+        return written
+
+    @abstractmethod
+    def _write(self, rows:list[dict]) -> int:
+        raise NotImplementedError
+
+    def writeArrays(self, symbol:str, timeframe:str, arrays:dict[str, np.ndarray]) -> int:
+        """Igual que write pero con las velas en formato columnar (ver Candle.arraysFromFrame)"""
+        written = self._writeArrays(symbol=symbol, timeframe=timeframe, arrays=arrays)
+        self.invalidate(symbol)
+        return written
+
+    @abstractmethod
+    def _writeArrays(self, symbol:str, timeframe:str, arrays:dict[str, np.ndarray]) -> int:
+        raise NotImplementedError
+
+    def delete(self, symbol:str, timeframe:str=None, start:datetime=None, end:datetime=None) -> int:
+        """Borra las velas del símbolo (todas o las de un timeframe y rango). Devuelve las velas borradas"""
+        deleted = self._delete(symbol=symbol, timeframe=timeframe, start=start, end=end)
+        self.invalidate(symbol)
+        return deleted
+
+    @abstractmethod
+    def _delete(self, symbol:str, timeframe:str=None, start:datetime=None, end:datetime=None) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def symbols(self) -> list[str]:
+        """Símbolos con alguna vela guardada"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def bounds(self, symbol:str, timeframe:str) -> tuple[datetime, datetime] | None:
+        """Primera y última fecha guardada del símbolo y timeframe"""
+        raise NotImplementedError
+
+class DatabaseCandleStore(CandleStore):
+    '''
+    Velas en la tabla candle (comportamiento original).
+
+    Usa db.session salvo que se indique otra sesión (scripts fuera de Flask).
+    '''
+
+    def __init__(self, cache_size:int=128, session=None):
+        super().__init__(cache_size=cache_size)
+        self.session = session
+
+    @property
+    def _session(self):
+        return self.session or db.session
+
+    def _filters(self, symbol:str, timeframe:str, start:datetime, end:datetime) -> list:
+        return [Candle.symbol == symbol, Candle.timeframe == timeframe, Candle.date >= start, Candle.date <= end]
+
+    def getCandles(self, symbol:str, timeframe:str, start:datetime, end:datetime) -> list[Candle]:
+        return self._session.query(Candle).filter(*self._filters(symbol, timeframe, start, end)).order_by(Candle.date).all()
+
+    def getArrays(self, symbol:str, timeframe:str, start:datetime, end:datetime) -> dict[str, np.ndarray]:
+        # Se leen solo las columnas, sin construir objetos del ORM
+        rows = self._session.execute(
+            db.select(*[getattr(Candle, col) for col in COLUMNS])
+            .filter(*self._filters(symbol, timeframe, start, end))
+            .order_by(Candle.date)
+        ).all()
+
+        if not rows:
+            return _emptyArrays()
+
+        columns = list(zip(*rows))
+        arrays = {col: np.array(columns[i], dtype=float) for i, col in enumerate(COLUMNS) if col in PRICE_COLUMNS}
+        arrays['date'] = np.array([_toUtcNaive(d) for d in columns[0]], dtype='datetime64[s]')
+        arrays['session'] = np.array([s or 'REG' for s in columns[-1]], dtype='U4')
+        return arrays
+
+    def getWindowArrays(self, timeframe:str, windows:list[tuple[str, datetime, datetime]]) -> dict[str, dict[str, np.ndarray]]:
+        # Todos los rangos en una consulta (por bloques de 200 rangos)
+        ranges = [(symbol, start, end) for symbol, symbol_ranges in mergeWindows(windows).items() for start, end in symbol_ranges]
+        return queryWindowArrays(self._session, Candle, timeframe=timeframe, ranges=ranges)
+
+    def _write(self, rows:list[dict]) -> int:
+        return Candle.upsert(rows, session=self.session)
+
+    def _writeArrays(self, symbol:str, timeframe:str, arrays:dict[str, np.ndarray]) -> int:
+        return Candle.upsertArrays(symbol=symbol, timeframe=timeframe, arrays=arrays, session=self.session)
+
+    def _delete(self, symbol:str, timeframe:str=None, start:datetime=None, end:datetime=None) -> int:
+        query = self._session.query(Candle).filter(Candle.symbol == symbol)
+        if timeframe:
+            query = query.filter(Candle.timeframe == timeframe)
+        if start:
+            query = query.filter(Candle.date >= start)
+        if end:
+            query = query.filter(Candle.date <= end)
+        return query.delete(synchronize_session=False)
+
+    def symbols(self) -> list[str]:
+        return [symbol for symbol, in self._session.execute(db.select(Candle.symbol).distinct()).all()]
+
+    def bounds(self, symbol:str, timeframe:str) -> tuple[datetime, datetime] | None:
+        first, last = self._session.execute(
+            db.select(db.func.min(Candle.date), db.func.max(Candle.date))
+            .filter(Candle.symbol == symbol, Candle.timeframe == timeframe)
+        ).one()
+        return (first, last) if first else None
+
+class MemmapCandleStore(CandleStore):
+    '''
+    Velas en ficheros .npy por columna, leídos con numpy.memmap.
+
+    Estructura: <root>/<symbol>/<timeframe>/<partition>/<column>.npy, con una
+    partición por día para los timeframes intradía y una por año para el
+    resto. Dentro de cada partición las velas están ordenadas por fecha, así
+    que un rango se resuelve con searchsorted sobre la columna date y las
+    columnas devueltas son vistas sobre el fichero mapeado (sin copia) cuando
+    el rango cae en una sola partición.
+    '''
+
+    def __init__(self, root:str, cache_size:int=128):
+        super().__init__(cache_size=cache_size)
+        self.root: str = root
+
+    def _partitions(self, timeframe:str, start:datetime, end:datetime) -> list[str]:
+        if isIntraday(timeframe):
+            days = (end.date() - start.date()).days
+            return [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days + 1)]
+        return [str(year) for year in range(start.year, end.year + 1)]
+
+    def _path(self, symbol:str, timeframe:str, partition:str=None) -> str:
+        path = os.path.join(self.root, quote(symbol, safe=''), timeframe)
+        return os.path.join(path, partition) if partition else path
+
+    def _load(self, path:str, mmap_mode:str='r') -> dict[str, np.ndarray]:
+        return {col: np.load(os.path.join(path, f'{col}.npy'), mmap_mode=mmap_mode) for col in COLUMNS}
+
+    def getArrays(self, symbol:str, timeframe:str, start:datetime, end:datetime) -> dict[str, np.ndarray]:
+        start, end = _toUtcNaive(start), _toUtcNaive(end)
+        lo, hi = np.datetime64(start, 's'), np.datetime64(end, 's')
+
+        chunks = []
+        for partition in self._partitions(timeframe, start, end):
+            path = self._path(symbol, timeframe, partition)
+            if not os.path.isdir(path):
+                continue
+
+            arrays = self._load(path)
+            dates = arrays['date']
+            i, j = np.searchsorted(dates, lo, side='left'), np.searchsorted(dates, hi, side='right')
+            if i < j:
+                chunks.append({col: arrays[col][i:j] for col in COLUMNS})
+
+        if not chunks:
+            return _emptyArrays()
+        if len(chunks) == 1:
+            return chunks[0]
+        return {col: np.concatenate([chunk[col] for chunk in chunks]) for col in COLUMNS}
+
+    def _write(self, rows:list[dict]) -> int:
+        groups: dict[tuple[str, str], list[dict]] = {}
+        for row in rows:
+            groups.setdefault((row['symbol'], row['timeframe']), []).append(row)
+
+        for (symbol, timeframe), group in groups.items():
+            self._writeArrays(symbol=symbol, timeframe=timeframe, arrays={
+                'date': np.array([_toUtcNaive(r['date']) for r in group], dtype='datetime64[s]'),
+                'session': np.array([r.get('session') or 'REG' for r in group], dtype='U4'),
+                **{col: np.array([r.get(col) for r in group], dtype=float) for col in PRICE_COLUMNS},
+            })
+
+        return len(rows)
+
+    def _writeArrays(self, symbol:str, timeframe:str, arrays:dict[str, np.ndarray]) -> int:
+        dates = np.asarray(arrays['date'], dtype='datetime64[s]')
+        if len(dates) == 0:
+            return 0
+
+        arrays = {
+            'date': dates,
+            'session': np.asarray(arrays['session']).astype('U4'),
+            **{col: np.asarray(arrays[col], dtype=float) for col in PRICE_COLUMNS},
+        }
+        # Sin volumen se guarda 0 para que las velas sigan siendo serializables a JSON
+        arrays['volume'] = np.nan_to_num(arrays['volume'], nan=0.0)
+
+        # Una partición por día (intradía) o por año, con el mismo nombre que _partitions
+        keys = dates.astype('datetime64[D]' if isIntraday(timeframe) else 'datetime64[Y]')
+        for key in np.unique(keys):
+            mask = keys == key
+            self._writePartition(self._path(symbol, timeframe, str(key)), {col: arrays[col][mask] for col in COLUMNS})
+
+        return len(dates)
+
+    def _writePartition(self, path:str, new:dict[str, np.ndarray]):
+        if os.path.isdir(path):
+            # Las velas nuevas van detrás para que prevalezcan al eliminar duplicados
+            old = self._load(path, mmap_mode=None)
+            new = {col: np.concatenate([old[col], new[col]]) for col in COLUMNS}
+
+        # Última aparición de cada fecha, ordenado por fecha
+        reversed_dates = new['date'][::-1]
+        _, idx = np.unique(reversed_dates, return_index=True)
+        keep = len(reversed_dates) - 1 - idx
+
+        self._savePartition(path, {col: new[col][keep] for col in COLUMNS})
+
+    def _savePartition(self, path:str, arrays:dict[str, np.ndarray]):
+        # Se escribe en un directorio temporal y se sustituye al final para no dejar particiones a medias
+        tmp = f'{path}.tmp-{os.getpid()}'
+        os.makedirs(tmp, exist_ok=True)
+        for col in COLUMNS:
+            np.save(os.path.join(tmp, f'{col}.npy'), np.ascontiguousarray(arrays[col]))
+
+        if os.path.isdir(path):
+            old_path = f'{path}.old-{os.getpid()}'
+            os.replace(path, old_path)
+            os.replace(tmp, path)
+            shutil.rmtree(old_path, ignore_errors=True)
+        else:
+            os.replace(tmp, path)
+
+    def _listPartitions(self, symbol:str, timeframe:str) -> list[str]:
+        path = self._path(symbol, timeframe)
+        if not os.path.isdir(path):
+            return []
+        return sorted(p for p in os.listdir(path) if '.' not in p)
+
+    def _delete(self, symbol:str, timeframe:str=None, start:datetime=None, end:datetime=None) -> int:
+        if timeframe is None:
+            timeframes = os.listdir(self._path(symbol, '')) if os.path.isdir(self._path(symbol, '')) else []
+        else:
+            timeframes = [timeframe]
+
+        deleted = 0
+        lo = np.datetime64(_toUtcNaive(start), 's') if start else None
+        hi = np.datetime64(_toUtcNaive(end), 's') if end else None
+        for tf in timeframes:
+            for partition in self._listPartitions(symbol, tf):
+                path = self._path(symbol, tf, partition)
+                arrays = self._load(path, mmap_mode=None)
+                remove = np.ones(len(arrays['date']), dtype=bool)
+                if lo is not None:
+                    remove &= arrays['date'] >= lo
+                if hi is not None:
+                    remove &= arrays['date'] <= hi
+                if not remove.any():
+                    continue
+
+                deleted += int(remove.sum())
+                if remove.all():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    self._savePartition(path, {col: arrays[col][~remove] for col in COLUMNS})
+
+        if timeframe is None and start is None and end is None:
+            shutil.rmtree(self._path(symbol, ''), ignore_errors=True)
+
+        return deleted
+
+    def symbols(self) -> list[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return [unquote(name) for name in os.listdir(self.root)]
+
+    def bounds(self, symbol:str, timeframe:str) -> tuple[datetime, datetime] | None:
+        partitions = self._listPartitions(symbol, timeframe)
+        if not partitions:
+            return None
+        first = self._load(self._path(symbol, timeframe, partitions[0]))['date']
+        last = self._load(self._path(symbol, timeframe, partitions[-1]))['date']
+        return first[0].astype(datetime), last[-1].astype(datetime)
+
+    def size(self) -> int:
+        """Bytes ocupados por los ficheros del almacén"""
+        return sum(os.path.getsize(os.path.join(folder, name))
+                   for folder, _, files in os.walk(self.root) for name in files)
+
+def getCandleStore() -> CandleStore:
+    '''
+    Almacén de velas configurado en CANDLE_STORE ('database' o 'memmap').
+    Fuera de una aplicación se usa la base de datos.
+    '''
+    if not has_app_context():
+        return DatabaseCandleStore()
+
+    app = current_app
+    if 'candle_store' not in app.extensions:
+        if app.config.get('CANDLE_STORE', 'database') == 'memmap':
+            root = os.path.join(app.instance_path, app.config.get('CANDLE_STORE_PATH', 'candles'))
+            app.extensions['candle_store'] = MemmapCandleStore(root=root)
+        else:
+            app.extensions['candle_store'] = DatabaseCandleStore()
+
+    return app.extensions['candle_store']
+
+def exportDatabaseCandles(store:CandleStore, symbol:str=None, timeframe:str=None, chunk_size:int=50000) -> dict[tuple[str, str], int]:
+    '''
+    Copia las velas de la tabla candle al almacén indicado.
+
+    symbol: str
+        Only export this symbol.
+    timeframe: str
+        Only export this timeframe.
+    chunk_size: int
+        Rows read from the database on each batch.
+    '''
+    query = db.select(Candle.symbol, Candle.timeframe, *[getattr(Candle, col) for col in COLUMNS])
+    if symbol:
+        query = query.filter(Candle.symbol == symbol)
+    if timeframe:
+        query = query.filter(Candle.timeframe == timeframe)
+    query = query.order_by(Candle.symbol, Candle.timeframe, Candle.date)
+
+    exported: dict[tuple[str, str], int] = {}
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    for chunk in result.partitions():
+        rows = [dict(zip(['symbol', 'timeframe'] + COLUMNS, row)) for row in chunk]
+        store.write(rows)
+        for row in rows:
+            key = (row['symbol'], row['timeframe'])
+            exported[key] = exported.get(key, 0) + 1
+
+    return exported
@@ -41,45 +41,10 @@ def getTradesCandles():
                                         end=int(datetime.combine(today, time(23, 59, 59)).timestamp()), 
                                         timeframe='1m', df=True)
         print(yearly_candles.head(3), intraday_candles.head(3))
-        # Eliminar todas las velas existentes para ese símbolo y rango de fechas
-        session.query(Candle).filter(Candle.symbol == symbol, Candle.date >= one_year_ago, Candle.date <= today, Candle.timeframe == '1d').delete(synchronize_session=False)
-        session.query(Candle).filter(Candle.symbol == symbol, Candle.date >= datetime.combine(week_ago, time(0, 0, 0)), Candle.date <= datetime.combine(today, time(23, 59, 59)), Candle.timeframe == '1m').delete(synchronize_session=False)
-        session.commit()
-
-        candle_objs = []
+        # Ingesta por arrays: se actualizan las velas existentes sin crear objetos Candle por fila
         for tf, candles in [['1d', yearly_candles], ['1m', intraday_candles]]:
-            if hasattr(candles, 'iterrows'):
-                candle_objs += [
-                    Candle(
-                        symbol=symbol,
-                        date=row['date'].strftime('%Y-%m-%d %H:%M:%S%z') if 'date' in row else idx,
-                        open=row['open'],
-                        high=row['high'],
-                        low=row['low'],
-                        close=row['close'],
-                        volume=row.get('volume', None),
-                        session=row.get('session', 'REG'),
-                        timeframe=tf
-                    ) for idx, row in candles.iterrows()
-                ]
-            elif isinstance(candles, list):
-                candle_objs += [
-                    Candle(
-                        symbol=symbol,
-                        date=row['date'].strftime('%Y-%m-%d %H:%M:%S%z'),
-                        open=row['open'],
-                        high=row['high'],
-                        low=row['low'],
-                        close=row['close'],
-                        volume=row.get('volume', None),
-                        session=row.get('session', 'REG'),
-                        timeframe=tf
-                    ) for row in candles
-                ]
-
-        if candle_objs:
-            session.bulk_save_objects(candle_objs)
-            session.commit()
+            Candle.upsertFrame(symbol=symbol, timeframe=tf, prices=candles, session=session)
+        session.commit()
 
 def utcToLocal(date:str, time:str, tz:str='Europe/Madrid', mode:str='date'):
     
@@ -0,0 +1,105 @@
+import numpy as np
+
+def lttbIndices(y:np.ndarray, budget:int, x:np.ndarray=None) -> np.ndarray:
+    '''
+    Índices de los puntos que conserva Largest-Triangle-Three-Buckets: el
+    primero, el último y en cada bucket intermedio el que forma el triángulo
+    más grande con el punto elegido antes y la media del bucket siguiente.
+    Mantiene picos y valles visibles con muchos menos puntos.
+
+    y: np.ndarray
+        Values of the series.
+    budget: int
+        Maximum number of points (at least 3).
+    x: np.ndarray
+        Numeric x of each point. The index by default.
+    '''
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if budget is None or n <= budget or budget < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+    # Buckets de los puntos entre el primero y el último
+    edges = np.linspace(1, n - 1, budget - 1).astype(int)
+    means_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    means_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+
+    selected = np.empty(budget, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(budget - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Punto siguiente: media del próximo bucket (o el último punto)
+        next_x, next_y = (means_x[i + 1], means_y[i + 1]) if i + 1 < budget - 2 else (x[-1], y[-1])
+        area = np.abs((x[previous] - next_x) * (y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi]) * (next_y - y[previous]))
+        previous = lo + int(np.argmax(area))
+        selected[i + 1] = previous
+
+    return selected
+
+def minMaxIndices(y:np.ndarray, budget:int) -> np.ndarray:
+    '''
+    Índices del mínimo y el máximo de cada bucket (budget / 2 buckets) más el
+    primero y el último, ordenados. Adecuado para barras y series con picos
+    aislados que no deben desaparecer.
+    '''
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if budget is None or n <= budget or budget < 4:
+        return np.arange(n)
+
+    buckets = (np.arange(n) * ((budget - 2) // 2) // n)
+    # Dentro de cada bucket ordenado por valor: el primero es el mínimo y el último el máximo
+    order = np.lexsort((y, buckets))
+    starts = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    return np.unique(np.concatenate([[0, n - 1], order[starts], order[ends]]))
+
+def unionIndices(series:list[np.ndarray], budget:int, x:np.ndarray=None) -> np.ndarray:
+    '''
+    LTTB de varias series que comparten el eje x: unión de los puntos de cada
+    una con el presupuesto repartido, más el mínimo y el máximo de cada serie
+    (el pico de equity y el máximo drawdown se mantienen exactos).
+    '''
+    n = len(series[0]) if series else 0
+    if budget is None or n <= budget:
+        return np.arange(n)
+
+    share = max((budget - 2 * len(series)) // len(series), 3)
+    extremes = [[np.nanargmin(y), np.nanargmax(y)] for y in series]
+    return np.unique(np.concatenate([lttbIndices(y, share, x=x) for y in series] + extremes))
+
+def downsampleOhlc(arrays:dict[str, np.ndarray], budget:int) -> dict[str, np.ndarray]:
+    '''
+    Agrupa velas consecutivas en como mucho budget velas: apertura de la
+    primera, máximo de los máximos, mínimo de los mínimos, cierre de la última
+    y volumen sumado. Los extremos de precio se conservan exactos y un grupo
+    nunca mezcla sesiones (pre, regular, post).
+
+    arrays: dict[str, np.ndarray]
+        Columns date, open, high, low, close, volume and session sorted by date.
+    budget: int
+        Maximum number of candles.
+    '''
+    n = len(arrays['date'])
+    if budget is None or n <= budget or budget < 1:
+        return arrays
+
+    session = np.asarray(arrays['session'])
+    changes = np.flatnonzero(session[1:] != session[:-1]) + 1
+    # Cada cambio de sesión abre un grupo más: se descuentan del presupuesto
+    size = -(-n // max(budget - len(changes), 1))
+    starts = np.unique(np.concatenate([np.arange(0, n, size), changes]))
+    ends = np.r_[starts[1:], n] - 1
+
+    return {
+        'date': np.asarray(arrays['date'])[starts],
+        'open': np.asarray(arrays['open'], dtype=float)[starts],
+        'high': np.maximum.reduceat(np.asarray(arrays['high'], dtype=float), starts),
+        'low': np.minimum.reduceat(np.asarray(arrays['low'], dtype=float), starts),
+        'close': np.asarray(arrays['close'], dtype=float)[ends],
+        'volume': np.add.reduceat(np.asarray(arrays['volume'], dtype=float), starts),
+        'session': session[starts],
+    }
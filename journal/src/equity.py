@@ -0,0 +1,198 @@
+
+from datetime import datetime, timezone
+import numpy as np
+
+from .downsample import unionIndices
+
+MINUTE = np.timedelta64(1, 'm')
+
+def toDatetime64(dates:list[datetime]) -> np.ndarray:
+    """Convierte datetimes (naive en UTC o con zona) a datetime64[s] en UTC"""
+    return np.array([(d.astimezone(timezone.utc).replace(tzinfo=None) if d.tzinfo is not None else d) for d in dates], dtype='datetime64[s]')
+
+def candleArrays(candles:list) -> tuple[np.ndarray, np.ndarray]:
+    """Extrae los arrays ordenados de fechas y cierres de una lista de velas"""
+    if not candles:
+        return np.array([], dtype='datetime64[s]'), np.array([], dtype=float)
+
+    # Las velas se guardan en UTC sin zona horaria
+    dates = np.array([c.date.replace(tzinfo=None) for c in candles], dtype='datetime64[s]')
+    closes = np.array([c.close for c in candles], dtype=float)
+    order = np.argsort(dates, kind='stable')
+
+    return dates[order], closes[order]
+
+class EquityCurve:
+    """
+    Curva de equity minuto a minuto de un trade.
+
+    Las transacciones se procesan una sola vez para obtener el estado (posición,
+    caja, precio medio y comisiones) tras cada una de ellas. Cada minuto de la
+    curva se asigna a su estado y a su precio con searchsorted, por lo que el
+    coste es O(n log n) en lugar de recorrer las velas en cada minuto.
+    """
+
+    def __init__(self, trade_type:str, symbol:str, transactions:list[dict],
+                 candle_dates:np.ndarray, candle_closes:np.ndarray, initial_balance:float=0):
+        '''
+        transactions: list[dict]
+            Transactions sorted by datetime. Each one with the keys 'datetime'
+            (UTC), 'type', 'price', 'quantity' and 'commission'.
+        candle_dates: np.ndarray
+            Sorted datetime64 array with the candle dates in UTC.
+        candle_closes: np.ndarray
+            Close prices aligned with candle_dates.
+        '''
+        self.trade_type = trade_type
+        self.symbol = symbol
+        self.transactions = transactions
+        self.candle_dates = np.asarray(candle_dates, dtype='datetime64[s]')
+        self.candle_closes = np.asarray(candle_closes, dtype=float)
+        self.initial_balance = initial_balance
+
+    def _getStates(self) -> dict[str, np.ndarray]:
+        """Estado acumulado tras cada transacción (el índice 0 es el estado inicial)"""
+        cash_balance = self.initial_balance
+        position = 0
+        avg_price = 0
+        commission_total = 0
+
+        cash = [cash_balance]
+        positions = [position]
+        avg_prices = [avg_price]
+        commissions = [commission_total]
+
+        for tx in self.transactions:
+            commission = tx['commission'] or 0
+            commission_total += commission
+            cash_balance -= commission
+
+            if tx['type'] == self.trade_type:
+                # Entrada: compra para LONG, venta en corto para SHORT
+                amount = tx['price'] * tx['quantity']
+                cash_balance += -amount if self.trade_type == 'LONG' else amount
+
+                if position > 0:
+                    total = avg_price * position + amount
+                    position += tx['quantity']
+                    avg_price = total / position
+                else:
+                    position = tx['quantity']
+                    avg_price = tx['price']
+            else:
+                # Salida: venta para LONG, recompra para SHORT
+                amount = tx['price'] * tx['quantity']
+                cash_balance += amount if self.trade_type == 'LONG' else -amount
+                position -= tx['quantity']
+
+                if position <= 0:
+                    position = 0
+                    avg_price = 0
+
+            cash.append(cash_balance)
+            positions.append(position)
+            avg_prices.append(avg_price)
+            commissions.append(commission_total)
+
+        return {
+            'cash_balance': np.array(cash, dtype=float),
+            'position_size': np.array(positions, dtype=float),
+            'avg_price': np.array(avg_prices, dtype=float),
+            'commission': np.array(commissions, dtype=float),
+        }
+
+    def getPrices(self, times:np.ndarray) -> np.ndarray:
+        """Último cierre anterior o igual a cada instante (el primero si no hay anterior). NaN si no hay velas"""
+        if len(self.candle_dates) == 0:
+            return np.full(len(times), np.nan)
+
+        idx = np.searchsorted(self.candle_dates, times, side='right') - 1
+        return self.candle_closes[np.maximum(idx, 0)]
+
+    def getArrays(self) -> dict[str, np.ndarray]:
+        """Curva en formato columnar"""
+        if not self.transactions:
+            return {}
+
+        tx_times = toDatetime64([tx['datetime'] for tx in self.transactions])
+        start = tx_times[0].astype('datetime64[s]') - MINUTE
+        end = tx_times[-1].astype('datetime64[s]') + MINUTE
+        steps = int((end - start) // MINUTE) + 1
+        times = start + np.arange(steps) * MINUTE
+
+        # Estado vigente en cada minuto: transacciones con fecha <= minuto
+        states = self._getStates()
+        state_idx = np.searchsorted(tx_times, times, side='right')
+        cash = states['cash_balance'][state_idx]
+        position = states['position_size'][state_idx]
+        avg_price = states['avg_price'][state_idx]
+        commission = states['commission'][state_idx]
+
+        # Sin velas se usa el precio medio mientras haya posición
+        price = self.getPrices(times)
+        price = np.where(np.isnan(price) & (avg_price > 0), avg_price, price)
+
+        open_position = (position > 0) & ~np.isnan(price)
+        if self.trade_type == 'LONG':
+            position_value = np.where(open_position, price * position, 0.0)
+            unrealized_pnl = np.where(open_position, (price - avg_price) * position, 0.0)
+        else:
+            position_value = np.where(open_position, (2 * avg_price - price) * position, 0.0)
+            unrealized_pnl = np.where(open_position, (avg_price - price) * position, 0.0)
+
+        balance = cash + position_value
+
+        return {
+            'datetime': times,
+            'balance': balance,
+            'cash_balance': cash,
+            'position_value': position_value,
+            'realized_pnl': cash - self.initial_balance,
+            'unrealized_pnl': unrealized_pnl,
+            'total_pnl': balance - self.initial_balance,
+            'commission': commission,
+            'position_size': position,
+            'avg_price': avg_price,
+            'current_price': price,
+        }
+
+    def getPoints(self, max_points:int=None) -> list[dict]:
+        """Curva como lista de puntos, el formato que consumen las vistas"""
+        return equityPoints(self.getArrays(), symbol=self.symbol, max_points=max_points)
+
+def equityPoints(arrays:dict[str, np.ndarray], symbol:str, max_points:int=None) -> list[dict]:
+    '''
+    Convierte la curva columnar (EquityCurve.getArrays) en la lista de puntos de las vistas.
+
+    max_points: int
+        Maximum number of points, chosen with LTTB on balance and total P&L. None to keep them all.
+    '''
+    if not arrays:
+        return []
+
+    if max_points and len(arrays['datetime']) > max_points:
+        index = unionIndices([arrays['balance'], arrays['total_pnl']], max_points)
+        arrays = {k: v[index] for k, v in arrays.items()}
+
+    iso = np.datetime_as_string(arrays['datetime'], unit='s')
+    columns = {k: v.tolist() for k, v in arrays.items() if k != 'datetime'}
+    columns['current_price'] = [None if np.isnan(p) else p for p in arrays['current_price']]
+
+    return [
+        {
+            'datetime': f'{dt}+00:00',
+            'date': dt[:10],
+            'time': dt[11:],
+            'balance': columns['balance'][i],
+            'cash_balance': columns['cash_balance'][i],
+            'position_value': columns['position_value'][i],
+            'realized_pnl': columns['realized_pnl'][i],
+            'unrealized_pnl': columns['unrealized_pnl'][i],
+            'total_pnl': columns['total_pnl'][i],
+            'commission': columns['commission'][i],
+            'position_size': columns['position_size'][i],
+            'avg_price': columns['avg_price'][i],
+            'current_price': columns['current_price'][i],
+            'symbol': symbol
+        } for i, dt in enumerate(iso.tolist())
+    ]
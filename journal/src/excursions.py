@@ -0,0 +1,91 @@
+from datetime import datetime
+import numpy as np
+
+from .candle_store import CandleStore, getCandleStore
+
+def tradeWindow(trade) -> tuple[datetime, datetime] | None:
+    """Minutos de entrada y salida del trade (None si aún no está cerrado)"""
+    if not (trade.entry_date and trade.entry_time and trade.exit_date and trade.exit_time):
+        return None
+
+    start = datetime.combine(trade.entry_date, datetime.strptime(trade.entry_time, '%H:%M:%S').time())
+    end = datetime.combine(trade.exit_date, datetime.strptime(trade.exit_time, '%H:%M:%S').time())
+    return start.replace(second=0), end
+
+def rangeExtremes(high:np.ndarray, low:np.ndarray, lo:np.ndarray, hi:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    Máximo de high y mínimo de low en cada tramo [lo, hi) con un único reduceat.
+    Los tramos vacíos devuelven NaN.
+    '''
+    # reduceat sobre los índices intercalados [lo0, hi0, lo1, hi1...]: las posiciones
+    # pares reducen cada tramo. Se añade un elemento al final para que hi pueda ser len
+    high = np.append(high, np.nan)
+    low = np.append(low, np.nan)
+    idx = np.column_stack([lo, hi]).ravel()
+    empty = hi <= lo
+
+    highs = np.maximum.reduceat(high, idx)[::2]
+    lows = np.minimum.reduceat(low, idx)[::2]
+    highs[empty] = np.nan
+    lows[empty] = np.nan
+
+    return highs, lows
+
+def computeExcursions(trades:list, store:CandleStore=None, timeframe:str='1m') -> dict[int, dict[str, float]]:
+    '''
+    MFE/MAE de varios trades con una sola lectura de velas.
+
+    Las excursiones se miden desde el precio medio de entrada, en precio por
+    acción y en R (distancia al stop loss). Los trades sin velas se omiten.
+
+    trades: list[Trade]
+        Closed trades.
+    store: CandleStore
+        Candle store. The application store by default.
+    '''
+    store = store or getCandleStore()
+    windows = {trade.id: (trade.symbol, *tradeWindow(trade)) for trade in trades
+               if trade.entry_price is not None and tradeWindow(trade) is not None}
+    if not windows:
+        return {}
+
+    candles = store.getWindowArrays(timeframe=timeframe, windows=list(windows.values()))
+
+    by_symbol: dict[str, list] = {}
+    for trade in trades:
+        if trade.id in windows:
+            by_symbol.setdefault(trade.symbol, []).append(trade)
+
+    result = {}
+    for symbol, symbol_trades in by_symbol.items():
+        arrays = candles.get(symbol)
+        if arrays is None or len(arrays['date']) == 0:
+            continue
+
+        starts = np.array([windows[t.id][1] for t in symbol_trades], dtype='datetime64[s]')
+        ends = np.array([windows[t.id][2] for t in symbol_trades], dtype='datetime64[s]')
+        lo = np.searchsorted(arrays['date'], starts, side='left')
+        hi = np.searchsorted(arrays['date'], ends, side='right')
+        highs, lows = rangeExtremes(arrays['high'], arrays['low'], lo, hi)
+
+        entry = np.array([t.entry_price for t in symbol_trades], dtype=float)
+        short = np.array([t.trade_type == 'SHORT' for t in symbol_trades])
+        stop = np.array([np.nan if t.stop_loss is None else t.stop_loss for t in symbol_trades], dtype=float)
+
+        mfe = np.maximum(np.where(short, entry - lows, highs - entry), 0)
+        mae = np.maximum(np.where(short, highs - entry, entry - lows), 0)
+        risk = np.abs(entry - stop)
+        risk[risk == 0] = np.nan
+        mfe_r, mae_r = mfe / risk, mae / risk
+
+        for i, trade in enumerate(symbol_trades):
+            if np.isnan(highs[i]):
+                continue
+            result[trade.id] = {
+                'mfe': float(mfe[i]),
+                'mae': float(mae[i]),
+                'mfe_r': None if np.isnan(mfe_r[i]) else float(mfe_r[i]),
+                'mae_r': None if np.isnan(mae_r[i]) else float(mae_r[i]),
+            }
+
+    return result
@@ -13,6 +13,8 @@ from models import Trade, Candle, Transaction
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 from yahoofinance import YahooTicker
+from equity import EquityCurve, candleArrays
+from candle_batch import CandleBatchLoader, SessionCandleSource
 
 import numpy as np
 import pandas as pd
@@ -58,154 +60,28 @@ def getStartEndDatetime(trade:Trade) -> tuple[datetime, datetime, list[Transacti
 
     return start_datetime, end_datetime, sorted_transactions
 
-def equity_curve(trade:Trade, initial_balance: float = 0):
+def equity_curve(trade:Trade, initial_balance: float = 0, candles:dict=None):
     if not trade.transactions:
         return []
 
-    start_datetime, end_datetime, sorted_transactions = getStartEndDatetime(trade=trade)
-
-    # Buscar candles en el rango (date ya es datetime con UTC)
-    candles = getCandles(trade, timeframe='1m')
-
-    # Preparar DataFrame de candles
-    df_candles = pd.DataFrame([c.to_dict() for c in candles])
-    # date ya es datetime UTC, solo necesitamos asegurar que es datetime
-    df_candles['datetime'] = pd.to_datetime(df_candles['date'], utc=True)
-    df_candles.set_index('datetime', inplace=True)
-    df_candles.sort_index(inplace=True)
-
-    # Crear lista de transacciones con datetime completo
-    transactions_with_dt = []
-    for tx in sorted_transactions:
-        tx_dt = get_transaction_datetime(tx)
-        transactions_with_dt.append({
-            'datetime': tx_dt,
-            'transaction': tx
-        })
-
-    equity_points = []
-    cash_balance = initial_balance  # Dinero en efectivo disponible
-    position = 0  # Cantidad de acciones/contratos
-    avg_price = 0  # Precio promedio de entrada
-    commission_total = 0
-    tx_index = 0
-    
-    # Inicializar current_time
-    current_time = start_datetime # + timedelta(minutes=1)
-
-    while current_time <= end_datetime:
-        # Ejecutar transacciones hasta este momento
-        while tx_index < len(transactions_with_dt):
-            tx_data = transactions_with_dt[tx_index]
-            tx_time = tx_data['datetime']
-            tx: Transaction = tx_data['transaction']
-            
-            if tx_time > current_time:
-                break
-
-            commission = tx.commission or 0
-            commission_total += commission
-            cash_balance -= commission  # Las comisiones siempre reducen el cash
-
-            if tx.type == trade.trade_type:  # Transacción de entrada (compra para LONG, venta para SHORT)
-                if trade.trade_type == 'LONG':
-                    # COMPRA: gastamos dinero, aumentamos posición
-                    cost = tx.price * tx.quantity
-                    cash_balance -= cost
-                    
-                    if position > 0:
-                        # Recalcular precio promedio ponderado
-                        total_cost = avg_price * position + tx.price * tx.quantity
-                        position += tx.quantity
-                        avg_price = total_cost / position
-                    else:
-                        position = tx.quantity
-                        avg_price = tx.price
-                        
-                else:  # SHORT
-                    # VENTA EN CORTO: recibimos dinero, aumentamos posición corta
-                    proceeds = tx.price * tx.quantity
-                    cash_balance += proceeds
-                    
-                    if position > 0:
-                        # Recalcular precio promedio ponderado para posición corta
-                        total_proceeds = avg_price * position + tx.price * tx.quantity
-                        position += tx.quantity
-                        avg_price = total_proceeds / position
-                    else:
-                        position = tx.quantity
-                        avg_price = tx.price
-                        
-            else:  # Transacción de salida (venta para LONG, compra para SHORT)
-                if trade.trade_type == 'LONG':
-                    # VENTA: recibimos dinero, reducimos posición
-                    proceeds = tx.price * tx.quantity
-                    cash_balance += proceeds
-                    position -= tx.quantity
-                    
-                else:  # SHORT
-                    # COMPRA PARA CERRAR CORTO: gastamos dinero, reducimos posición corta
-                    cost = tx.price * tx.quantity
-                    cash_balance -= cost
-                    position -= tx.quantity
-                
-                if position <= 0:
-                    position = 0
-                    avg_price = 0
-
-            tx_index += 1
-
-        # Obtener precio actual de las candles
-        current_price = trade._get_price_at_time(df_candles, current_time)
-        if current_price is None and avg_price > 0:
-            current_price = avg_price
-
-        # Calcular valor de la posición actual
-        position_value = 0
-        if position > 0 and current_price is not None:
-            if trade.trade_type == 'LONG':
-                # Para LONG: valor = precio_actual * cantidad
-                position_value = current_price * position
-            else:  # SHORT
-                # Para SHORT: valor = (precio_entrada - precio_actual) * cantidad + precio_entrada * cantidad
-                # Simplificado: valor = (2 * precio_entrada - precio_actual) * cantidad
-                position_value = (2 * avg_price - current_price) * position
-
-        # El balance total es el cash más el valor de la posición
-        total_balance = cash_balance + position_value
-        
-        # PnL realizado es la diferencia entre cash actual e inicial (menos comisiones)
-        realized_pnl = cash_balance - initial_balance
-        
-        # PnL no realizado es el valor de la posición menos lo que costó/se recibió originalmente
-        unrealized_pnl = 0
-        if position > 0 and current_price is not None:
-            if trade.trade_type == 'LONG':
-                unrealized_pnl = (current_price - avg_price) * position
-            else:  # SHORT
-                unrealized_pnl = (avg_price - current_price) * position
-
-        # Guardar punto de la curva
-        equity_points.append({
-            'datetime': current_time.isoformat(),
-            'date': current_time.date().isoformat(),
-            'time': current_time.time().strftime('%H:%M:%S'),
-            'balance': total_balance,
-            'cash_balance': cash_balance,
-            'position_value': position_value,
-            'realized_pnl': realized_pnl,
-            'unrealized_pnl': unrealized_pnl,
-            'total_pnl': total_balance - initial_balance,
-            'commission': commission_total,
-            'position_size': position,
-            'avg_price': avg_price,
-            'current_price': current_price,
-            'symbol': trade.symbol
-        })
-
-        current_time += timedelta(minutes=1)
-
-    return equity_points
+    _, _, sorted_transactions = getStartEndDatetime(trade=trade)
+    # Con las velas ya cargadas por CandleBatchLoader no se consulta la base de datos
+    if candles is not None:
+        candle_dates, candle_closes = candles['date'], candles['close']
+    else:
+        candle_dates, candle_closes = candleArrays(getCandles(trade, timeframe='1m'))
+
+    transactions = [{
+        'datetime': get_transaction_datetime(tx),
+        'type': tx.type,
+        'price': tx.price,
+        'quantity': tx.quantity,
+        'commission': tx.commission,
+    } for tx in sorted_transactions]
+
+    return EquityCurve(trade_type=trade.trade_type, symbol=trade.symbol, transactions=transactions,
+                       candle_dates=candle_dates, candle_closes=candle_closes,
+                       initial_balance=initial_balance).getPoints()
 
 # TODO: Add all the candles needed for the charts of the trades already registered
 
@@ -216,9 +92,10 @@ session = SessionMaker()
 
 
 trades: List[Trade] = session.query(Trade).all()
+trade_candles = CandleBatchLoader(trades, store=SessionCandleSource(session, Candle)).load()
 
 # TRACES 
-equities = {trade.symbol + '_' + str(trade.id): {'data': pd.DataFrame(equity_curve(trade))['total_pnl'].to_list(), 'date': trade.entry_date} for trade in trades}
+equities = {trade.symbol + '_' + str(trade.id): {'data': pd.DataFrame(equity_curve(trade, candles=trade_candles[trade]))['total_pnl'].to_list(), 'date': trade.entry_date} for trade in trades}
 max_len = max(len(v['data']) for v in equities.values())
 curves = pd.DataFrame({k: v['data'] + [np.nan]*(max_len - len(v['data'])) for k, v in equities.items()})
 
@@ -269,17 +146,9 @@ fig.show()
 
 
 # Get basic metrics of traded days.
+day_candles = CandleBatchLoader(trades, store=SessionCandleSource(session, Candle), window=CandleBatchLoader.dayWindow).load()
 for trade in trades:
-
-    start_dt = datetime.combine(trade.entry_date, time(0, 0, 0, 0, tzinfo=timezone.utc))
-    end_dt = start_dt + timedelta(days=1)
-
-    trade.day_candles = session.query(Candle).filter(
-        Candle.timeframe == '1m',
-        Candle.symbol == trade.symbol,
-        Candle.date >= start_dt,
-        Candle.date < end_dt
-    ).all()
+    trade.day_candles = day_candles[trade]
 
 def time_to_minutes(t):
     return t.hour * 60 + t.minute + t.second / 60
@@ -300,13 +169,13 @@ total_days = 0
 
 for trade in trades:
 
-    df = pd.DataFrame([c.to_dict() for c in trade.day_candles])
+    df = pd.DataFrame(trade.day_candles)
     
     df = df.copy()
     df['date'] = pd.to_datetime(df['date'])
     df = df.sort_values('date')
     # Solo sesión regular
-    regular = df[df['session'] == 'REGULAR']
+    regular = df[df['session'] == 'REG']
     if regular.empty:
         continue
     total_days += 1
@@ -414,17 +283,12 @@ def analyze_trades_by_performance(trades:list[Trade], session:Session) -> dict[s
         if not trade_list:
             continue
             
-        # Obtener datos de velas para estos trades
-        for trade in trade_list:
-            if not hasattr(trade, 'day_candles'):
-                start_dt = datetime.combine(trade.entry_date, time(0, 0, 0, 0, tzinfo=timezone.utc))
-                end_dt = start_dt + timedelta(days=1)
-                trade.day_candles = session.query(Candle).filter(
-                    Candle.timeframe == '1m',
-                    Candle.symbol == trade.symbol,
-                    Candle.date >= start_dt,
-                    Candle.date < end_dt
-                ).all()
+        # Obtener datos de velas para estos trades (todos los que faltan de una vez)
+        missing = [trade for trade in trade_list if not hasattr(trade, 'day_candles')]
+        if missing:
+            day_candles = CandleBatchLoader(missing, store=SessionCandleSource(session, Candle), window=CandleBatchLoader.dayWindow).load()
+            for trade in missing:
+                trade.day_candles = day_candles[trade]
         
         stats = calculate_statistics(trade_list)
         results[category] = stats
@@ -451,7 +315,7 @@ def calculate_statistics(trades:list[Trade]) -> dict:
     max_hour_price = []  # [(hora, precio_relativo)]
     
     for trade in trades:
-        df = pd.DataFrame([c.to_dict() for c in trade.day_candles])
+        df = pd.DataFrame(trade.day_candles)
         
         if df.empty:
             continue
@@ -461,7 +325,7 @@ def calculate_statistics(trades:list[Trade]) -> dict:
         df = df.sort_values('date')
         
         # Solo sesión regular
-        regular = df[df['session'] == 'REGULAR']
+        regular = df[df['session'] == 'REG']
         if regular.empty:
             continue
             
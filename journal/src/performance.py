@@ -1,14 +1,21 @@
 
 import json
-from datetime import datetime, timedelta
-from collections import defaultdict
 import numpy as np
 from ..models.trade import Trade
+from .trade_frame import TradeFrame
+from .downsample import minMaxIndices, unionIndices
 
 class PerformanceMetrics:
 
-    def __init__(self, trades:list[Trade]):
+    def __init__(self, trades:list[Trade], frame:TradeFrame=None):
+        '''
+        trades: list[Trade]
+            Trades sorted by entry date.
+        frame: TradeFrame
+            Columns of the trades, built from trades if not given.
+        '''
         self.trades = trades
+        self.frame = frame or TradeFrame(trades or [])
 
     def _normal_cdf(self, x):
         """Aproximación de la función de distribución acumulativa normal estándar"""
@@ -97,199 +104,176 @@ class PerformanceMetrics:
             print('Error trying to calculate p-value: ', e)
             return 1.0
 
-    def calculateMaxDrawDown(self, pnl_values:list[float]):
-        """Calcular máximo drawdown"""
-        if not pnl_values:
-            return 0
-        
-        cumulative_pnl = 0
-        peak = 0
-        max_dd = 0
-        
-        for pnl in pnl_values:
-            cumulative_pnl += pnl
-            if cumulative_pnl > peak:
-                peak = cumulative_pnl
-            drawdown = peak - cumulative_pnl
-            if drawdown > max_dd:
-                max_dd = drawdown
-        
-        return max_dd
+    def calculateMaxDrawDown(self, pnl:np.ndarray) -> np.ndarray:
+        """Calcular máximo drawdown de cada fila (modo) de pnl"""
+        pnl = np.atleast_2d(pnl)
+        if pnl.shape[1] == 0:
+            return np.zeros(len(pnl))
+
+        # El pico parte de 0, como la curva de equity
+        cumulative_pnl = np.cumsum(pnl, axis=1)
+        peak = np.maximum.accumulate(np.maximum(cumulative_pnl, 0), axis=1)
+        return np.maximum((peak - cumulative_pnl).max(axis=1), 0)
     
-    def calculateAdvancedStats(self, pnl_values:list[float]):
-        """Calcular estadísticas avanzadas (Gold)"""
-        if not pnl_values or len(pnl_values) < 2:
-            return {'sqn': 0, 'k_ratio': 0, 'kelly_percent': 0, 'p_value': 1.0}
+    def calculateAdvancedStats(self, pnl:np.ndarray) -> list[dict]:
+        """Calcular estadísticas avanzadas (Gold) de cada fila (modo) de pnl"""
+        pnl = np.atleast_2d(pnl)
+        n = pnl.shape[1]
+        if n < 2:
+            return [{'sqn': 0, 'k_ratio': 0, 'kelly_percent': 0, 'p_value': 1.0} for _ in pnl]
         
         # SQN (System Quality Number)
-        avg_pnl = np.mean(pnl_values)
-        std_pnl = np.std(pnl_values)
-        sqn = (avg_pnl / std_pnl) * np.sqrt(len(pnl_values)) if std_pnl != 0 else 0
-        
-        # K-Ratio (simplificado)
-        cumulative_pnl = np.cumsum(pnl_values)
-        if len(cumulative_pnl) > 1:
-            slope = np.polyfit(range(len(cumulative_pnl)), cumulative_pnl, 1)[0]
-            residuals = cumulative_pnl - np.polyval([slope, 0], range(len(cumulative_pnl)))
-            std_residuals = np.std(residuals)
-            k_ratio = slope / std_residuals if std_residuals != 0 else 0
-        else:
-            k_ratio = 0
-        
-        # Kelly % (simplificado)
-        win_rate = len([p for p in pnl_values if p > 0]) / len(pnl_values)
-        if win_rate > 0 and win_rate < 1:
-            avg_win = np.mean([p for p in pnl_values if p > 0])
-            avg_loss = abs(np.mean([p for p in pnl_values if p < 0])) if any(p < 0 for p in pnl_values) else 1
-            kelly_percent = (win_rate * avg_win - (1 - win_rate) * avg_loss) / avg_win * 100
-        else:
-            kelly_percent = 0
+        avg_pnl = pnl.mean(axis=1)
+        std_pnl = pnl.std(axis=1)
+        sqn = np.divide(avg_pnl, std_pnl, out=np.zeros(len(pnl)), where=std_pnl != 0) * np.sqrt(n)
         
-        # P-value (t-test simple)
-        p_value = self.calculatePvalue(pnl_values=pnl_values, method='custom')
+        # K-Ratio (simplificado): polyfit ajusta todas las filas a la vez
+        x = np.arange(n)
+        cumulative_pnl = np.cumsum(pnl, axis=1)
+        slope = np.polyfit(x, cumulative_pnl.T, 1)[0]
+        std_residuals = (cumulative_pnl - slope[:, None] * x).std(axis=1)
+        k_ratio = np.divide(slope, std_residuals, out=np.zeros(len(pnl)), where=std_residuals != 0)
         
-        return {
-            'sqn': sqn,
-            'k_ratio': k_ratio,
-            'kelly_percent': kelly_percent,
-            'p_value': p_value
-        }
-
-    def calculateStreaks(self, pnl_values:list[float]):
-        """Calcular rachas consecutivas máximas"""
-        if not pnl_values:
-            return {'max_wins': 0, 'max_losses': 0}
-        
-        max_wins = 0
-        max_losses = 0
-        current_wins = 0
-        current_losses = 0
-        
-        for pnl in pnl_values:
-            if pnl > 0:
-                current_wins += 1
-                current_losses = 0
-                max_wins = max(max_wins, current_wins)
-            elif pnl < 0:
-                current_losses += 1
-                current_wins = 0
-                max_losses = max(max_losses, current_losses)
-            else:  # scratch
-                current_wins = 0
-                current_losses = 0
-        
-        return {'max_wins': max_wins, 'max_losses': max_losses}
-
-    def calculateDailyStats(self, mode:str='net'):
-        """Calcular estadísticas diarias"""
+        # Kelly % (simplificado)
+        wins = pnl > 0
+        losses = pnl < 0
+        win_rate = wins.sum(axis=1) / n
+        avg_win = np.divide((pnl * wins).sum(axis=1), wins.sum(axis=1), out=np.zeros(len(pnl)), where=wins.any(axis=1))
+        avg_loss = np.where(losses.any(axis=1), np.abs(np.divide((pnl * losses).sum(axis=1), losses.sum(axis=1),
+                                                                 out=np.ones(len(pnl)), where=losses.any(axis=1))), 1)
+        valid = (win_rate > 0) & (win_rate < 1)
+        kelly_percent = np.divide(win_rate * avg_win - (1 - win_rate) * avg_loss, avg_win,
+                                  out=np.zeros(len(pnl)), where=valid) * 100
+        
+        return [{
+            'sqn': float(sqn[i]),
+            'k_ratio': float(k_ratio[i]),
+            'kelly_percent': float(kelly_percent[i]),
+            # P-value (t-test simple)
+            'p_value': self.calculatePvalue(pnl_values=pnl[i], method='custom')
+        } for i in range(len(pnl))]
+
+    def calculateStreaks(self, pnl:np.ndarray) -> list[dict]:
+        """Calcular rachas consecutivas máximas de cada fila (modo) de pnl"""
+        result = []
+        for row in np.atleast_2d(pnl):
+            signs, lengths = TradeFrame.runs(np.sign(row))
+            result.append({
+                'max_wins': int(lengths[signs > 0].max(initial=0)),
+                'max_losses': int(lengths[signs < 0].max(initial=0)),
+            })
+        return result
+
+    def calculateDailyStats(self, pnl:np.ndarray) -> dict:
+        """Calcular estadísticas diarias de cada fila (modo) de pnl"""
         
         # Determinar rango de fechas
-        start_date = min((trade.entry_date for trade in self.trades if trade.entry_date), default=None)
-        end_date = max((trade.entry_date for trade in self.trades if trade.entry_date), default=None)
-
-        if start_date and end_date:
-            trading_days = (end_date - start_date).days + 1
-        else:
-            first_trade = min(self.trades, key=lambda t: t.entry_date)
-            last_trade = max(self.trades, key=lambda t: t.entry_date)
-            trading_days = (last_trade.entry_date - first_trade.entry_date).days + 1
-        
-        if trading_days == 0:
-            trading_days = 1
-        
-        total_pnl = sum((trade.profit_loss + trade.commission if mode == 'gross' else trade.profit_loss) for trade in self.trades)
-        total_volume = sum(getattr(trade, 'exit_quantity', 0) for trade in self.trades)
+        days = self.frame.entry_day[~np.isnat(self.frame.entry_day)]
+        trading_days = int((days.max() - days.min()).astype(int)) + 1 if len(days) else 1
         
         return {
-            'avg_daily_pnl': total_pnl / trading_days,
-            'avg_daily_volume': total_volume / trading_days
+            'avg_daily_pnl': np.atleast_2d(pnl).sum(axis=1) / trading_days,
+            'avg_daily_volume': self.frame.quantity.sum() / trading_days
         }
 
-    def getStats(self, mode='net', scratch_percentage:float=0.01):
-
-        pnl_values = [((trade.profit_loss + trade.commission) if mode == 'gross' else trade.profit_loss) for trade in self.trades]
+    def _getStats(self, pnl:np.ndarray, scratch_percentage:float=0.01) -> list[dict]:
+        """Estadísticas de cada fila (modo) de pnl calculadas a la vez"""
+        pnl = np.atleast_2d(pnl)
+        rows, total_trades = pnl.shape
+        zeros = np.zeros(rows)
 
-        total_pnl = sum(pnl_values)
-        total_quantity = sum([trade.exit_quantity for trade in self.trades if hasattr(trade, 'exit_quantity')])
-        total_trades = len(pnl_values)
+        total_pnl = pnl.sum(axis=1)
+        total_quantity = self.frame.quantity.sum()
         
-        winning_pnl = [p for p in pnl_values if p > 0]
-        losing_pnl = [p for p in pnl_values if p < 0]
+        wins = pnl > 0
+        losses = pnl < 0
+        win_counts = wins.sum(axis=1)
+        loss_counts = losses.sum(axis=1)
+        winning_pnl = (pnl * wins).sum(axis=1)
+        losing_pnl = (pnl * losses).sum(axis=1)
         
-        avg_trade_pnl = np.mean(pnl_values) if pnl_values else 0
-        avg_pnl_per_share = total_pnl / total_quantity if total_quantity != 0 else 0
-        median_trade_pnl = np.median(pnl_values) if pnl_values else 0
-        avg_win = np.mean(winning_pnl) if winning_pnl else 0
-        avg_loss = np.mean(losing_pnl) if losing_pnl else 0
+        avg_trade_pnl = pnl.mean(axis=1) if total_trades else zeros
+        median_trade_pnl = np.median(pnl, axis=1) if total_trades else zeros
+        avg_win = np.divide(winning_pnl, win_counts, out=zeros.copy(), where=win_counts > 0)
+        avg_loss = np.divide(losing_pnl, loss_counts, out=zeros.copy(), where=loss_counts > 0)
 
-        scratch_threshold = abs(avg_trade_pnl) * scratch_percentage
-        winning_trades = len([p for p in pnl_values if p > scratch_threshold])
-        losing_trades = len([p for p in pnl_values if p < -scratch_threshold])
-        scratch_trades = len([p for p in pnl_values if -scratch_threshold < p and p < scratch_threshold])
+        scratch_threshold = (np.abs(avg_trade_pnl) * scratch_percentage)[:, None]
+        winning_trades = (pnl > scratch_threshold).sum(axis=1)
+        losing_trades = (pnl < -scratch_threshold).sum(axis=1)
+        scratch_trades = ((-scratch_threshold < pnl) & (pnl < scratch_threshold)).sum(axis=1)
         
-        largest_gain = max(pnl_values) if pnl_values else 0
-        largest_loss = min(pnl_values) if pnl_values else 0
-        
-        # Risk/Reward y Profit Factor
-        risk_reward = avg_win / abs(avg_loss) if avg_loss != 0 else 0
-        
-        total_wins = sum(winning_pnl) if winning_pnl else 0
-        total_losses = abs(sum(losing_pnl)) if losing_pnl else 0
-        profit_factor = total_wins / total_losses if total_losses > 0 else 1e99 if total_wins > 0 else 0
+        largest_gain = pnl.max(axis=1) if total_trades else zeros
+        largest_loss = pnl.min(axis=1) if total_trades else zeros
         
         # Desviación estándar
-        trade_pnl_std = np.std(pnl_values) if len(pnl_values) > 1 else 0
-        
-        # Sharpe Ratio
-        sharpe_ratio = (avg_trade_pnl / trade_pnl_std) if trade_pnl_std != 0 else 0
+        trade_pnl_std = pnl.std(axis=1) if total_trades > 1 else zeros
         
         # Maximum Drawdown
-        max_drawdown = self.calculateMaxDrawDown(pnl_values=pnl_values)
+        max_drawdown = self.calculateMaxDrawDown(pnl)
         
-        advanced_stats = self.calculateAdvancedStats(pnl_values=pnl_values)
+        advanced_stats = self.calculateAdvancedStats(pnl)
 
         # ===== RACHAS CONSECUTIVAS =====
-        consecutive_stats = self.calculateStreaks(pnl_values=pnl_values)
+        consecutive_stats = self.calculateStreaks(pnl)
         
         # ===== ESTADÍSTICAS TEMPORALES =====
-        daily_stats = self.calculateDailyStats(mode=mode)
-        
-        return {
-            'total_pnl': total_pnl,
-            'winning_trades': winning_trades,
-            'losing_trades': losing_trades,
-            'scratch_trades': scratch_trades,
-            'win_rate': (winning_trades / total_trades * 100) if total_trades > 0 else 0,
-            'loss_rate': (losing_trades / total_trades * 100) if total_trades > 0 else 0,
-            'winning_pnl': sum(winning_pnl),
-            'losing_pnl': sum(losing_pnl),
-            'avg_trade_pnl': avg_trade_pnl,
-            'avg_pnl_per_share': round(avg_pnl_per_share, 4),
-            'median_trade_pnl': median_trade_pnl,
-            'avg_win': avg_win,
-            'avg_loss': avg_loss,
-            'largest_gain': largest_gain,
-            'largest_loss': largest_loss,
-            'risk_reward': risk_reward,
-            'total_wins': total_wins,
-            'total_losses': total_losses,
-            'profit_factor': profit_factor,
-            'trade_pnl_std': trade_pnl_std,
-            'sharpe_ratio': sharpe_ratio,
-            'max_drawdown': max_drawdown,
-
-            'sqn': round(advanced_stats['sqn'], 2),
-            'k_ratio': round(advanced_stats['k_ratio'], 2),
-            'kelly_percent': round(advanced_stats['kelly_percent'], 2),
-            'p_value': round(advanced_stats['p_value'], 4),
-            
-            # Rachas
-            'max_consecutive_wins': consecutive_stats['max_wins'],
-            'max_consecutive_losses': consecutive_stats['max_losses'],
+        daily_stats = self.calculateDailyStats(pnl)
+
+        result = []
+        for i in range(rows):
+            # Risk/Reward y Profit Factor
+            risk_reward = float(avg_win[i] / abs(avg_loss[i])) if avg_loss[i] != 0 else 0
+            total_wins = float(winning_pnl[i])
+            total_losses = abs(float(losing_pnl[i]))
+            profit_factor = total_wins / total_losses if total_losses > 0 else 1e99 if total_wins > 0 else 0
+            # Sharpe Ratio
+            sharpe_ratio = float(avg_trade_pnl[i] / trade_pnl_std[i]) if trade_pnl_std[i] != 0 else 0
+
+            result.append({
+                'total_pnl': float(total_pnl[i]),
+                'winning_trades': int(winning_trades[i]),
+                'losing_trades': int(losing_trades[i]),
+                'scratch_trades': int(scratch_trades[i]),
+                'win_rate': (int(winning_trades[i]) / total_trades * 100) if total_trades > 0 else 0,
+                'loss_rate': (int(losing_trades[i]) / total_trades * 100) if total_trades > 0 else 0,
+                'winning_pnl': float(winning_pnl[i]),
+                'losing_pnl': float(losing_pnl[i]),
+                'avg_trade_pnl': float(avg_trade_pnl[i]),
+                'avg_pnl_per_share': round(float(total_pnl[i]) / total_quantity, 4) if total_quantity != 0 else 0,
+                'median_trade_pnl': float(median_trade_pnl[i]),
+                'avg_win': float(avg_win[i]),
+                'avg_loss': float(avg_loss[i]),
+                'largest_gain': float(largest_gain[i]),
+                'largest_loss': float(largest_loss[i]),
+                'risk_reward': risk_reward,
+                'total_wins': total_wins,
+                'total_losses': total_losses,
+                'profit_factor': profit_factor,
+                'trade_pnl_std': float(trade_pnl_std[i]),
+                'sharpe_ratio': sharpe_ratio,
+                'max_drawdown': float(max_drawdown[i]),
+
+                'sqn': round(advanced_stats[i]['sqn'], 2),
+                'k_ratio': round(advanced_stats[i]['k_ratio'], 2),
+                'kelly_percent': round(advanced_stats[i]['kelly_percent'], 2),
+                'p_value': round(advanced_stats[i]['p_value'], 4),
+                
+                # Rachas
+                'max_consecutive_wins': consecutive_stats[i]['max_wins'],
+                'max_consecutive_losses': consecutive_stats[i]['max_losses'],
 
-            'avg_daily_pnl': round(daily_stats['avg_daily_pnl'], 2),
-            'avg_daily_volume': round(daily_stats['avg_daily_volume'], 2),
-        }
+                'avg_daily_pnl': round(float(daily_stats['avg_daily_pnl'][i]), 2),
+                'avg_daily_volume': round(float(daily_stats['avg_daily_volume']), 2),
+            })
+
+        return result
+
+    def getStats(self, mode='net', scratch_percentage:float=0.01):
+        return self._getStats(self.frame.pnl[self.frame.modeIndex(mode)], scratch_percentage=scratch_percentage)[0]
+
+    def getStatsByMode(self, scratch_percentage:float=0.01) -> dict[str, dict]:
+        """Estadísticas net y gross en la misma pasada"""
+        return dict(zip(TradeFrame.MODES, self._getStats(self.frame.pnl, scratch_percentage=scratch_percentage)))
 
     def _formatHoldTime(self, minutes):
         if minutes < 60:
@@ -316,52 +300,32 @@ class PerformanceMetrics:
             
     def calculateHoldTimes(self):
         """Calcular tiempos de mantenimiento promedio"""
-        def get_hold_time(trade:Trade):
-            if hasattr(trade, 'exit_date') and trade.exit_date and trade.entry_date:
-                if hasattr(trade, 'entry_time') and hasattr(trade, 'exit_time'):
-                    entry_datetime = datetime.combine(trade.entry_date, datetime.strptime(trade.entry_time, '%H:%M:%S').time() or datetime.min.time())
-                    exit_datetime = datetime.combine(trade.exit_date, datetime.strptime(trade.exit_time, '%H:%M:%S').time() or datetime.min.time())
-                    return (exit_datetime - entry_datetime).total_seconds() / 60
-                else:
-                    return (trade.exit_date - trade.entry_date).days * 24 * 60
-            return 0
-        
-        hold_times_all = []
-        hold_times_winners = []
-        hold_times_losers = []
-        hold_times_scratches = []
-        
-        for trade in self.trades:
-            hold_time = get_hold_time(trade)
-            hold_times_all.append(hold_time)
-            
-            if trade.profit_loss > 0:
-                hold_times_winners.append(hold_time)
-            elif trade.profit_loss < 0:
-                hold_times_losers.append(hold_time)
-            else:
-                hold_times_scratches.append(hold_time)
-        
-        return {
-            'overall': self._formatHoldTime(np.mean(hold_times_all)) if hold_times_all else "0h",
-            'winners': self._formatHoldTime(np.mean(hold_times_winners)) if hold_times_winners else "0h",
-            'losers': self._formatHoldTime(np.mean(hold_times_losers)) if hold_times_losers else "0h",
-            'scratches': self._formatHoldTime(np.mean(hold_times_scratches)) if hold_times_scratches else "0h",
+        # Se clasifican por el P&L neto
+        hold_times = self.frame.hold_minutes
+        groups = {
+            'overall': np.ones(self.frame.size, dtype=bool),
+            'winners': self.frame.net > 0,
+            'losers': self.frame.net < 0,
+            'scratches': self.frame.net == 0,
         }
+        
+        return {key: self._formatHoldTime(hold_times[mask].mean()) if mask.any() else "0h" for key, mask in groups.items()}
 
     def calculateMaximumExecutions(self):
         """Calcular Maximum Favorable/Adverse Excursion"""
-        mfe_values = []
-        mae_values = []
-        
-        for trade in self.trades:
-            mae, mfe = trade.maximumFavorableAverse()
-            mfe_values.append(mfe)
-            mae_values.append(mae)
-        
+        # Los valores los calculan y guardan el trabajo de velas y `flask rollups rebuild`: aquí solo
+        # se promedian los que hay (None si ningún trade los tiene todavía)
+        trades = self.trades
+        mfe_values = [trade.mfe for trade in trades if trade.mfe is not None]
+        mae_values = [trade.mae for trade in trades if trade.mae is not None]
+        mfe_r_values = [trade.mfe_r for trade in trades if trade.mfe_r is not None]
+        mae_r_values = [trade.mae_r for trade in trades if trade.mae_r is not None]
+
         return {
-            'avg_mfe': np.mean(mfe_values) if mfe_values else 0,
-            'avg_mae': np.mean(mae_values) if mae_values else 0
+            'avg_mfe': float(np.mean(mfe_values)) if mfe_values else None,
+            'avg_mae': float(np.mean(mae_values)) if mae_values else None,
+            'avg_mfe_r': float(np.mean(mfe_r_values)) if mfe_r_values else None,
+            'avg_mae_r': float(np.mean(mae_r_values)) if mae_r_values else None,
         }
 
     def getEmpty(self):
@@ -374,7 +338,8 @@ class PerformanceMetrics:
             'trade_pnl_std': 0, 'profit_factor': 0, 'risk_reward': 0, 'sharpe_ratio': 0,
             'max_drawdown': 0, 'avg_hold_time_overall': "0h", 'avg_hold_time_winners': "0h",
             'avg_hold_time_losers': "0h", 'avg_hold_time_scratches': "0h", 'avg_mfe': 0,
-            'avg_mae': 0, 'total_commissions': 0, 'total_fees': 0, 'sqn': 0, 'k_ratio': 0,
+            'avg_mae': 0, 'avg_mfe_r': 0, 'avg_mae_r': 0,
+            'total_commissions': 0, 'total_fees': 0, 'sqn': 0, 'k_ratio': 0,
             'kelly_percent': 0, 'p_value': 1.0, 'balances': []
         }
     
@@ -383,18 +348,10 @@ class PerformanceMetrics:
         if self.trades is None or len(self.trades) == 0:
             return self.getEmpty()
 
-        total_trades = len(self.trades)
-        
-        # Extraer datos básicos
-        volumes = [getattr(trade, 'exit_quantity', 0) for trade in self.trades if hasattr(trade, 'exit_quantity')]
-        commissions = [getattr(trade, 'commission', 0) for trade in self.trades if hasattr(trade, 'commission')]
-        fees = [getattr(trade, 'fees', 0) for trade in self.trades if hasattr(trade, 'fees')]
-        total_commissions = sum(commissions)
-        total_fees = sum(fees)
+        total_trades = self.frame.size
         
         # ===== ESTADÍSTICAS BÁSICAS =====
-        stats = self.getStats(mode='net')
-        stats_gross = self.getStats( mode='gross')
+        stats = self.getStatsByMode()
         
         # ===== TIEMPO DE MANTENIMIENTO =====
         hold_times = self.calculateHoldTimes()
@@ -404,11 +361,11 @@ class PerformanceMetrics:
         
         # ===== COMPILAR RESULTADO =====
         return {
-            'net': stats,
-            'gross': stats_gross,
+            'net': stats['net'],
+            'gross': stats['gross'],
             'total_trades': total_trades,
-            'total_commissions': round(total_commissions, 2),
-            'total_fees': round(total_fees, 2),
+            'total_commissions': round(float(self.frame.commission.sum()), 2),
+            'total_fees': round(float(self.frame.fees.sum()), 2),
             
             # Tiempo de mantenimiento
             'avg_hold_time_overall': hold_times['overall'],
@@ -417,8 +374,10 @@ class PerformanceMetrics:
             'avg_hold_time_scratches': hold_times['scratches'],
             
             # MFE/MAE
-            'avg_mfe': round(mfe_mae_stats['avg_mfe'], 2),
-            'avg_mae': round(mfe_mae_stats['avg_mae'], 2),
+            'avg_mfe': None if mfe_mae_stats['avg_mfe'] is None else round(mfe_mae_stats['avg_mfe'], 2),
+            'avg_mae': None if mfe_mae_stats['avg_mae'] is None else round(mfe_mae_stats['avg_mae'], 2),
+            'avg_mfe_r': None if mfe_mae_stats['avg_mfe_r'] is None else round(mfe_mae_stats['avg_mfe_r'], 2),
+            'avg_mae_r': None if mfe_mae_stats['avg_mae_r'] is None else round(mfe_mae_stats['avg_mae_r'], 2),
         }
     
 
@@ -427,38 +386,46 @@ class PerformanceCharts:
     """
     Clase para generar gráficos estilo TraderVue a partir de trades
     """
+    # Agrupaciones de getStatsByTime y getStatsBySymbol (se suman todas juntas)
+    GROUP_KEYS: tuple[str] = ('minute', '15min', 'hourly', 'daily', 'weekday', 'monthly', 'yearly', 'symbol')
     
-    def __init__(self, trades:list[Trade], mode:str='net'):
+    def __init__(self, trades:list[Trade], mode:str='net', frame:TradeFrame=None, max_points:int=None):
+        '''
+        trades: list[Trade]
+            Trades sorted by entry date.
+        mode: str
+            Can be 'net' or 'gross'.
+        frame: TradeFrame
+            Columns of the trades. Sharing it between the net and gross charts reuses the groupings.
+        max_points: int
+            Maximum points of the long series (equity, drawdown, daily P&L and rolling stats). None to send them all.
+        '''
         self.trades = trades
         self.mode = mode
-        self.pnl_values = [(trade.profit_loss + trade.commission if self.mode == 'gross' else trade.profit_loss) for trade in trades]
+        self.max_points = max_points
+        self.frame = frame or TradeFrame(trades)
+        self.pnl_values = self.frame.pnl[self.frame.modeIndex(mode)]
         self.cumulative_pnl = np.cumsum(self.pnl_values)
+        self._group_sums: dict = None
+
+    def _colors(self, pnl:np.ndarray) -> list[str]:
+        return np.where(pnl > 0, 'green', np.where(pnl < 0, 'red', 'gray')).tolist()
     
     def getEquityCurve(self):
         """Gráfico de curva de equity (P&L acumulativo)"""
         if not self.trades:
             return {'dates': [], 'equity': [], 'drawdown': []}
         
-        dates = []
-        equity = [0]  # Empezar en 0
-        peak = 0
-        drawdowns = [0]
-        
-        for i, trade in enumerate(self.trades):
-            dates.append(trade.entry_date.strftime('%Y-%m-%d'))
-            current_equity = equity[-1] + (trade.profit_loss + trade.commission if self.mode == 'gross' else trade.profit_loss) # self.cumulative_pnl[i]
-            equity.append(current_equity)
-            
-            # Calcular drawdown
-            if current_equity > peak:
-                peak = current_equity
-            drawdown = peak - current_equity
-            drawdowns.append(-drawdown)  # Negativo para mostrar hacia abajo
+        # Drawdown negativo para mostrar hacia abajo, con el pico partiendo de 0
+        peak = np.maximum.accumulate(np.maximum(self.cumulative_pnl, 0))
+        drawdown = self.cumulative_pnl - peak
+        # Puntos que conservan la forma de las dos curvas (LTTB con la mitad del presupuesto cada una)
+        index = unionIndices([self.cumulative_pnl, drawdown], self.max_points)
         
         return {
-            'dates': dates,
-            'equity': equity[1:],  # Quitar el 0 inicial
-            'drawdown': drawdowns[1:],
+            'dates': np.datetime_as_string(self.frame.entry_day[index], unit='D').tolist(),
+            'equity': self.cumulative_pnl[index].tolist(),
+            'drawdown': drawdown[index].tolist(),
             'chart_type': 'line'
         }
     
@@ -469,38 +436,29 @@ class PerformanceCharts:
         mode: str
             Can be 'daily' or 'monthly'
         """
-        if mode == 'monthly':
-            x_axis = 'months'
-            time_format = '%Y-%m'
-        else:
-            x_axis = 'dates'
-            time_format = '%Y-%m-%d'
+        x_axis = 'months' if mode == 'monthly' else 'dates'
             
         if not self.trades:
             return {x_axis: [], 'pnl': []}
         
-        time_pnl = defaultdict(float)
-        
-        for trade in self.trades:
-            time_key = trade.entry_date.strftime(time_format)
-            time_pnl[time_key] += (trade.profit_loss + trade.commission if self.mode == 'gross' else trade.profit_loss)
-        
-        sorted_dates = sorted(time_pnl.keys())
+        sums, labels = self.frame.groupSums('month' if mode == 'monthly' else 'date', self.pnl_values)
+        # Barras: el mínimo y el máximo de cada tramo para que no desaparezcan los días extremos
+        index = minMaxIndices(sums[0], self.max_points)
         
         return {
-            x_axis: sorted_dates,
-            'pnl': [time_pnl[date] for date in sorted_dates],
+            x_axis: [labels[i] for i in index],
+            'pnl': sums[0][index].tolist(),
             'chart_type': 'bar'
         }
     
     def getPnlDistribution(self):
         """Histograma de distribución de P&L por trade"""
-        if not self.pnl_values:
+        if not len(self.pnl_values):
             return {'bins': [], 'counts': []}
         
         # Crear bins automáticamente
-        min_pnl = min(self.pnl_values)
-        max_pnl = max(self.pnl_values)
+        min_pnl = float(self.pnl_values.min())
+        max_pnl = float(self.pnl_values.max())
         
         if min_pnl == max_pnl:
             return {'bins': [min_pnl], 'counts': [len(self.pnl_values)]}
@@ -508,198 +466,120 @@ class PerformanceCharts:
         # Crear 20 bins
         n_bins = min(20, len(self.pnl_values))
         bin_edges = np.linspace(min_pnl, max_pnl, n_bins + 1)
-        bin_centers = [(bin_edges[i] + bin_edges[i+1]) / 2 for i in range(len(bin_edges)-1)]
+        bin_centers = (bin_edges[:-1] + bin_edges[1:]) / 2
         
         counts, _ = np.histogram(self.pnl_values, bins=bin_edges)
         
         return {
-            'bins': [round(center, 2) for center in bin_centers],
+            'bins': np.round(bin_centers, 2).tolist(),
             'counts': counts.tolist(),
             'chart_type': 'histogram'
         }
-    
-    def _getStatRequirements(self, prev:dict, trade:Trade):
-
-        prev['pnl'].append(trade.profit_loss + trade.commission if self.mode == 'gross' else trade.profit_loss)
-        prev['total'] += 1
-        if prev['pnl'][-1] > 0:
-            prev['win'] += prev['pnl'][-1]
-            prev['wins'] += 1
-        elif prev['pnl'][-1] < 0:
-            prev['loss'] += prev['pnl'][-1]
-
-        return prev
-
-    def _calculateStats(self, data:dict):
 
-        total_pnl = np.sum(data['pnl'])
-        avg_pnl = np.mean(data['pnl'])
-        avg_win = data['win'] / data['wins'] if data['wins'] > 0 else 0
-        avg_loss = data['loss'] / (data['total']-data['wins']) if (data['total']-data['wins']) > 0 else 0
-        win_rates = data['wins'] / data['total'] * 100 if data['total'] > 0 else 0
-        expectancy = (data['win'] * data['wins'] - abs(data['loss']) * (data['total'] - data['wins'])) / data['total'] if data['total'] > 0 else 0
-        trade_counts = data['total']
-
-        return total_pnl, avg_pnl, avg_win, avg_loss, win_rates, expectancy, trade_counts
+    def _groupSums(self) -> dict[str, tuple[np.ndarray, list]]:
+        """Sumas de todas las agrupaciones (GROUP_KEYS) en una sola pasada, calculadas la primera vez que se piden"""
+        if self._group_sums is None:
+            wins = self.pnl_values > 0
+            losses = self.pnl_values < 0
+            self._group_sums = self.frame.groupSumsMany(PerformanceCharts.GROUP_KEYS, np.vstack([
+                self.pnl_values, np.ones(len(self.pnl_values)), wins, self.pnl_values * wins, self.pnl_values * losses
+            ]))
+        return self._group_sums
+
+    def _groupStats(self, key:str) -> tuple[list, list[np.ndarray]]:
+        """Estadísticas por grupo: total, media, media ganadora/perdedora, win rate, expectancy y número de trades"""
+        sums, labels = self._groupSums()[key]
+        total_pnl, total, win_count, win, loss = sums
+        # Los trades que no ganan (incluidos los scratch) cuentan como no ganadores
+        others = total - win_count
+
+        def divide(a, b):
+            return np.divide(a, b, out=np.zeros(len(labels)), where=b > 0)
+
+        return labels, [
+            total_pnl,
+            divide(total_pnl, total),
+            divide(win, win_count),
+            divide(loss, others),
+            divide(win_count, total) * 100,
+            divide(win * win_count - np.abs(loss) * others, total),
+            total.astype(int),
+        ]
+
+    def _statsResult(self, x_axis:str, labels:list, columns:list[np.ndarray]) -> dict:
+        total_pnl, avg_pnl, avg_win, avg_loss, win_rates, expectancy, trade_counts = [c.tolist() for c in columns]
+        return {
+            x_axis: labels,
+            'total_pnl': total_pnl,
+            'avg_pnl': avg_pnl,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'win_rate': win_rates,
+            'expectancy': expectancy,
+            'trade_count': trade_counts,
+            'chart_type': 'multi_bar'
+        }
 
     def getStatsByTime(self, mode:str='daily'):
         """
         P&L por día de la semana
         
         mode: str
-            Can be 'daily', 'hourly', 'monthly' or 'yearly'
+            Can be 'daily', 'minute', '15min', 'hourly', 'weekday', 'monthly' or 'yearly'.
+            'minute' only returns the minutes of the day with trades.
         """
-
-        if mode == 'monthly':
-            x_axis = 'months'
-            time_format = lambda x: str(x.month)
-            time_list = list(range(12))
-        elif mode == 'yearly':
-            x_axis = 'years'
-            time_format = lambda x: str(x.year)
-            time_list = None
-        elif mode == 'hourly':
-            x_axis = 'hours'
-            time_format = lambda x: f"{datetime.strptime(x, '%H:%M:%S').hour:02d}:00"
-            time_list = [f"{h:02d}:00" for h in range(24)]
-        elif mode == 'weekday':
-            x_axis = 'days'
-            days_map = {0: 'Mon', 1: 'Tue', 2: 'Wed', 3: 'Thu', 4: 'Fri', 5: 'Sat', 6: 'Sun'}
-            time_format = lambda x: days_map[x.weekday()]
-            time_list = [days_map[d] for d in range(7)]
-        else:
-            x_axis = 'days'
-            time_format = lambda x: x.strftime('%Y-%m-%d')
-            time_list = None
+        x_axis = {'monthly': 'months', 'yearly': 'years', 'hourly': 'hours', 'minute': 'minutes', '15min': 'minutes'}.get(mode, 'days')
 
         if not self.trades:
             return {x_axis: [], 'total_pnl': [], 'avg_pnl': [], 'avg_win': [], 'avg_loss': [], 'win_rate': [], 'expectancy': [], 'trade_count': []}
         
-        stats = defaultdict(lambda: {'pnl': [], 'wins': 0, 'win': 0, 'loss': 0, 'total': 0})
-        
-        for trade in self.trades:
-            time_val = time_format(trade.entry_time if mode == 'hourly' else trade.entry_date)
-            stats[time_val] = self._getStatRequirements(stats[time_val], trade)
-        
-        times_list = list(stats.keys()) if time_list is None else time_list
+        labels, columns = self._groupStats(mode if mode in ('minute', '15min', 'hourly', 'weekday', 'monthly', 'yearly') else 'daily')
+        if mode == 'minute':
+            used = np.flatnonzero(columns[-1] > 0)
+            labels, columns = [labels[i] for i in used], [c[used] for c in columns]
         
-        (total_pnl, avg_pnl, avg_win, avg_loss, win_rates, expectancy, trade_counts) = zip(*[(self._calculateStats(stats[time_val]) if time_val in stats else (0, 0, 0, 0, 0, 0, 0)) for time_val in times_list])
-        
-        return {
-            x_axis: times_list,
-            'total_pnl': list(total_pnl),
-            'avg_pnl': list(avg_pnl),
-            'avg_win': list(avg_win),
-            'avg_loss': list(avg_loss),
-            'win_rate': list(win_rates),
-            'expectancy': list(expectancy),
-            'trade_count': list(trade_counts),
-            'chart_type': 'multi_bar'
-        }
+        return self._statsResult(x_axis, labels, columns)
     
     def getStatsBySymbol(self):
         """P&L por símbolo (top N)"""
         if not self.trades:
             return {'symbols': [], 'total_pnl': [], 'avg_pnl': [], 'avg_win': [], 'avg_loss': [], 'win_rate': [], 'expectancy': [], 'trade_count': []}
         
-        stats = defaultdict(lambda: {'pnl': [], 'wins': 0, 'win': 0, 'loss': 0, 'total': 0})
-        
-        for trade in self.trades:
-            stats[trade.symbol] = self._getStatRequirements(stats[trade.symbol], trade)
+        labels, columns = self._groupStats('symbol')
         
-        sorted_data = sorted(
-            [(symbol,) + self._calculateStats(stat) for symbol, stat in stats.items()],
-            key=lambda x: x[1],  # x[1] es total_pnl
-            reverse=True  # De mayor a menor
-        )
-
-        # Desempaquetar de vuelta a listas separadas
-        symbols, total_pnl, avg_pnl, avg_win, avg_loss, win_rates, expectancy, trade_counts = zip(*sorted_data)
+        # De mayor a menor total_pnl (estable: los empates mantienen el orden de aparición)
+        order = np.argsort(-columns[0], kind='stable')
         
-        return {
-            'symbols': list(symbols),
-            'total_pnl': list(total_pnl),
-            'avg_pnl': list(avg_pnl),
-            'avg_win': list(avg_win),
-            'avg_loss': list(avg_loss),
-            'win_rate': list(win_rates),
-            'expectancy': list(expectancy),
-            'trade_count': list(trade_counts),
-            'chart_type': 'multi_bar'
-        }
+        return self._statsResult('symbols', [labels[i] for i in order], [c[order] for c in columns])
     
     def getHoldTimeAnalysis(self):
         """Análisis de tiempo de mantenimiento vs P&L"""
         if not self.trades:
             return {'hold_times': [], 'pnl': [], 'colors': []}
         
-        def getHoldTimeMinutes(trade: Trade):
-            if hasattr(trade, 'exit_date') and trade.exit_date and trade.entry_date:
-                if hasattr(trade, 'entry_time') and hasattr(trade, 'exit_time') and trade.entry_time and trade.exit_time:
-                    entry_datetime = datetime.combine(trade.entry_date, datetime.strptime(trade.entry_time, '%H:%M:%S').time())
-                    exit_datetime = datetime.combine(trade.exit_date, datetime.strptime(trade.exit_time, '%H:%M:%S').time())
-                    return (exit_datetime - entry_datetime).total_seconds() / 60
-                else:
-                    return (trade.exit_date - trade.entry_date).days * 1440
-            return 0
-        
-        hold_times = []
-        pnl_values = []
-        colors = []
-        
-        for trade in self.trades:
-            hold_time = getHoldTimeMinutes(trade)
-            if hold_time > 0:  # Solo incluir trades con tiempo válido
-                hold_times.append(hold_time)
-                pnl_values.append(trade.profit_loss + trade.commission if self.mode == 'gross' else trade.profit_loss)
-                colors.append('green' if pnl_values[-1] > 0 else 'red' if pnl_values[-1] < 0 else 'gray')
+        # Solo incluir trades con tiempo válido
+        mask = self.frame.hold_minutes > 0
+        pnl_values = self.pnl_values[mask]
         
         return {
-            'hold_times': hold_times,
-            'pnl': pnl_values,
-            'colors': colors,
+            'hold_times': self.frame.hold_minutes[mask].tolist(),
+            'pnl': pnl_values.tolist(),
+            'colors': self._colors(pnl_values),
             'chart_type': 'scatter'
         }
     
     def getStreaks(self):
         """Gráfico de rachas consecutivas"""
-        if not self.pnl_values:
+        if not len(self.pnl_values):
             return {'streaks': [], 'types': []}
         
-        streaks = []
-        current_streak = 0
-        current_type = None
-        
-        for pnl in self.pnl_values:
-            if pnl > 0:  # Win
-                if current_type == 'win':
-                    current_streak += 1
-                else:
-                    if current_streak > 0:
-                        streaks.append({'length': current_streak, 'type': current_type})
-                    current_streak = 1
-                    current_type = 'win'
-            elif pnl < 0:  # Loss
-                if current_type == 'loss':
-                    current_streak += 1
-                else:
-                    if current_streak > 0:
-                        streaks.append({'length': current_streak, 'type': current_type})
-                    current_streak = 1
-                    current_type = 'loss'
-            else:  # Scratch - reset streak
-                if current_streak > 0:
-                    streaks.append({'length': current_streak, 'type': current_type})
-                current_streak = 0
-                current_type = None
-        
-        # Añadir última racha si existe
-        if current_streak > 0:
-            streaks.append({'length': current_streak, 'type': current_type})
+        # Los scratch cortan la racha y no cuentan como una
+        signs, lengths = TradeFrame.runs(np.sign(self.pnl_values))
+        streaks = signs != 0
         
         return {
-            'streaks': [s['length'] for s in streaks],
-            'types': [s['type'] for s in streaks],
+            'streaks': lengths[streaks].tolist(),
+            'types': np.where(signs[streaks] > 0, 'win', 'loss').tolist(),
             'chart_type': 'streak_bar'
         }
     
@@ -708,23 +588,78 @@ class PerformanceCharts:
         if not self.trades:
             return {'sizes': [], 'pnl': [], 'colors': []}
         
-        sizes = []
-        pnl_values = []
-        colors = []
-        
-        for trade in self.trades:
-            if hasattr(trade, 'exit_quantity') and trade.exit_quantity:
-                sizes.append(trade.exit_quantity)
-                pnl_values.append(trade.profit_loss + trade.commission if self.mode == 'gross' else trade.profit_loss)
-                colors.append('green' if pnl_values[-1] > 0 else 'red' if pnl_values[-1] < 0 else 'gray')
+        mask = self.frame.quantity != 0
+        pnl_values = self.pnl_values[mask]
         
         return {
-            'sizes': sizes,
-            'pnl': pnl_values,
-            'colors': colors,
+            'sizes': self.frame.quantity[mask].tolist(),
+            'pnl': pnl_values.tolist(),
+            'colors': self._colors(pnl_values),
             'chart_type': 'scatter'
         }
     
+    def getRollingStats(self, window:int=20, by:str='trades'):
+        '''
+        Win rate, expectancy, profit factor, Sharpe y SQN de las últimas window
+        operaciones (o días) en cada punto, en O(n) con sumas acumuladas: la
+        ventana [lo, hi) de cada punto se resume restando dos prefijos.
+
+        window: int
+            Number of trades (by='trades') or calendar days (by='days').
+        by: str
+            Can be 'trades' (one point per trade) or 'days' (one point per day with trades).
+        '''
+        if not len(self.pnl_values):
+            return {'dates': [], 'win_rate': [], 'expectancy': [], 'profit_factor': [], 'sharpe_ratio': [], 'sqn': [], 'trades': []}
+
+        pnl = self.pnl_values
+        wins = pnl > 0
+        losses = pnl < 0
+        # La varianza no cambia al desplazar los valores: centrarlos evita perder precisión con la suma de cuadrados
+        centered = pnl - pnl.mean()
+        prefix = lambda values: np.concatenate([[0], np.cumsum(values)])
+        sums, squares, win_counts = prefix(pnl), prefix(centered ** 2), prefix(wins)
+        win_sums, loss_sums, centered_sums = prefix(pnl * wins), prefix(pnl * losses), prefix(centered)
+
+        days = self.frame.entry_day.astype('int64')
+        if by == 'days':
+            # Un punto por día (el último trade del día) con los trades de los últimos window días, incluido ese
+            hi = np.flatnonzero(np.r_[days[1:] != days[:-1], True]) + 1
+            lo = np.searchsorted(days, days[hi - 1] - window + 1, side='left')
+        else:
+            hi = np.arange(1, len(pnl) + 1)
+            lo = np.maximum(hi - window, 0)
+        window_sum = lambda prefixes: prefixes[hi] - prefixes[lo]
+
+        count = hi - lo
+        total = window_sum(sums)
+        mean = total / count
+        centered_mean = window_sum(centered_sums) / count
+        std = np.sqrt(np.maximum(window_sum(squares) / count - centered_mean ** 2, 0))
+        gains, pains = window_sum(win_sums), np.abs(window_sum(loss_sums))
+
+        sharpe = np.divide(mean, std, out=np.zeros(len(hi)), where=(std > 1e-12) & (count > 1))
+        # Profit factor infinito (sin pérdidas en la ventana) como None para el JSON
+        profit_factor = np.divide(gains, pains, out=np.full(len(hi), np.nan), where=pains > 0)
+        profit_factor[(pains == 0) & (gains == 0)] = 0
+        win_rate = window_sum(win_counts) / count * 100
+
+        index = unionIndices([win_rate, mean, sharpe], self.max_points)
+        sharpe, count = sharpe[index], count[index]
+
+        return {
+            'dates': np.datetime_as_string(self.frame.entry_day[hi[index] - 1], unit='D').tolist(),
+            'win_rate': win_rate[index].tolist(),
+            'expectancy': mean[index].tolist(),
+            'profit_factor': [None if np.isnan(v) else v for v in profit_factor[index].tolist()],
+            'sharpe_ratio': sharpe.tolist(),
+            'sqn': (sharpe * np.sqrt(count)).tolist(),
+            'trades': count.tolist(),
+            'window': window,
+            'by': by,
+            'chart_type': 'line'
+        }
+
     def getAll(self):
         """Obtener todos los gráficos de una vez"""
         return {
@@ -732,6 +667,8 @@ class PerformanceCharts:
             'daily_pnl': self.getPnlTimeHistogram(mode='daily'),
             'monthly_pnl': self.getPnlTimeHistogram(mode='monthly'),
             'pnl_distribution': self.getPnlDistribution(),
+            'minute_analysis': self.getStatsByTime(mode='minute'),
+            'quarter_hour_analysis': self.getStatsByTime(mode='15min'),
             'hour_analysis': self.getStatsByTime(mode='hourly'),
             'day_analysis': self.getStatsByTime(mode='daily'),
             'weekday_analysis': self.getStatsByTime(mode='weekday'),
@@ -740,7 +677,9 @@ class PerformanceCharts:
             'symbol_performance': self.getStatsBySymbol(),
             'hold_time_analysis': self.getHoldTimeAnalysis(),
             # 'streaks': self.getStreaks(),
-            'size_analysis': self.getSizeAnalysis()
+            'size_analysis': self.getSizeAnalysis(),
+            'rolling_trades': self.getRollingStats(window=20, by='trades'),
+            'rolling_days': self.getRollingStats(window=30, by='days')
         }
     
     def to_json(self):
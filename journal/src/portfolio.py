@@ -0,0 +1,172 @@
+import heapq
+from datetime import datetime, timezone
+import numpy as np
+
+from ..models import Transaction
+from .candle_store import CandleStore, getCandleStore
+from .downsample import unionIndices
+
+MINUTE = np.timedelta64(1, 'm')
+
+class PortfolioEquity:
+    '''
+    Equity de la cuenta minuto a minuto con todos los trades abiertos a la vez.
+
+    Las transacciones de cada trade (ya ordenadas) se unen en una sola línea
+    temporal con heapq.merge. Después, para cada símbolo, la posición y el
+    precio de cada minuto se obtienen con searchsorted, así que el coste crece
+    con símbolos x minutos y no con trades x minutos.
+
+    Con max_points la rejilla tiene como mucho GRID_FACTOR veces ese número de
+    puntos (en rangos largos el paso pasa a ser de varios minutos) y to_dict
+    reduce las series con LTTB conservando los extremos.
+    '''
+    GRID_FACTOR: int = 10
+
+    def __init__(self, trades:list, start:datetime, end:datetime, store:CandleStore=None, initial_balance:float=0,
+                 max_points:int=None):
+        '''
+        trades: list[Trade]
+            Trades with transactions inside or before [start, end).
+        start, end: datetime
+            UTC range of the timeline.
+        store: CandleStore
+            Candle store. The application store by default.
+        initial_balance: float
+            Account balance before the first transaction.
+        max_points: int
+            Maximum number of points of the series. None for one point per minute.
+        '''
+        self.trades: list = trades
+        self.start: datetime = start
+        self.end: datetime = end
+        self.store: CandleStore = store or getCandleStore()
+        self.initial_balance: float = initial_balance
+        self.max_points: int = max_points
+
+    def _getStreams(self) -> list[list[tuple]]:
+        """Transacciones de cada trade ordenadas: (fecha, symbol, cantidad con signo, precio, comisión)"""
+        # Todas las transacciones en una sola consulta
+        transactions = {}
+        ids = [trade.id for trade in self.trades]
+        for tx in Transaction.query.filter(Transaction.trade_id.in_(ids)).all() if ids else []:
+            transactions.setdefault(tx.trade_id, []).append(tx)
+
+        streams = []
+        for trade in self.trades:
+            stream = []
+            for tx in transactions.get(trade.id, []):
+                when = trade.get_transaction_datetime(tx).replace(tzinfo=None)
+                # Compras (LONG) suman a la posición y ventas (SHORT) restan, sea el trade largo o corto
+                quantity = tx.quantity if tx.type == 'LONG' else -tx.quantity
+                stream.append((np.datetime64(when, 's'), trade.symbol, quantity, tx.price, tx.commission or 0))
+            if stream:
+                streams.append(sorted(stream, key=lambda e: e[0]))
+        return streams
+
+    def getArrays(self) -> dict[str, np.ndarray]:
+        """Línea temporal columnar: datetime, equity, cash, exposure, net_exposure, drawdown y positions"""
+        events = list(heapq.merge(*self._getStreams(), key=lambda e: e[0]))
+        if not events:
+            return {}
+
+        times = np.array([e[0] for e in events], dtype='datetime64[s]')
+        symbols = np.array([e[1] for e in events])
+        quantity = np.array([e[2] for e in events], dtype=float)
+        price = np.array([e[3] for e in events], dtype=float)
+        commission = np.array([e[4] for e in events], dtype=float)
+
+        # Si queda algo abierto al final la línea temporal llega hasta end (o ahora)
+        range_start = np.datetime64(self.start, 's')
+        range_end = np.datetime64(min(self.end, datetime.now(timezone.utc).replace(tzinfo=None)), 's')
+        open_at_end = any(abs(quantity[symbols == s].sum()) > 1e-9 for s in np.unique(symbols))
+        first = max(range_start, times[0] - MINUTE)
+        last = range_end if open_at_end else min(range_end, times[-1] + MINUTE)
+        first = first.astype('datetime64[m]').astype('datetime64[s]')
+        if last < first:
+            return {}
+        # Paso de la rejilla: un minuto salvo que el rango supere GRID_FACTOR veces el presupuesto
+        step = MINUTE
+        minutes = int((last - first) // MINUTE) + 1
+        if self.max_points and minutes > self.max_points * self.GRID_FACTOR:
+            step = MINUTE * int(np.ceil(minutes / (self.max_points * self.GRID_FACTOR)))
+        grid = first + np.arange(int((last - first) // step) + 1) * step
+        if step > MINUTE and grid[-1] < last:
+            grid = np.append(grid, last)
+
+        # Caja: suma acumulada de todos los movimientos hasta cada minuto
+        cash_flow = np.concatenate([[0.0], np.cumsum(-quantity * price - commission)])
+        cash = self.initial_balance + cash_flow[np.searchsorted(times, grid, side='right')]
+
+        market_value = np.zeros(len(grid))
+        exposure = np.zeros(len(grid))
+        positions = np.zeros(len(grid), dtype=int)
+
+        unique = np.unique(symbols).tolist()
+        candles = self.store.getWindowArrays(timeframe='1m', windows=[(s, first.astype(datetime), last.astype(datetime)) for s in unique])
+        for symbol in unique:
+            mask = symbols == symbol
+            sym_times = times[mask]
+            position = np.concatenate([[0.0], np.cumsum(quantity[mask])])[np.searchsorted(sym_times, grid, side='right')]
+            position[np.abs(position) < 1e-9] = 0
+
+            # Último cierre conocido (como EquityCurve); sin velas, el precio de la última transacción
+            last_tx = np.searchsorted(sym_times, grid, side='right') - 1
+            mark = np.where(last_tx >= 0, price[mask][np.maximum(last_tx, 0)], np.nan)
+            arrays = candles.get(symbol)
+            if arrays is not None and len(arrays['date']) > 0:
+                idx = np.searchsorted(arrays['date'], grid, side='right') - 1
+                close = np.where(idx >= 0, arrays['close'][np.maximum(idx, 0)], np.nan)
+                mark = np.where(np.isnan(close), mark, close)
+
+            value = np.where(position != 0, position * np.nan_to_num(mark), 0.0)
+            market_value += value
+            exposure += np.abs(value)
+            positions += position != 0
+
+        equity = cash + market_value
+        drawdown = equity - np.maximum.accumulate(equity)
+
+        return {
+            'datetime': grid,
+            'equity': equity,
+            'cash': cash,
+            'exposure': exposure,
+            'net_exposure': market_value,
+            'drawdown': drawdown,
+            'positions': positions,
+        }
+
+    def getSummary(self, arrays:dict[str, np.ndarray]=None) -> dict:
+        arrays = self.getArrays() if arrays is None else arrays
+        if not arrays:
+            return {'final_equity': self.initial_balance, 'max_drawdown': 0, 'max_exposure': 0, 'max_positions': 0}
+
+        return {
+            'final_equity': float(arrays['equity'][-1]),
+            'max_drawdown': float(arrays['drawdown'].min()),
+            'max_drawdown_at': np.datetime_as_string(arrays['datetime'][arrays['drawdown'].argmin()], unit='s') + '+00:00',
+            'max_exposure': float(arrays['exposure'].max()),
+            'max_positions': int(arrays['positions'].max()),
+        }
+
+    def to_dict(self, decimals:int=2) -> dict:
+        """Series en formato columnar (listas paralelas) y resumen"""
+        arrays = self.getArrays()
+        if not arrays:
+            return {'datetime': [], 'summary': self.getSummary(arrays)}
+
+        # El resumen con todos los puntos; las series reducidas al presupuesto
+        summary = self.getSummary(arrays)
+        if self.max_points and len(arrays['datetime']) > self.max_points:
+            keep = unionIndices([arrays['equity'], arrays['drawdown'], arrays['exposure']], self.max_points,
+                                x=arrays['datetime'].astype(np.int64))
+            arrays = {col: values[keep] for col, values in arrays.items()}
+
+        result = {'datetime': [f'{dt}+00:00' for dt in np.datetime_as_string(arrays['datetime'], unit='s').tolist()]}
+        for col in ['equity', 'cash', 'exposure', 'net_exposure', 'drawdown']:
+            result[col] = np.round(arrays[col], decimals).tolist()
+        result['positions'] = arrays['positions'].tolist()
+        result['summary'] = summary
+
+        return result
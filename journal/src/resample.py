@@ -0,0 +1,107 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import numpy as np
+
+from ..models.candle_coverage import timeframeDelta
+
+# Las semanas empiezan en lunes (1970-01-05), igual que en Yahoo
+WEEK_ORIGIN = np.datetime64('1970-01-05T00:00:00', 's')
+
+def isIntraday(timeframe:str) -> bool:
+    return timeframeDelta(timeframe) < timedelta(days=1)
+
+def bucketStart(dates:np.ndarray, timeframe:str) -> np.ndarray:
+    """Inicio de la vela de timeframe a la que pertenece cada fecha"""
+    dates = np.asarray(dates, dtype='datetime64[s]')
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', timeframe)
+    if match and match.group(2) == 'mo':
+        months = dates.astype('datetime64[M]').astype(np.int64)
+        step = int(match.group(1))
+        return ((months // step) * step).astype('datetime64[M]').astype('datetime64[s]')
+
+    delta = np.timedelta64(int(timeframeDelta(timeframe).total_seconds()), 's')
+    origin = WEEK_ORIGIN if match and match.group(2) == 'wk' else np.datetime64(0, 's')
+    return origin + ((dates - origin) // delta) * delta
+
+def resampleArrays(arrays:dict[str, np.ndarray], timeframe:str, sessions:list[str]=None) -> dict[str, np.ndarray]:
+    '''
+    Agrega velas ordenadas por fecha a un timeframe mayor.
+
+    En los timeframes intradía una vela nunca mezcla sesiones: si la sesión
+    cambia dentro del intervalo (p. ej. PRE -> REG a las 13:30 UTC) se abre una
+    vela nueva con la fecha del primer minuto de la sesión. Para 1d y mayores
+    se agregan solo las sesiones indicadas (por defecto REG, como las velas
+    diarias de Yahoo).
+
+    arrays: dict[str, np.ndarray]
+        Columns date, open, high, low, close, volume and session.
+    timeframe: str
+        Target timeframe (5m, 15m, 1h, 1d, 1wk...).
+    sessions: list[str]
+        Sessions to keep. None keeps all of them for intraday timeframes.
+    '''
+    intraday = isIntraday(timeframe)
+    if sessions is None and not intraday:
+        sessions = ['REG']
+
+    dates = np.asarray(arrays['date'], dtype='datetime64[s]')
+    session = np.asarray(arrays['session'])
+    if sessions is not None:
+        mask = np.isin(session, sessions)
+        arrays = {col: np.asarray(values)[mask] for col, values in arrays.items()}
+        dates, session = dates[mask], session[mask]
+
+    if len(dates) == 0:
+        return {col: np.asarray(values)[:0] for col, values in arrays.items()}
+
+    buckets = bucketStart(dates, timeframe)
+    breaks = np.empty(len(dates), dtype=bool)
+    breaks[0] = True
+    breaks[1:] = buckets[1:] != buckets[:-1]
+    if intraday:
+        breaks[1:] |= session[1:] != session[:-1]
+
+    starts = np.flatnonzero(breaks)
+    ends = np.append(starts[1:], len(dates)) - 1
+
+    return {
+        'date': np.maximum(buckets[starts], dates[starts]) if intraday else buckets[starts],
+        'open': np.asarray(arrays['open'])[starts],
+        'high': np.maximum.reduceat(np.asarray(arrays['high']), starts),
+        'low': np.minimum.reduceat(np.asarray(arrays['low']), starts),
+        'close': np.asarray(arrays['close'])[ends],
+        'volume': np.add.reduceat(np.asarray(arrays['volume']), starts),
+        'session': session[starts],
+    }
+
+class LRUCache:
+    '''
+    Caché LRU segura entre hilos.
+    '''
+
+    def __init__(self, maxsize:int=128):
+        self.maxsize: int = maxsize
+        self.items: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.items:
+                return None
+            self.items.move_to_end(key)
+            return self.items[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """Elimina las entradas cuya clave cumple predicate (todas si no se indica)"""
+        with self.lock:
+            for key in [k for k in self.items if predicate is None or predicate(k)]:
+                del self.items[key]
@@ -0,0 +1,119 @@
+import os
+import json
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import current_app, has_app_context
+
+class ResultCache:
+    '''
+    Caché LRU de resultados ya calculados (estadísticas y gráficos de performance).
+
+    Las claves incluyen la versión de datos del usuario (User.data_version), que
+    sube con cada escritura de sus trades: al cambiar los datos las entradas
+    viejas dejan de pedirse y acaban saliendo por LRU, sin invalidaciones.
+
+    Con path, cada entrada también se guarda como un pickle en disco para que
+    sobreviva a los reinicios. El disco se limita al mismo número de entradas,
+    borrando las de uso más antiguo (mtime).
+    '''
+
+    def __init__(self, max_entries:int=64, path:str=None):
+        '''
+        max_entries: int
+            Maximum number of entries in memory (and on disk).
+        path: str
+            Directory of the disk backend. None to keep the cache only in memory.
+        '''
+        self.max_entries: int = max_entries
+        self.path: str = path
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def makeKey(namespace:str, user_id:int, version:int, params:dict) -> str:
+        '''
+        Clave estable a partir de los parámetros normalizados: se ignoran los
+        vacíos y el orden, así que ?start=x&symbol= y ?start=x dan la misma clave.
+        '''
+        normalized = {k: v for k, v in params.items() if v not in (None, '', 'None')}
+        content = json.dumps([namespace, user_id, version, normalized], sort_keys=True, default=str)
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def _file(self, key:str) -> str:
+        return os.path.join(self.path, f'{key}.pkl')
+
+    def get(self, key:str):
+        """Valor guardado o None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        if not self.path:
+            return None
+        try:
+            with open(self._file(key), 'rb') as f:
+                value = pickle.load(f)
+            os.utime(self._file(key))
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        self._remember(key, value)
+        return value
+
+    def _remember(self, key:str, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set(self, key:str, value) -> None:
+        self._remember(key, value)
+        if not self.path:
+            return
+
+        # Escritura atómica: nunca queda un pickle a medias si se corta el proceso
+        tmp = f'{self._file(key)}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file(key))
+        self._pruneDisk()
+
+    def _pruneDisk(self) -> None:
+        files = [entry for entry in os.scandir(self.path) if entry.name.endswith('.pkl')]
+        if len(files) <= self.max_entries:
+            return
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime)[:len(files) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            for entry in os.scandir(self.path):
+                if entry.name.endswith('.pkl'):
+                    os.remove(entry.path)
+
+def getResultCache() -> ResultCache:
+    '''
+    Caché de la aplicación con PERFORMANCE_CACHE_SIZE entradas y, si se define
+    PERFORMANCE_CACHE_PATH (relativo a instance), copia en disco.
+    '''
+    if not has_app_context():
+        return ResultCache()
+
+    app = current_app
+    if 'result_cache' not in app.extensions:
+        path = app.config.get('PERFORMANCE_CACHE_PATH')
+        app.extensions['result_cache'] = ResultCache(max_entries=app.config.get('PERFORMANCE_CACHE_SIZE', 64),
+                                                     path=os.path.join(app.instance_path, path) if path else None)
+
+    return app.extensions['result_cache']
@@ -0,0 +1,175 @@
+import os
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from flask import current_app
+
+from ..models import db, Trade, WatchlistEntry, CandleCoverage
+from .candle_store import CandleStore, DatabaseCandleStore, MemmapCandleStore, getCandleStore
+from .resample import resampleArrays
+
+class CandleRetention:
+    '''
+    Política de retención de velas.
+
+    - Las velas de 1m se conservan keep_days días alrededor de la ventana de
+      entrada/salida de cada trade y durante los últimos keep_days días.
+    - El resto de velas de 1m se compactan a compact_timeframe y se borran.
+    - Los símbolos sin trades ni entradas de watchlist se eliminan.
+
+    El trabajo se hace símbolo a símbolo y por lotes de días completos con un
+    commit en cada lote, así que si se interrumpe puede relanzarse sin más: lo
+    ya compactado no vuelve a procesarse.
+    '''
+
+    def __init__(self, store:CandleStore, keep_days:int=5, compact_timeframe:str='1h',
+                 drop_orphans:bool=True, batch_days:int=7, source:str='1m'):
+        self.store: CandleStore = store
+        self.keep_days: int = keep_days
+        self.compact_timeframe: str = compact_timeframe
+        self.drop_orphans: bool = drop_orphans
+        self.batch_days: int = batch_days
+        self.source: str = source
+
+    def getKeepRanges(self, symbol:str) -> list[tuple[datetime, datetime]]:
+        """Rangos (días completos) en los que se conservan las velas de 1m, fusionados y ordenados"""
+        margin = timedelta(days=self.keep_days)
+        ranges = [(date.today() - margin, date.max - timedelta(days=1))]
+        for entry_date, exit_date in db.session.execute(
+            db.select(Trade.entry_date, Trade.exit_date).filter(Trade.symbol == symbol, Trade.entry_date.isnot(None))
+        ).all():
+            ranges.append((entry_date - margin, (exit_date or date.today()) + margin))
+
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+
+        return [(datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)) for start, end in merged]
+
+    def getCompactRanges(self, symbol:str) -> list[tuple[datetime, datetime]]:
+        """Rangos [start, end) de días completos con velas de 1m que pueden compactarse"""
+        bounds = self.store.bounds(symbol=symbol, timeframe=self.source)
+        if bounds is None:
+            return []
+
+        cursor = datetime.combine(bounds[0].date(), time.min)
+        last = datetime.combine(bounds[1].date() + timedelta(days=1), time.min)
+        ranges = []
+        for keep_start, keep_end in self.getKeepRanges(symbol):
+            if keep_start > cursor:
+                ranges.append((cursor, min(keep_start, last)))
+            cursor = max(cursor, keep_end)
+            if cursor >= last:
+                break
+
+        if cursor < last:
+            ranges.append((cursor, last))
+
+        return [(start, end) for start, end in ranges if start < end]
+
+    def compactSymbol(self, symbol:str) -> dict[str, int]:
+        """Compacta las velas de 1m del símbolo fuera de los rangos a conservar"""
+        result = {'removed': 0, 'written': 0}
+        for start, end in self.getCompactRanges(symbol):
+            batch_start = start
+            while batch_start < end:
+                batch_end = min(batch_start + timedelta(days=self.batch_days), end)
+                # Los rangos son [start, end): el último segundo incluido es end - 1s
+                last = batch_end - timedelta(seconds=1)
+
+                arrays = self.store.getArrays(symbol=symbol, timeframe=self.source, start=batch_start, end=last)
+                if len(arrays['date']) > 0:
+                    compacted = resampleArrays(arrays, timeframe=self.compact_timeframe)
+                    # Se copian antes de borrar: en el almacén memmap los arrays apuntan a los ficheros
+                    compacted = {col: np.array(values) for col, values in compacted.items()}
+                    result['written'] += self.store.writeArrays(symbol=symbol, timeframe=self.compact_timeframe, arrays=compacted)
+                    result['removed'] += self.store.delete(symbol=symbol, timeframe=self.source, start=batch_start, end=last)
+
+                    CandleCoverage.add(symbol=symbol, timeframe=self.compact_timeframe, start=batch_start, end=last)
+
+                CandleCoverage.remove(symbol=symbol, timeframe=self.source, start=batch_start, end=batch_end)
+                db.session.commit()
+                batch_start = batch_end
+
+        return result
+
+    def getOrphanSymbols(self) -> list[str]:
+        """Símbolos con velas guardadas que no aparecen en ningún trade ni watchlist"""
+        used = {symbol for symbol, in db.session.execute(db.select(Trade.symbol).distinct()).all()}
+        used |= {symbol for symbol, in db.session.execute(db.select(WatchlistEntry.symbol).distinct()).all()}
+        return sorted(set(self.store.symbols()) - used)
+
+    def dropSymbol(self, symbol:str) -> int:
+        removed = self.store.delete(symbol=symbol)
+        CandleCoverage.query.filter(CandleCoverage.symbol == symbol).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
+
+    def getSize(self) -> int:
+        """Bytes ocupados por las velas: páginas en uso de SQLite o ficheros del almacén memmap"""
+        if isinstance(self.store, MemmapCandleStore):
+            return self.store.size()
+
+        if db.engine.dialect.name != 'sqlite':
+            return 0
+        page_size = db.session.execute(db.text('PRAGMA page_size')).scalar()
+        page_count = db.session.execute(db.text('PRAGMA page_count')).scalar()
+        freelist = db.session.execute(db.text('PRAGMA freelist_count')).scalar()
+        return (page_count - freelist) * page_size
+
+    def getFileSize(self) -> int:
+        if db.engine.dialect.name != 'sqlite' or not db.engine.url.database:
+            return 0
+        return os.path.getsize(db.engine.url.database) if os.path.exists(db.engine.url.database) else 0
+
+    def vacuum(self, pages:int=None):
+        '''
+        Devuelve al sistema las páginas libres de SQLite.
+
+        La primera vez la base de datos se pasa a auto_vacuum=INCREMENTAL (requiere un
+        VACUUM completo); a partir de ahí basta con PRAGMA incremental_vacuum.
+        '''
+        if not isinstance(self.store, DatabaseCandleStore) or db.engine.dialect.name != 'sqlite':
+            return
+
+        db.session.commit()
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            if connection.exec_driver_sql('PRAGMA auto_vacuum').scalar() != 2:
+                connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+                connection.exec_driver_sql('VACUUM')
+            else:
+                connection.exec_driver_sql(f'PRAGMA incremental_vacuum({int(pages)})' if pages else 'PRAGMA incremental_vacuum')
+
+    def run(self, vacuum:bool=True) -> dict:
+        """Aplica la política completa e informa de lo compactado y de los bytes recuperados"""
+        size_before, file_before = self.getSize(), self.getFileSize()
+        report = {'symbols': 0, 'removed': 0, 'written': 0, 'orphans': [], 'orphan_removed': 0}
+
+        if self.drop_orphans:
+            for symbol in self.getOrphanSymbols():
+                report['orphan_removed'] += self.dropSymbol(symbol)
+                report['orphans'].append(symbol)
+
+        for symbol in sorted(self.store.symbols()):
+            result = self.compactSymbol(symbol)
+            report['symbols'] += 1
+            report['removed'] += result['removed']
+            report['written'] += result['written']
+
+        if vacuum:
+            self.vacuum()
+
+        report['bytes_before'], report['bytes_after'] = size_before, self.getSize()
+        report['file_bytes_before'], report['file_bytes_after'] = file_before, self.getFileSize()
+        report['bytes_reclaimed'] = max(file_before - report['file_bytes_after'], size_before - report['bytes_after'])
+
+        return report
+
+def getCandleRetention() -> CandleRetention:
+    """Política de retención con la configuración de la aplicación"""
+    return CandleRetention(store=getCandleStore(),
+                           keep_days=current_app.config.get('CANDLE_RETENTION_DAYS', 5),
+                           compact_timeframe=current_app.config.get('CANDLE_COMPACT_TIMEFRAME', '1h'),
+                           drop_orphans=current_app.config.get('CANDLE_DROP_ORPHANS', True))
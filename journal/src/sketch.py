@@ -0,0 +1,113 @@
+import json
+import math
+import numpy as np
+
+# Sin imports relativos: se usa desde los modelos y puede importarse suelto
+
+class QuantileSketch:
+    '''
+    Sketch de cuantiles con error relativo acotado (estilo DDSketch).
+
+    Cada valor cae en el bucket ceil(log_gamma(|x|)), con los positivos y los
+    negativos por separado y los ceros aparte. Los buckets son contadores, así
+    que dos sketches se combinan sumándolos: el resultado es el mismo que si se
+    hubieran añadido todos los valores a uno solo.
+
+    >>> sketch = QuantileSketch.fromValues([1.5, -3, 20])
+    >>> other = QuantileSketch.fromValues([4, 7])
+    >>> round(sketch.merge(other).quantile(0.5), 1)
+    4.0
+    '''
+
+    def __init__(self, relative_accuracy:float=0.01):
+        '''
+        relative_accuracy: float
+            Maximum relative error of the quantiles.
+        '''
+        self.relative_accuracy: float = relative_accuracy
+        self.gamma: float = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.positive: dict[int, int] = {}
+        self.negative: dict[int, int] = {}
+        self.zero: int = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _keys(self, values:np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / math.log(self.gamma)).astype(int)
+
+    def _value(self, key:int) -> float:
+        """Valor representativo del bucket (error relativo <= relative_accuracy)"""
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def addMany(self, values) -> 'QuantileSketch':
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.zero += int((values == 0).sum())
+        for store, part in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            keys, counts = np.unique(self._keys(part), return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                store[key] = store.get(key, 0) + count
+        return self
+
+    def add(self, value:float) -> 'QuantileSketch':
+        return self.addMany([value])
+
+    def merge(self, other:'QuantileSketch') -> 'QuantileSketch':
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different relative accuracy')
+        self.zero += other.zero
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        return self
+
+    def quantile(self, q:float) -> float | None:
+        '''
+        q: float
+            Quantile between 0 and 1.
+        '''
+        total = self.count
+        if total == 0:
+            return None
+
+        rank = q * (total - 1)
+        # Orden ascendente: negativos de mayor a menor magnitud, ceros y positivos
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'a': self.relative_accuracy,
+            'z': self.zero,
+            'p': {str(k): v for k, v in self.positive.items()},
+            'n': {str(k): v for k, v in self.negative.items()},
+        }
+
+    def dumps(self) -> str:
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    @staticmethod
+    def loads(data:str) -> 'QuantileSketch':
+        content = json.loads(data) if data else {}
+        sketch = QuantileSketch(relative_accuracy=content.get('a', 0.01))
+        sketch.zero = content.get('z', 0)
+        sketch.positive = {int(k): v for k, v in content.get('p', {}).items()}
+        sketch.negative = {int(k): v for k, v in content.get('n', {}).items()}
+        return sketch
+
+    @staticmethod
+    def fromValues(values, relative_accuracy:float=0.01) -> 'QuantileSketch':
+        return QuantileSketch(relative_accuracy=relative_accuracy).addMany(values)
@@ -0,0 +1,167 @@
+import numpy as np
+
+DAYS_MAP: dict[int, str] = {0: 'Mon', 1: 'Tue', 2: 'Wed', 3: 'Thu', 4: 'Fri', 5: 'Sat', 6: 'Sun'}
+
+class TradeFrame:
+    '''
+    Columnas NumPy de una lista de trades, construidas con un único recorrido
+    de los objetos del ORM.
+
+    pnl tiene una fila por modo (MODES: net y gross), así que cualquier
+    estadística calculada sobre el eje 1 sale para los dos modos a la vez.
+    Las agrupaciones (día, hora, símbolo...) se calculan una vez y se guardan,
+    de modo que varios PerformanceCharts que comparten el frame las reutilizan.
+
+    >>> frame = TradeFrame(trades)
+    >>> frame.pnl[frame.modeIndex('gross')]
+    '''
+    MODES: tuple[str] = ('net', 'gross')
+
+    def __init__(self, trades:list):
+        '''
+        trades: list[Trade]
+            Trades sorted by entry date.
+        '''
+        self.trades: list = trades
+        self.size: int = len(trades)
+        self._groups: dict[str, tuple[np.ndarray, list]] = {}
+
+        rows = [(t.profit_loss, t.commission, getattr(t, 'fees', 0), t.exit_quantity, t.entry_date, t.entry_time,
+                 t.exit_date, t.exit_time, t.symbol, t.strategy_id) for t in trades]
+        (profit_loss, commission, fees, quantity, entry_date, entry_time,
+         exit_date, exit_time, symbols, strategies) = zip(*rows) if rows else [()] * 10
+
+        self.net: np.ndarray = np.array([p or 0 for p in profit_loss], dtype=float)
+        self.commission: np.ndarray = np.array([c or 0 for c in commission], dtype=float)
+        self.fees: np.ndarray = np.array([f or 0 for f in fees], dtype=float)
+        self.gross: np.ndarray = self.net + self.commission
+        self.pnl: np.ndarray = np.vstack([self.net, self.gross]) if self.size else np.zeros((len(TradeFrame.MODES), 0))
+        self.quantity: np.ndarray = np.array([q or 0 for q in quantity], dtype=float)
+
+        self.entry_day: np.ndarray = np.array([d or 'NaT' for d in entry_date], dtype='datetime64[D]')
+        self.exit_day: np.ndarray = np.array([d or 'NaT' for d in exit_date], dtype='datetime64[D]')
+        self.entry: np.ndarray = np.array([f'{d}T{t}' if d and t else 'NaT' for d, t in zip(entry_date, entry_time)], dtype='datetime64[s]')
+        self.exit: np.ndarray = np.array([f'{d}T{t}' if d and t else 'NaT' for d, t in zip(exit_date, exit_time)], dtype='datetime64[s]')
+        # Minuto del día de la entrada ('HH:MM:SS' sin strptime)
+        self.entry_minute: np.ndarray = np.array([int(t[:2]) * 60 + int(t[3:5]) if t else -1 for t in entry_time], dtype=int)
+        self.entry_hour: np.ndarray = np.where(self.entry_minute >= 0, self.entry_minute // 60, -1)
+
+        # Minutos en el trade: con hora si la hay, si no días completos y 0 si no está cerrado
+        full = ~np.isnat(self.entry) & ~np.isnat(self.exit)
+        days = ~np.isnat(self.entry_day) & ~np.isnat(self.exit_day)
+        self.hold_minutes: np.ndarray = np.where(full, (self.exit - self.entry).astype(float) / 60,
+                                        np.where(days, (self.exit_day - self.entry_day).astype(float) * 1440, 0.0))
+
+        self.symbols, self.symbol_codes = self._firstSeen(np.array(symbols, dtype=str))
+        self.strategy_ids: np.ndarray = np.array([-1 if s is None else s for s in strategies], dtype=int)
+
+    def modeIndex(self, mode:str) -> int:
+        return TradeFrame.MODES.index('gross' if mode == 'gross' else 'net')
+
+    @staticmethod
+    def _firstSeen(values:np.ndarray) -> tuple[list, np.ndarray]:
+        """Valores distintos en orden de primera aparición y el código de cada fila"""
+        if len(values) == 0:
+            return [], np.array([], dtype=int)
+        unique, first, codes = np.unique(values, return_index=True, return_inverse=True)
+        order = np.argsort(first, kind='stable')
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        return unique[order].tolist(), rank[codes.ravel()]
+
+    def groupBy(self, key:str) -> tuple[np.ndarray, list]:
+        '''
+        Código de grupo de cada trade (-1 si no tiene) y etiquetas de los grupos.
+
+        key: str
+            Can be 'minute', '15min', 'hourly', 'weekday', 'monthly', 'yearly', 'daily', 'month', 'date' or 'symbol'.
+            'daily', 'yearly' and 'symbol' keep the order of first appearance; 'date' and 'month'
+            are sorted.
+        '''
+        if key in self._groups:
+            return self._groups[key]
+
+        valid = ~np.isnat(self.entry_day)
+        if key == 'hourly':
+            codes, labels = self.entry_hour, [f'{h:02d}:00' for h in range(24)]
+        elif key == 'minute':
+            codes, labels = self.entry_minute, [f'{m // 60:02d}:{m % 60:02d}' for m in range(1440)]
+        elif key == '15min':
+            codes = np.where(self.entry_minute >= 0, self.entry_minute // 15, -1)
+            labels = [f'{m // 60:02d}:{m % 60:02d}' for m in range(0, 1440, 15)]
+        elif key == 'weekday':
+            # 1970-01-01 fue jueves
+            codes = np.where(valid, (self.entry_day.astype('int64') + 3) % 7, -1)
+            labels = [DAYS_MAP[d] for d in range(7)]
+        elif key == 'monthly':
+            codes = np.where(valid, self.entry_day.astype('datetime64[M]').astype('int64') % 12, -1)
+            labels = list(range(12))
+        elif key in ('date', 'month'):
+            unit = 'D' if key == 'date' else 'M'
+            labels, codes = np.unique(np.datetime_as_string(self.entry_day[valid], unit=unit), return_inverse=True)
+            codes, labels = self._expand(codes.ravel(), valid), labels.tolist()
+        elif key in ('daily', 'yearly'):
+            unit = 'D' if key == 'daily' else 'Y'
+            labels, codes = self._firstSeen(np.datetime_as_string(self.entry_day[valid], unit=unit))
+            codes = self._expand(codes, valid)
+        elif key == 'symbol':
+            codes, labels = self.symbol_codes, self.symbols
+        else:
+            raise ValueError(f'Unknown group key: {key}')
+
+        self._groups[key] = (np.asarray(codes, dtype=int), labels)
+        return self._groups[key]
+
+    @staticmethod
+    def _expand(codes:np.ndarray, valid:np.ndarray) -> np.ndarray:
+        result = np.full(len(valid), -1, dtype=int)
+        result[valid] = codes
+        return result
+
+    def groupSums(self, key:str, values:np.ndarray) -> tuple[np.ndarray, list]:
+        '''
+        Suma por grupo de cada fila de values con bincount.
+
+        values: np.ndarray
+            Shape (n,) or (rows, n).
+        '''
+        codes, labels = self.groupBy(key)
+        valid = codes >= 0
+        values = np.atleast_2d(values)
+        sums = np.array([np.bincount(codes[valid], weights=row[valid], minlength=len(labels)) for row in values])
+        return sums, labels
+
+    def groupSumsMany(self, keys:list[str], values:np.ndarray) -> dict[str, tuple[np.ndarray, list]]:
+        '''
+        Sumas por grupo de varias agrupaciones a la vez: los códigos de cada
+        agrupación se desplazan a su propio rango y todo se suma con un único
+        bincount por fila de values.
+
+        values: np.ndarray
+            Shape (n,) or (rows, n).
+        '''
+        values = np.atleast_2d(values)
+        groups = [self.groupBy(key) for key in keys]
+        sizes = [len(labels) for _, labels in groups]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+        codes = np.concatenate([np.where(c >= 0, c + offset, -1) for (c, _), offset in zip(groups, offsets)]) if keys else np.array([], dtype=int)
+        valid = codes >= 0
+        tiled = np.tile(values, len(keys))[:, valid]
+        sums = np.array([np.bincount(codes[valid], weights=row, minlength=offsets[-1]) for row in tiled])
+
+        return {key: (sums[:, offsets[i]:offsets[i + 1]], labels) for i, (key, (_, labels)) in enumerate(zip(keys, groups))}
+
+    @staticmethod
+    def runs(signs:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Rachas consecutivas de signos iguales: valor y longitud de cada racha.
+
+        signs: np.ndarray
+            1D array of -1, 0 or 1.
+        '''
+        if len(signs) == 0:
+            return np.array([], dtype=signs.dtype), np.array([], dtype=int)
+        starts = np.flatnonzero(np.r_[True, signs[1:] != signs[:-1]])
+        lengths = np.diff(np.r_[starts, len(signs)])
+        return signs[starts], lengths
@@ -527,30 +527,34 @@ class YahooTicker(YahooBase):
 
     
     def _parseSessions(self, prices_df, trading_periods):
-        # Construimos una lista con todos los periodos (pre, regular, post)
-        session_data = []
-
+        # Periodos (pre, regular, post) como arrays de inicio, fin y sesión
+        names = {'pre': 'PRE', 'regular': 'REG', 'post': 'POST'}
+        starts, ends, sessions = [], [], []
         for session_type, daily_sessions in trading_periods.items():
             for day in daily_sessions:
                 for period in day:
-                    session_data.append({
-                        'session': session_type.upper(),  # 'PRE', 'REGULAR', 'POST' → 'PRE', 'REG', 'POST'
-                        'start': dt.datetime.utcfromtimestamp(period['start']),
-                        'end': dt.datetime.utcfromtimestamp(period['end']),
-                    })
-
-        # Convertimos a DataFrame
-        session_df = pd.DataFrame(session_data)
-        session_df['start'] = pd.to_datetime(session_df['start'], utc=True)
-        session_df['end'] = pd.to_datetime(session_df['end'], utc=True)
+                    starts.append(period['start'])
+                    ends.append(period['end'])
+                    sessions.append(names.get(session_type.lower(), session_type.upper()))
 
-        # Creamos la columna 'session' en el DataFrame original
         prices_df['session'] = None
+        if not starts or prices_df.empty:
+            return prices_df
+
+        # Periodos ordenados por inicio: cada vela cae en el último periodo que empieza antes que ella
+        order = np.argsort(starts, kind='stable')
+        starts = np.asarray(starts, dtype=np.int64)[order]
+        ends = np.asarray(ends, dtype=np.int64)[order]
+        sessions = np.asarray(sessions, dtype=object)[order]
+
+        index = pd.DatetimeIndex(prices_df.index)
+        if index.tz is not None:
+            index = index.tz_convert(None)
+        timestamps = index.values.astype('datetime64[s]').astype(np.int64)
+        idx = np.searchsorted(starts, timestamps, side='right') - 1
+        inside = (idx >= 0) & (timestamps < ends[np.maximum(idx, 0)])
 
-        # Asignamos la sesión comparando el índice (datetime UTC) con cada rango
-        for _, row in session_df.iterrows():
-            mask = (prices_df.index >= row['start']) & (prices_df.index < row['end'])
-            prices_df.loc[mask, 'session'] = row['session']
+        prices_df['session'] = np.where(inside, sessions[np.maximum(idx, 0)], None)
 
         return prices_df
 
@@ -237,8 +237,48 @@ class TradingChart {
         });
     }
 
-    loadData (dailyData, intradayData, transactionData, replay=false) {
+    static decodeCandles (payload) {
+        // Convierte el formato columnar del servidor (t, o, h, l, c, v, s) a una lista de velas
+        if (!payload || Array.isArray(payload)) {
+            return payload;
+        }
+
+        const column = (name, ArrayType) => {
+            if (payload.encoding !== 'base64') {
+                return payload[name];
+            }
+            // Arrays tipados little-endian codificados en base64
+            const bytes = Uint8Array.from(atob(payload[name]), char => char.charCodeAt(0));
+            return new ArrayType(bytes.buffer);
+        };
 
+        const t = column('t', Float64Array);
+        const o = column('o', Float64Array);
+        const h = column('h', Float64Array);
+        const l = column('l', Float64Array);
+        const c = column('c', Float64Array);
+        const v = column('v', Float64Array);
+        const s = column('s', Uint8Array);
+
+        const candles = new Array(t.length);
+        for (let i = 0; i < t.length; i++) {
+            candles[i] = {
+                date: t[i],
+                open: o[i],
+                high: h[i],
+                low: l[i],
+                close: c[i],
+                volume: v[i],
+                session: payload.sessions[s[i]],
+                id: null
+            };
+        }
+        return candles;
+    }
+
+    loadData (dailyData, intradayData, transactionData, replay=false) {
+        dailyData = TradingChart.decodeCandles(dailyData);
+        intradayData = TradingChart.decodeCandles(intradayData);
 
         // Generar transacciones de ejemplo basadas en los datos reales
         this.transactions = [];
@@ -0,0 +1,32 @@
+"""Added candle unique index
+
+Revision ID: 2a76bfda13e6
+Revises: 99e9a6190e41
+Create Date: 2026-10-18 19:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a76bfda13e6'
+down_revision = '99e9a6190e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Eliminar duplicados conservando la vela más reciente de cada (symbol, timeframe, date)
+    op.execute(
+        'DELETE FROM candle WHERE id NOT IN '
+        '(SELECT MAX(id) FROM candle GROUP BY symbol, timeframe, date)'
+    )
+
+    with op.batch_alter_table('candle', schema=None) as batch_op:
+        batch_op.create_index('ix_candle_symbol_timeframe_date', ['symbol', 'timeframe', 'date'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('candle', schema=None) as batch_op:
+        batch_op.drop_index('ix_candle_symbol_timeframe_date')
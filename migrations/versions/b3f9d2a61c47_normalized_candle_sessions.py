@@ -0,0 +1,25 @@
+"""Normalized candle sessions
+
+Revision ID: b3f9d2a61c47
+Revises: 8e41b07c2f6d
+Create Date: 2026-10-18 21:12:05.331870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f9d2a61c47'
+down_revision = '8e41b07c2f6d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las velas intradía se guardaban con la sesión 'REGULAR' en lugar de 'REG'
+    op.execute("UPDATE candle SET session = 'REG' WHERE session = 'REGULAR'")
+
+
+def downgrade():
+    pass